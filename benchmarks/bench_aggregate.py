@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Micro-benchmark summing up exon metrics per transcript.
+
+Compares ``sambamba.tx_stat`` per transcript with ``ExonAggregator`` on
+synthetic genes where transcripts share most of their exons. Run with
+``python benchmarks/bench_aggregate.py``.
+"""
+from __future__ import division, print_function
+import random
+import timeit
+
+from chanjo.load import sambamba
+from chanjo.load.aggregate import ExonAggregator
+from chanjo.store.constants import COMPLETENESS_LEVELS
+
+
+def make_transcripts(genes=2000, transcripts=6, exons=12, seed=0):
+    """Generate exons grouped per transcript, shared within each gene."""
+    rand = random.Random(seed)
+    grouped = {}
+    for gene in range(genes):
+        gene_exons = []
+        for index in range(exons):
+            start = gene * 100000 + index * 1000
+            gene_exons.append({
+                'chrom': '1', 'chromStart': start,
+                'chromEnd': start + rand.randint(50, 500),
+                'meanCoverage': rand.uniform(0, 200),
+                'thresholds': {level: min(rand.uniform(50, 150), 100.)
+                               for level in COMPLETENESS_LEVELS},
+            })
+        for transcript in range(transcripts):
+            tx_exons = [exon for exon in gene_exons if rand.random() < .8]
+            tx_id = "tx{}-{}".format(gene, transcript)
+            grouped[tx_id] = tx_exons or gene_exons
+    return grouped
+
+
+def run(threshold=20, repeat=5):
+    transcripts = make_transcripts()
+
+    def reference():
+        return {tx_id: sambamba.tx_stat(tx_id, tx_exons, threshold=threshold)
+                for tx_id, tx_exons in transcripts.items()}
+
+    def aggregated():
+        aggregator = ExonAggregator(threshold=threshold)
+        return {tx_id: aggregator.stat(tx_exons)
+                for tx_id, tx_exons in transcripts.items()}
+
+    assert reference() == aggregated(), 'results differ'
+    old = min(timeit.repeat(reference, number=1, repeat=repeat))
+    new = min(timeit.repeat(aggregated, number=1, repeat=repeat))
+    print("{} transcripts".format(len(transcripts)))
+    print("tx_stat:        {:.3f} s".format(old))
+    print("ExonAggregator: {:.3f} s ({:.1f}x)".format(new, old / new))
+
+
+if __name__ == '__main__':
+    run()
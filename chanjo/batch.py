@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""Process a batch of BAM alignments all the way into the database.
+
+Sambamba runs (and the parsing of their output) are spread over a pool of
+worker processes. Reading BAM files is additionally throttled by a shared
+semaphore to avoid saturating the storage. The parent process persists
+each sample as soon as it is ready.
+"""
+from __future__ import division
+from collections import namedtuple
+from functools import partial
+import logging
+import multiprocessing
+import os
+import time
+
+from sqlalchemy.exc import IntegrityError
+
+from chanjo.exc import ManifestFormattingError
+from chanjo.load.sambamba import load_transcripts
+from chanjo.sambamba import stream_sambamba
+from chanjo.sex import sex_from_bam
+from chanjo.store.constants import COMPLETENESS_LEVELS
+from chanjo.store.models import Sample
+
+BatchItem = namedtuple('BatchItem', ['bam', 'sample', 'group', 'name',
+                                     'group_name'])
+Outcome = namedtuple('Outcome', ['item', 'status', 'sex', 'count', 'seconds'])
+log = logging.getLogger(__name__)
+
+# shared between worker processes, set up by ``init_worker``
+IO_SEMAPHORE = None
+
+
+def read_manifest(handle):
+    """Parse a manifest of BAM files to process.
+
+    Tab-separated columns: BAM path, sample id, and optionally group id,
+    sample display name, and group display name.
+
+    Args:
+        handle (iterable): manifest lines
+
+    Returns:
+        List[BatchItem]: one item per BAM file
+
+    Raises:
+        ManifestFormattingError: if BAM path or sample id is missing
+    """
+    items = []
+    for line in handle:
+        if line.startswith('#') or not line.strip():
+            continue
+        row = [(column or None) for column in line.rstrip('\r\n').split('\t')]
+        if len(row) < 2 or not all(row[:2]):
+            raise ManifestFormattingError("expected BAM and sample id: {}"
+                                          .format(line))
+        row += [None] * (len(BatchItem._fields) - len(row))
+        items.append(BatchItem(*row[:len(BatchItem._fields)]))
+    return items
+
+
+def init_worker(io_semaphore):
+    """Share the I/O semaphore with a worker process."""
+    global IO_SEMAPHORE
+    IO_SEMAPHORE = io_semaphore
+
+
+def process_sample(item, regions, cov_thresholds=COMPLETENESS_LEVELS,
+                   threshold=None, sex_prefix=None):
+    """Run sambamba for a single BAM file and prepare models.
+
+    Reading the BAM file (sambamba + sex check) is gated by the shared I/O
+    semaphore, aggregating the transcript stats only occupies the CPU. The
+    sex is predicted from the sambamba output when the regions include the
+    sex chromosomes, otherwise from extra passes over the BAM file.
+
+    Args:
+        item (BatchItem): BAM file to process
+        regions (path): BED file defining exon regions
+        cov_thresholds (Optional[List[int]]): levels to sample completeness at
+        threshold (Optional[int]): completeness level to disqualify exons
+        sex_prefix (Optional[str]): guess sex with this chromosome prefix
+
+    Returns:
+        tuple: outcome, sample model, list of transcript stat models
+    """
+    start = time.time()
+    try:
+        with IO_SEMAPHORE:
+            with stream_sambamba(item.bam, regions, cov_thresholds) as lines:
+                result = load_transcripts(lines, sample_id=item.sample,
+                                          group_id=item.group,
+                                          source=os.path.abspath(item.bam),
+                                          threshold=threshold)
+            if sex_prefix is not None and result.sample.sex is None:
+                sex_guess = sex_from_bam(item.bam, prefix=sex_prefix)
+                (result.sample.x_coverage, result.sample.y_coverage,
+                 result.sample.sex) = sex_guess
+        models = list(result.models)
+    except Exception:
+        log.exception("failed to process: %s", item.bam)
+        return Outcome(item, 'failed', None, 0, time.time() - start), None, []
+
+    result.sample.name = item.name
+    result.sample.group_name = item.group_name
+    sex = result.sample.sex if sex_prefix is not None else None
+    outcome = Outcome(item, 'loaded', sex, len(models), time.time() - start)
+    return outcome, result.sample, models
+
+
+def run_batch(chanjo_db, items, regions, jobs=1, io_jobs=None,
+              cov_thresholds=COMPLETENESS_LEVELS, threshold=None,
+              sex_prefix=None):
+    """Load a batch of BAM files into the database.
+
+    Samples that are already loaded are skipped. Each sample is committed
+    in its own transaction as soon as its worker is done.
+
+    Args:
+        chanjo_db (ChanjoDB): database to load samples into
+        items (List[BatchItem]): BAM files to process
+        regions (path): BED file defining exon regions
+        jobs (Optional[int]): number of worker processes
+        io_jobs (Optional[int]): max number of BAM files read at once
+        cov_thresholds (Optional[List[int]]): levels to sample completeness at
+        threshold (Optional[int]): completeness level to disqualify exons
+        sex_prefix (Optional[str]): guess sex with this chromosome prefix
+
+    Yields:
+        Outcome: status for each sample in order of completion
+    """
+    existing_ids = set(sample_id for sample_id, in chanjo_db.query(Sample.id))
+    pending = []
+    for item in items:
+        if item.sample in existing_ids:
+            log.info("sample already loaded, skipping: %s", item.sample)
+            yield Outcome(item, 'skipped', None, 0, 0.)
+        else:
+            pending.append(item)
+    if not pending:
+        return
+
+    worker = partial(process_sample, regions=regions,
+                     cov_thresholds=cov_thresholds, threshold=threshold,
+                     sex_prefix=sex_prefix)
+    io_semaphore = multiprocessing.BoundedSemaphore(io_jobs or jobs)
+    if jobs == 1:
+        pool = None
+        init_worker(io_semaphore)
+        results = map(worker, pending)
+    else:
+        pool = multiprocessing.Pool(jobs, initializer=init_worker,
+                                    initargs=(io_semaphore,))
+        results = pool.imap_unordered(worker, pending)
+
+    try:
+        for outcome, sample_obj, models in results:
+            if sample_obj is not None:
+                outcome = persist(chanjo_db, outcome, sample_obj, models)
+            yield outcome
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+
+def persist(chanjo_db, outcome, sample_obj, models):
+    """Commit a sample with transcript stats in a single transaction.
+
+    Returns:
+        Outcome: updated status of the sample
+    """
+    try:
+        chanjo_db.add_stats(sample_obj, models)
+        chanjo_db.save()
+    except IntegrityError as error:
+        chanjo_db.session.rollback()
+        log.error("sample already loaded: %s", sample_obj.id)
+        log.debug(error.args[0])
+        return outcome._replace(status='conflict')
+    return outcome
+
+
+def summarize(outcomes, seconds):
+    """Summarize throughput for a processed batch.
+
+    Args:
+        outcomes (List[Outcome]): processed samples
+        seconds (float): wall time for the whole batch
+
+    Returns:
+        dict: counts per status and throughput rates
+    """
+    summary = {status: 0 for status in ('loaded', 'skipped', 'failed',
+                                        'conflict')}
+    for outcome in outcomes:
+        summary[outcome.status] += 1
+    transcripts = sum(outcome.count for outcome in outcomes
+                      if outcome.status == 'loaded')
+    summary['transcripts'] = transcripts
+    summary['seconds'] = seconds
+    summary['samples_per_hour'] = (summary['loaded'] / seconds * 3600
+                                   if seconds else 0.)
+    summary['transcripts_per_second'] = (transcripts / seconds
+                                         if seconds else 0.)
+    return summary
@@ -1,7 +1,12 @@
 # -*- coding: utf-8 -*-
+from __future__ import division
+from itertools import groupby
+
 from sqlalchemy.sql import func
 
-from chanjo.store.models import Sample, Transcript, TranscriptStat
+from chanjo.sex import SEX_CHROMOSOMES, guess_sex
+from chanjo.store.models import (CoverageHistogram, Sample, Transcript,
+                                 TranscriptStat)
 
 
 class CalculateMixin:
@@ -10,16 +15,18 @@ class CalculateMixin:
 
     def mean(self, sample_ids=None):
         """Calculate the mean values of all metrics per sample."""
-        sql_query = (self.query(TranscriptStat.sample_id,
+        sql_query = (self.query(Sample.id,
                                 func.avg(TranscriptStat.mean_coverage),
                                 func.avg(TranscriptStat.completeness_10),
                                 func.avg(TranscriptStat.completeness_15),
                                 func.avg(TranscriptStat.completeness_20),
                                 func.avg(TranscriptStat.completeness_50),
                                 func.avg(TranscriptStat.completeness_100))
-                         .group_by(TranscriptStat.sample_id))
+                         .select_from(TranscriptStat)
+                         .join(TranscriptStat.sample)
+                         .group_by(Sample.id))
         if sample_ids:
-            sql_query = sql_query.filter(TranscriptStat.sample_id.in_(sample_ids))
+            sql_query = sql_query.filter(Sample.id.in_(sample_ids))
         return sql_query
 
     def gene_metrics(self, *genes):
@@ -30,3 +37,69 @@ class CalculateMixin:
                      .filter(Transcript.gene_id.in_(genes))
                      .group_by(Transcript.gene_id))
         return query
+
+    def completeness(self, level, sample_ids=None):
+        """Calculate mean completeness per sample at any stored level.
+
+        Based on the coverage histograms stored when loading samples. The
+        levels given to sambamba (``-T``) when the sample was loaded are
+        stored; load output of ``chanjo sambamba --histogram-max`` to be
+        able to query any level up to the max.
+
+        Histograms are packed binary, which SQL can't portably unpack, so
+        the histograms are read in one query, ordered by sample, and the
+        mean is computed per sample over all its histograms at once.
+
+        Args:
+            level (int): coverage level
+            sample_ids (Optional[List[str]]): samples to limit query to
+
+        Returns:
+            List[tuple]: sample id and mean completeness at the level
+
+        Raises:
+            ValueError: if the level isn't stored for a sample
+        """
+        sql_query = (self.query(Sample.id, CoverageHistogram.data)
+                         .select_from(TranscriptStat)
+                         .join(TranscriptStat.sample)
+                         .join(CoverageHistogram,
+                               CoverageHistogram.id == TranscriptStat.id)
+                         .order_by(Sample.id))
+        if sample_ids:
+            sql_query = sql_query.filter(Sample.id.in_(sample_ids))
+
+        return [(sample_id, CoverageHistogram.mean_completeness(
+                    [data for _, data in rows], level))
+                for sample_id, rows in groupby(sql_query, key=lambda row: row[0])]
+
+    def sex_from_stats(self, sample_id):
+        """Predict the sex of a sample from stored transcript stats.
+
+        Weights the mean coverage of transcripts on the sex chromosomes by
+        their length.
+
+        Args:
+            sample_id (str): unique sample id
+
+        Returns:
+            SexGuess: tuple of X coverage, Y coverage, and sex prediction or
+                None if there are no transcripts on either of the X and Y
+                chromosomes
+        """
+        sql_query = (self.query(Transcript.chromosome,
+                                func.sum(TranscriptStat.mean_coverage *
+                                         Transcript.length),
+                                func.sum(Transcript.length))
+                         .select_from(TranscriptStat)
+                         .join(TranscriptStat.sample)
+                         .join(TranscriptStat.transcript)
+                         .filter(Sample.id == sample_id,
+                                 Transcript.chromosome.in_(SEX_CHROMOSOMES))
+                         .group_by(Transcript.chromosome))
+        sums = {}
+        for chromosome, coverage_sum, bases in sql_query:
+            total_sum, total_bases = sums.get(chromosome[-1], (0., 0))
+            sums[chromosome[-1]] = (total_sum + (coverage_sum or 0.),
+                                    total_bases + (bases or 0))
+        return guess_sex(sums)
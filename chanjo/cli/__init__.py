@@ -1,7 +1,11 @@
 from .base import root
+from .batch import batch
 from .calculate import calculate
+from .depth import depth
 from .sex import sex
 from .load import link, load
 from .sambamba import sambamba
 from .db import db_cmd
 from .init import init
+from .panel import panel
+from .serve import serve
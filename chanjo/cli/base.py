@@ -4,15 +4,20 @@ Command line interface (console entry points). Based on Click_.
 
 .. _Click: http://click.pocoo.org/
 """
+import atexit
 import logging
 import os
 import pkg_resources
+import signal
 
 import click
 import coloredlogs
 import ruamel.yaml
+from sqlalchemy.engine import Engine
 
 from chanjo import __version__, __title__
+from chanjo.metrics import RunMetrics
+from chanjo.store.timing import QueryTimer
 
 LOG = logging.getLogger(__name__)
 
@@ -45,9 +50,16 @@ class EntryPointsCLI(click.MultiCommand):
 @click.option('-d', '--database', help='path/URI of the SQL database')
 @click.option('-l', '--log-level', default='INFO')
 @click.option('--log-file', type=click.File('a'))
+@click.option('--slow-query-ms', type=float,
+              help='time SQL statements and log the ones slower than this')
+@click.option('--metrics', type=click.Path(dir_okay=False),
+              help='write run metrics to this file')
+@click.option('--metrics-format', type=click.Choice(['json', 'prometheus']),
+              help='format of the metrics file (default: by extension)')
 @click.version_option(__version__, prog_name=__title__)
 @click.pass_context
-def root(context, config, database, log_level, log_file):
+def root(context, config, database, log_level, log_file, slow_query_ms,
+         metrics, metrics_format):
     """Clinical sequencing coverage analysis tool."""
     logout = log_file or click.get_text_stream('stderr')
     coloredlogs.install(level=log_level, stream=logout)
@@ -60,6 +72,37 @@ def root(context, config, database, log_level, log_file):
     else:
         context.obj = {}
     context.obj['database'] = (database or context.obj.get('database'))
+    slow_query_ms = slow_query_ms or context.obj.get('slow_query_ms')
+    if slow_query_ms is not None:
+        instrument_sql(slow_query_ms)
+
+    # commands add to the run metrics, only written if a path is given
+    metrics = metrics or context.obj.get('metrics')
+    run_metrics = RunMetrics(command=context.invoked_subcommand,
+                             enabled=bool(metrics))
+    context.obj['run_metrics'] = run_metrics
+    if metrics:
+        context.call_on_close(lambda: run_metrics.write(metrics,
+                                                        fmt=metrics_format))
 
     # update the context with new defaults from the config file
     context.default_map = context.obj
+
+
+def instrument_sql(slow_ms):
+    """Time SQL statements on all database engines.
+
+    Aggregated statistics are logged when the process exits and, where
+    supported, when it receives SIGUSR1.
+
+    Args:
+        slow_ms (float): log statements slower than this
+
+    Returns:
+        QueryTimer: collects statistics per statement
+    """
+    timer = QueryTimer(slow_ms=slow_ms).attach(Engine)
+    atexit.register(timer.log_report)
+    if hasattr(signal, 'SIGUSR1'):
+        signal.signal(signal.SIGUSR1, lambda signum, frame: timer.log_report())
+    return timer
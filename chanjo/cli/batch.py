@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+import logging
+import multiprocessing
+import time
+
+import click
+
+from chanjo.batch import read_manifest, run_batch, summarize
+from chanjo.exc import ManifestFormattingError
+from chanjo.store.api import ChanjoDB
+
+LOG = logging.getLogger(__name__)
+
+
+@click.command()
+@click.option('-r', '--regions', type=click.Path(exists=True), required=True,
+              help='Path to a bed file with exon coordinates')
+@click.option('-j', '--jobs', type=int, default=multiprocessing.cpu_count(),
+              help='number of sambamba runs in parallel')
+@click.option('--io-jobs', type=int,
+              help='number of BAM files to read at once (default: jobs)')
+@click.option('--threshold', default=10,
+              help='completeness level to disqualify exons')
+@click.option('--sex', is_flag=True, help='guess the sex for each BAM')
+@click.option('-p', '--prefix', default='', help='chromosome prefix (--sex)')
+@click.argument('manifest', type=click.File(encoding='utf-8'))
+@click.pass_context
+def batch(context, regions, jobs, io_jobs, threshold, sex, prefix, manifest):
+    """Load coverage for a manifest of BAM files.
+
+    \b
+    MANIFEST: tab-separated BAM path, sample id, group id, name, group name
+    """
+    chanjo_db = ChanjoDB(uri=context.obj['database'])
+    try:
+        items = read_manifest(manifest)
+    except ManifestFormattingError as error:
+        LOG.error(error.args[0])
+        context.abort()
+
+    start = time.time()
+    outcomes = []
+    click.echo("#sample\tgroup\tstatus\tsex\ttranscripts\tseconds")
+    for outcome in run_batch(chanjo_db, items, regions, jobs=jobs,
+                             io_jobs=io_jobs, threshold=threshold,
+                             sex_prefix=(prefix if sex else None)):
+        outcomes.append(outcome)
+        click.echo("{}\t{}\t{}\t{}\t{}\t{:.1f}".format(
+            outcome.item.sample, outcome.item.group or '', outcome.status,
+            outcome.sex or '', outcome.count, outcome.seconds))
+
+    summary = summarize(outcomes, time.time() - start)
+    LOG.info("loaded %s, skipped %s, failed %s, conflicts %s samples",
+             summary['loaded'], summary['skipped'], summary['failed'],
+             summary['conflict'])
+    LOG.info("%.1f samples/hour, %.1f transcripts/s (%.1fs)",
+             summary['samples_per_hour'], summary['transcripts_per_second'],
+             summary['seconds'])
+    if summary['failed'] or summary['conflict']:
+        context.abort()
@@ -37,3 +37,22 @@ def mean(context, sample, pretty):
     for result in query:
         row = {column: value for column, value in zip(columns, result)}
         click.echo(dump_json(row, pretty=pretty))
+
+
+@calculate.command()
+@click.option('-l', '--level', type=int, required=True,
+              help='coverage level stored in the histograms')
+@click.option('-p', '--pretty', is_flag=True)
+@click.option('-s', '--sample', multiple=True, help='sample to limit query to')
+@click.pass_context
+def completeness(context, level, sample, pretty):
+    """Calculate completeness at any level from stored histograms."""
+    try:
+        results = context.obj['db'].completeness(level, sample_ids=sample)
+    except ValueError:
+        LOG.error("level not stored in coverage histograms: %s", level)
+        context.abort()
+    column = "completeness_{}".format(level)
+    for sample_id, value in results:
+        click.echo(dump_json({'sample_id': sample_id, column: value},
+                             pretty=pretty))
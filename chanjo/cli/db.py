@@ -2,8 +2,12 @@
 import logging
 
 import click
+from sqlalchemy import create_engine
 
-from chanjo.store.api import ChanjoDB
+from chanjo.init.template import create_database
+from chanjo.store.api import ChanjoDB, build_uri
+from chanjo.store.merge import CONFLICT_MODES, merge_database
+from chanjo.store.migrate import migrate_keys, needs_migration
 from chanjo.store.models import Sample
 
 LOG = logging.getLogger(__name__)
@@ -18,9 +22,21 @@ def db_cmd(context):
 
 @db_cmd.command()
 @click.option('--reset', is_flag=True, help='tear down existing db')
+@click.option('-t', '--template', 'bed_path', type=click.Path(exists=True),
+              help='copy a cached database with transcripts linked from BED')
+@click.option('--cache-dir', type=click.Path(file_okay=False),
+              help='directory to cache database templates in')
 @click.pass_context
-def setup(context, reset):
+def setup(context, reset, bed_path, cache_dir):
     """Initialize a new datbase from scratch."""
+    if bed_path:
+        try:
+            create_database(context.obj['database'], bed_path=bed_path,
+                            directory=cache_dir, force=reset)
+        except OSError as error:
+            LOG.error("%s, use --reset to replace it", error)
+            context.abort()
+        return
     if reset:
         LOG.info('tearing down existing database')
         context.obj['db'].tear_down()
@@ -42,3 +58,48 @@ def remove(context, sample_id):
     LOG.info('delete sample (%s) from database', sample_id)
     store.session.delete(sample_obj)
     store.save()
+
+
+@db_cmd.command()
+@click.pass_context
+def migrate(context):
+    """Move an existing database over to integer surrogate keys."""
+    engine = context.obj['db'].engine
+    if not needs_migration(engine):
+        LOG.info('database is already up to date')
+        return
+    try:
+        count = migrate_keys(engine)
+    except ValueError as error:
+        LOG.error(error.args[0])
+        context.abort()
+    LOG.info("migrated %s transcript stats", count)
+
+
+@db_cmd.command()
+@click.option('-c', '--on-conflict', type=click.Choice(CONFLICT_MODES),
+              default='abort', show_default=True,
+              help='what to do with samples already in the database')
+@click.argument('sources', nargs=-1, required=True)
+@click.pass_context
+def merge(context, on_conflict, sources):
+    """Merge samples from other chanjo databases into this one."""
+    store = context.obj['db']
+    for source in sources:
+        engine = create_engine(build_uri(source))
+        try:
+            report = merge_database(store, engine, on_conflict=on_conflict)
+        except ValueError as error:
+            store.session.rollback()
+            LOG.error("%s: %s", source, error.args[0])
+            context.abort()
+        finally:
+            engine.dispose()
+        store.save()
+        if report.conflicts:
+            LOG.warning("%s conflicting samples (%s)", len(report.conflicts),
+                        on_conflict)
+        LOG.info("merged %s samples, %s transcript stats, %s new transcripts "
+                 "from %s in %.1fs (%.0f stats/s)", report.samples,
+                 report.stats, report.transcripts, source, report.seconds,
+                 report.stats / report.seconds if report.seconds else 0)
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+import logging
+
+import click
+
+from chanjo.depth import format_sambamba, read_bedgraph, read_regions, region_depth
+from chanjo.exc import BedFormattingError
+from chanjo.load.sambamba import histogram_levels
+from chanjo.load.stream import open_text
+from chanjo.store.constants import COMPLETENESS_LEVELS
+from .load import validate_stdin
+
+LOG = logging.getLogger(__name__)
+
+
+@click.command()
+@click.option('-r', '--regions', type=click.File('rb'), required=True,
+              help='Path to a bed file with exon coordinates')
+@click.option('-t', '--cov-threshold', 'cov_thresholds', multiple=True, type=int,
+              help='completeness levels (default: all stored levels)')
+@click.option('--histogram-max', type=int,
+              help='also sample completeness at every level up to this one')
+@click.option('-s', '--sample', required=True, help='sample name for output')
+@click.option('-o', '--outfile', type=click.File('w', encoding='utf-8'),
+              default='-', help='file to write to (default: STDOUT)')
+@click.argument('depth_stream', callback=validate_stdin,
+                type=click.File('rb'), default='-', required=False)
+@click.pass_context
+def depth(context, regions, cov_thresholds, histogram_max, sample, outfile,
+          depth_stream):
+    """Calculate coverage from a per-base depth track (bedGraph).
+
+    The output is formatted like 'sambamba depth region' and can be piped
+    into 'chanjo load'.
+    """
+    thresholds = cov_thresholds or COMPLETENESS_LEVELS
+    if histogram_max:
+        thresholds = histogram_levels(histogram_max, thresholds)
+    try:
+        region_rows = read_regions(open_text(regions))
+        intervals = read_bedgraph(open_text(depth_stream))
+        records = region_depth(region_rows, intervals, thresholds=thresholds,
+                               sample_name=sample)
+        for line in format_sambamba(records, thresholds=thresholds):
+            outfile.write(line)
+    except BedFormattingError as error:
+        LOG.error(error.args[0])
+        context.abort()
@@ -10,6 +10,7 @@ import ruamel.yaml
 from chanjo.store.api import ChanjoDB
 from chanjo.init.bootstrap import pull, BED_NAME, DB_NAME
 from chanjo.init.demo import setup_demo, DEMO_BED_NAME
+from chanjo.init.template import create_database
 
 LOG = logging.getLogger(__name__)
 
@@ -18,11 +19,16 @@ LOG = logging.getLogger(__name__)
 @click.option('-f', '--force', is_flag=True, help='overwrite existing files')
 @click.option('-d', '--demo', is_flag=True, help='copy demo files')
 @click.option('-a', '--auto', is_flag=True)
+@click.option('-t', '--template', is_flag=True,
+              help='copy a cached, linked database (SQLite only)')
+@click.option('--cache-dir', type=click.Path(file_okay=False),
+              help='directory to cache database templates in')
 @click.argument('root_dir', default='.', required=False)
 @click.pass_context
-def init(context, force, demo, auto, root_dir):
+def init(context, force, demo, auto, template, cache_dir, root_dir):
     """Bootstrap a new chanjo setup."""
     is_bootstrapped = False
+    is_linked = False
     root_path = Path(root_dir)
 
     LOG.info("setting up chanjo under: %s", root_path)
@@ -39,18 +45,24 @@ def init(context, force, demo, auto, root_dir):
     if demo:
         LOG.info("copying demo files: %s", root_dir)
         setup_demo(root_dir, force=force)
-
-        LOG.info("configure new chanjo database: %s", db_uri)
-        chanjo_db = ChanjoDB(db_uri)
-        chanjo_db.set_up()
         is_bootstrapped = True
     elif auto or click.confirm('Bootstrap HGNC transcript BED?'):
         pull(root_dir, force=force)
+        is_bootstrapped = True
 
+    bed_path = root_path.joinpath(DEMO_BED_NAME if demo else BED_NAME)
+    if is_bootstrapped:
         LOG.info("configure new chanjo database: %s", db_uri)
-        chanjo_db = ChanjoDB(db_uri)
-        chanjo_db.set_up()
-        is_bootstrapped = True
+        if template:
+            try:
+                is_linked = create_database(db_uri, bed_path=bed_path,
+                                            directory=cache_dir, force=force)
+            except OSError as error:
+                LOG.error(error)
+                context.abort()
+        else:
+            chanjo_db = ChanjoDB(db_uri)
+            chanjo_db.set_up()
 
     # setup config file
     root_path.makedirs_p()
@@ -61,7 +73,8 @@ def init(context, force, demo, auto, root_dir):
         LOG.info("writing config file: %s", conf_path)
         conf_handle.write(data_str)
 
-    if is_bootstrapped:
+    if is_linked:
+        click.echo('Chanjo bootstrap successful! Transcripts are linked.')
+    elif is_bootstrapped:
         click.echo('Chanjo bootstrap successful! Now run: ')
-        bed_path = root_path.joinpath(DEMO_BED_NAME if demo else BED_NAME)
         click.echo("chanjo --config {} link {}".format(conf_path, bed_path))
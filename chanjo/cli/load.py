@@ -6,11 +6,23 @@ import sys
 import click
 from sqlalchemy.exc import IntegrityError
 
+from chanjo.exc import BedFormattingError, MultipleSamplesError
 from chanjo.store.api import ChanjoDB
-from chanjo.load.link import link_elements
-from chanjo.load.sambamba import load_transcripts
+from chanjo.store.models import Sample, Transcript
+from chanjo.load.dryrun import dry_run as run_dry, format_report
+from chanjo.load.fingerprint import fingerprint
+from chanjo.load.link import LINK_COLUMNS, diff_transcripts, link_elements
+from chanjo.load.mosdepth import load_transcripts as load_mosdepth
+from chanjo.load.multisample import load_samples
+from chanjo.load.parallel import is_splittable, load_transcripts as load_parallel
+from chanjo.load.parse import mosdepth, sambamba
+from chanjo.load.sambamba import load_exons
+from chanjo.load.stream import open_text
+from chanjo.metrics import file_size
 
 LOG = logging.getLogger(__name__)
+# removed transcript ids to show in the warning, all are logged at debug
+REMOVED_SHOWN = 10
 
 
 def validate_stdin(context, param, value):
@@ -33,49 +45,296 @@ def validate_stdin(context, param, value):
 @click.option('-gn', '--group-name', help='display name for sample group')
 @click.option('-r', '--threshold', default=10,
               help='completeness level to disqualify exons')
+@click.option('--threads', type=int,
+              help='threads to decompress BGZF input with')
+@click.option('-j', '--jobs', default=1,
+              help='worker processes to parse sambamba output with')
+@click.option('--replace', is_flag=True,
+              help='replace the sample if it is already loaded')
+@click.option('--histogram', is_flag=True,
+              help='store completeness at every level in the input')
+@click.option('--exons', is_flag=True, help='store exon level stats')
+@click.option('--mosdepth-thresholds', type=click.File('rb'),
+              help='mosdepth thresholds output, BED_STREAM is then the '
+                   'mosdepth regions output')
+@click.option('--regions', type=click.File('rb'),
+              help='chanjo BED file given to mosdepth')
+@click.option('--dry-run', is_flag=True,
+              help='validate and time the input without a database')
+@click.option('--full-hash', is_flag=True,
+              help='fingerprint input by hashing all of it')
+@click.option('-m', '--multi-sample', is_flag=True,
+              help='load every sample in sambamba output for many BAM files')
 @click.argument('bed_stream', callback=validate_stdin,
-                type=click.File(encoding='utf-8'), default='-', required=False)
+                type=click.File('rb'), default='-', required=False)
 @click.pass_context
-def load(context, sample, group, name, group_name, threshold, bed_stream):
-    """Load Sambamba output into the database for a sample."""
+def load(context, sample, group, name, group_name, threshold, threads, jobs,
+         replace, histogram, exons, mosdepth_thresholds, regions, dry_run,
+         full_hash, multi_sample, bed_stream):
+    """Load Sambamba (or mosdepth) output into the database for a sample.
+
+    Input that matches the fingerprint of a loaded sample is skipped unless
+    the sample is replaced. Sambamba output for several BAM files is split
+    by sample name with --multi-sample and all samples are loaded together,
+    samples already loaded from the same input are skipped.
+    """
+    if dry_run:
+        check_input(context, bed_stream, mosdepth_thresholds, regions,
+                    sample=sample, threshold=threshold, threads=threads)
+        return
+
+    if mosdepth_thresholds and (regions is None or sample is None):
+        LOG.error('mosdepth output requires --regions and --sample')
+        context.abort()
+    if multi_sample and (sample or name or mosdepth_thresholds):
+        LOG.error('--multi-sample takes sample ids from sambamba output, '
+                  "it can't be combined with --sample, --name, or mosdepth")
+        context.abort()
+
     chanjo_db = ChanjoDB(uri=context.obj['database'])
     source = os.path.abspath(bed_stream.name)
+    run_metrics = context.obj['run_metrics']
+    run_metrics.set('bytes_read', file_size(bed_stream))
+    input_handles = [bed_stream] + ([mosdepth_thresholds]
+                                    if mosdepth_thresholds else [])
+    input_fingerprint = fingerprint(input_handles, full=full_hash)
+    loaded_ids = set()
+    if input_fingerprint and not replace:
+        loaded_ids = set(sample_id for sample_id, in
+                         chanjo_db.query(Sample.id)
+                                  .filter_by(fingerprint=input_fingerprint))
+        # samples in multi-sample input are only known after parsing
+        if loaded_ids and not multi_sample:
+            LOG.info("input already loaded as sample (%s), skipping",
+                     ', '.join(sorted(loaded_ids)))
+            return
+    exon_positions = chanjo_db.exon_positions() if exons else None
+    if exons and not exon_positions:
+        LOG.warning("no exon ordering found, re-run 'chanjo link' first")
+
+    with run_metrics.phase('parse'):
+        if mosdepth_thresholds:
+            regions_lines = open_text(bed_stream, threads=threads)
+            thresholds_lines = open_text(mosdepth_thresholds, threads=threads)
+            try:
+                result = load_mosdepth(regions_lines, thresholds_lines,
+                                       open_text(regions), sample_id=sample,
+                                       group_id=group, source=source,
+                                       threshold=threshold,
+                                       histogram=histogram,
+                                       exon_positions=exon_positions)
+            except BedFormattingError as error:
+                LOG.error(error.args[0])
+                context.abort()
+        elif multi_sample:
+            exon_rows = sambamba.depth_output(
+                open_text(bed_stream, threads=threads))
+            results = load_samples(
+                run_metrics.counted(exon_rows, 'rows_parsed'), group_id=group,
+                source=source, threshold=threshold, histogram=histogram,
+                exon_positions=exon_positions, jobs=jobs)
+        elif (jobs > 1 and not (histogram or exon_positions) and
+              is_splittable(bed_stream)):
+            try:
+                result = load_parallel(bed_stream.name, sample_id=sample,
+                                       group_id=group, source=source,
+                                       threshold=threshold, jobs=jobs)
+            except MultipleSamplesError as error:
+                LOG.error("%s, load them with --multi-sample", error.args[0])
+                context.abort()
+            run_metrics.add('rows_parsed', result.rows)
+        else:
+            if jobs > 1:
+                LOG.warning('input not split, parsing in a single process')
+            exon_rows = sambamba.depth_output(
+                open_text(bed_stream, threads=threads))
+            try:
+                result = load_exons(
+                    run_metrics.counted(exon_rows, 'rows_parsed'),
+                    sample_id=sample, group_id=group, source=source,
+                    threshold=threshold, histogram=histogram,
+                    exon_positions=exon_positions)
+            except MultipleSamplesError as error:
+                LOG.error("%s, load them with --multi-sample", error.args[0])
+                context.abort()
+    if multi_sample:
+        skipped = [result.sample.id for result in results
+                   if result.sample.id in loaded_ids]
+        if skipped:
+            LOG.info("samples already loaded from input, skipping: %s",
+                     ', '.join(skipped))
+            results = [result for result in results
+                       if result.sample.id not in loaded_ids]
+            if not results:
+                return
+        for result in results:
+            result.sample.fingerprint = input_fingerprint
+        save_results(context, chanjo_db, results, group_name=group_name,
+                     replace=replace)
+    else:
+        result.sample.fingerprint = input_fingerprint
+        save_result(context, chanjo_db, result, name=name,
+                    group_name=group_name, replace=replace)
+
+
+def check_input(context, bed_stream, mosdepth_thresholds=None, regions=None,
+                sample=None, threshold=None, threads=None):
+    """Run the load pipeline without a database and print a report.
+
+    Rows that can't be parsed are reported with their line number. Aborts
+    after the report if any problems are found in the input.
+
+    Args:
+        context (click.Context): context to abort on problems
+        bed_stream (file): sambamba (or mosdepth regions) output
+        mosdepth_thresholds (Optional[file]): mosdepth thresholds output
+        regions (Optional[file]): chanjo BED file given to mosdepth
+        sample (Optional[str]): sample id
+        threshold (Optional[int]): completeness level to disqualify exons
+        threads (Optional[int]): threads to decompress BGZF input with
+    """
+    parse_errors = []
+    if mosdepth_thresholds:
+        if regions is None:
+            LOG.error('mosdepth output requires --regions')
+            context.abort()
+        lookup = mosdepth.region_lookup(open_text(regions))
+        exons = mosdepth.regions_output(open_text(bed_stream, threads=threads),
+                                        open_text(mosdepth_thresholds,
+                                                  threads=threads),
+                                        lookup, sample_name=sample)
+    else:
+        exons = sambamba.depth_output(open_text(bed_stream, threads=threads),
+                                      errors=parse_errors)
+
+    try:
+        report = run_dry(exons, threshold=threshold,
+                         parse_errors=parse_errors)
+    except BedFormattingError as error:
+        LOG.error(error.args[0])
+        context.abort()
+    for line in format_report(report):
+        click.echo(line)
+    for problem in report.problems:
+        LOG.error(problem)
+    if report.problems:
+        context.abort()
+
 
-    result = load_transcripts(bed_stream, sample_id=sample, group_id=group,
-                              source=source, threshold=threshold)
+def save_result(context, chanjo_db, result, name=None, group_name=None,
+                replace=False):
+    """Persist a sample with all transcript stats in a single transaction.
 
+    Args:
+        context (click.Context): context to abort on conflicts
+        chanjo_db (ChanjoDB): database to persist to
+        result (Result): output from ``load_transcripts``
+        name (Optional[str]): display name for sample
+        group_name (Optional[str]): display name for sample group
+        replace (Optional[bool]): swap out any existing sample with same id
+    """
     result.sample.name = name
-    result.sample.group_name = group_name
+    save_results(context, chanjo_db, [result], group_name=group_name,
+                 replace=replace)
+
+
+def save_results(context, chanjo_db, results, group_name=None, replace=False):
+    """Persist samples with all transcript stats in a single transaction.
+
+    Args:
+        context (click.Context): context to abort on conflicts
+        chanjo_db (ChanjoDB): database to persist to
+        results (List[Result]): output from ``load_transcripts`` per sample
+        group_name (Optional[str]): display name for sample group
+        replace (Optional[bool]): swap out any existing samples with same ids
+    """
+    run_metrics = context.obj['run_metrics']
+    samples = [result.sample for result in results]
+    sample_ids = [sample_obj.id for sample_obj in samples]
+    written = 0
     try:
-        chanjo_db.add(result.sample)
-        with click.progressbar(result.models, length=result.count,
-                               label='loading transcripts') as bar:
-            for tx_model in bar:
-                chanjo_db.add(tx_model)
+        for sample_obj in samples:
+            sample_obj.group_name = group_name
+            if replace:
+                count = chanjo_db.delete_sample(sample_obj.id)
+                LOG.info("replacing %s existing transcript stats for %s",
+                         count, sample_obj.id)
+        chanjo_db.session.add_all(samples)
+        chanjo_db.session.flush()
+        for result in results:
+            with run_metrics.phase('write'), click.progressbar(
+                    result.models, length=result.count,
+                    label="loading {}".format(result.sample.id)) as bar:
+                written += chanjo_db.add_stats(result.sample, bar)
+            if result.sample.sex is None:
+                sex_guess = chanjo_db.sex_from_stats(result.sample.id)
+                if sex_guess:
+                    (result.sample.x_coverage, result.sample.y_coverage,
+                     result.sample.sex) = sex_guess
         chanjo_db.save()
     except IntegrityError as error:
-        LOG.error('sample already loaded, rolling back')
-        LOG.debug(error.args[0])
         chanjo_db.session.rollback()
+        loaded = [sample_id for sample_id, in chanjo_db.query(Sample.id)
+                  .filter(Sample.id.in_(sample_ids))]
+        if loaded and not replace:
+            LOG.error("sample already loaded, rolled back: %s",
+                      ', '.join(loaded))
+        else:
+            LOG.error("failed to store samples, rolled back: %s", error.orig)
+        LOG.debug(error.args[0])
         context.abort()
+    run_metrics.set('transcripts_written', written)
 
 
 @click.command()
+@click.option('--threads', type=int,
+              help='threads to decompress BGZF input with')
 @click.argument('bed_stream', callback=validate_stdin,
-                type=click.File(encoding='utf-8'), default='-', required=False)
+                type=click.File('rb'), default='-', required=False)
 @click.pass_context
-def link(context, bed_stream):
-    """Link related genomic elements."""
+def link(context, threads, bed_stream):
+    """Link related genomic elements.
+
+    Transcripts already in the database are updated in place so existing
+    coverage stats are kept.
+    """
     chanjo_db = ChanjoDB(uri=context.obj['database'])
-    result = link_elements(bed_stream)
-    with click.progressbar(result.models, length=result.count,
-                           label='adding transcripts') as bar:
-        for tx_model in bar:
-            chanjo_db.add(tx_model)
-    try:
-        chanjo_db.save()
-    except IntegrityError:
-        LOG.exception('elements already linked?')
-        chanjo_db.session.rollback()
-        click.echo("use 'chanjo db setup --reset' to re-build")
-        context.abort()
+    run_metrics = context.obj['run_metrics']
+    run_metrics.set('bytes_read', file_size(bed_stream))
+    with run_metrics.phase('parse'):
+        bed_lines = open_text(bed_stream, threads=threads)
+        result = link_elements(run_metrics.counted(bed_lines, 'rows_parsed'))
+    columns = [getattr(Transcript, column) for column in LINK_COLUMNS]
+    with run_metrics.phase('compare'):
+        rows = chanjo_db.query(Transcript.id, Transcript.key, *columns).all()
+        existing = {row[0]: row[2:] for row in rows}
+        with click.progressbar(result.models, length=result.count,
+                               label='comparing transcripts') as bar:
+            diff = diff_transcripts(bar, existing)
+        # updates are matched on the primary key
+        tx_keys = {row[0]: row[1] for row in rows}
+        for mapping in diff.updated:
+            mapping['key'] = tx_keys[mapping['id']]
+
+    with run_metrics.phase('write'):
+        exon_count = chanjo_db.add_exon_regions(result.exons)
+        LOG.info("appending %s new exons to the exon ordering", exon_count)
+        LOG.info("adding %s new transcripts", len(diff.added))
+        chanjo_db.add_transcripts(diff.added)
+        LOG.info("updating %s changed transcripts", len(diff.updated))
+        chanjo_db.session.bulk_update_mappings(Transcript, diff.updated)
+        try:
+            chanjo_db.save()
+        except IntegrityError:
+            LOG.exception('duplicate transcripts in BED file?')
+            context.abort()
+    run_metrics.set('transcripts_written',
+                    len(diff.added) + len(diff.updated))
+    run_metrics.set('exons_added', exon_count)
+
+    if diff.removed:
+        LOG.warning("%s transcripts in database missing from BED file, "
+                    "e.g.: %s", len(diff.removed),
+                    ', '.join(diff.removed[:REMOVED_SHOWN]))
+        LOG.debug("transcripts missing from BED file: %s",
+                  ', '.join(diff.removed))
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+import logging
+
+import click
+from sqlalchemy.sql import func
+
+from chanjo.store.api import ChanjoDB
+from chanjo.store.constants import STAT_COLUMNS
+from chanjo.store.models import Panel, PanelTranscript
+from .calculate import dump_json
+
+LOG = logging.getLogger(__name__)
+
+
+@click.group()
+@click.pass_context
+def panel(context):
+    """Store gene panels and calculate coverage over them."""
+    context.obj['db'] = ChanjoDB(uri=context.obj['database'])
+
+
+@panel.command()
+@click.option('-n', '--name', help='display name for the panel')
+@click.option('-f', '--gene-file', type=click.File('r'),
+              help='file with one gene per line')
+@click.argument('panel_id')
+@click.argument('genes', nargs=-1)
+@click.pass_context
+def add(context, name, gene_file, panel_id, genes):
+    """Store a panel from gene ids or gene names."""
+    genes = list(genes)
+    if gene_file:
+        genes.extend(line.strip() for line in gene_file if line.strip())
+    if not genes:
+        LOG.error('provide genes to add to the panel')
+        context.abort()
+    store = context.obj['db']
+    count = store.add_panel(panel_id, genes, name=name)
+    store.save()
+    LOG.info("stored panel (%s) with %s transcripts", panel_id, count)
+
+
+@panel.command()
+@click.argument('panel_id')
+@click.pass_context
+def remove(context, panel_id):
+    """Remove a panel from the database."""
+    store = context.obj['db']
+    if not store.remove_panel(panel_id):
+        LOG.warning('panel (%s) not found in database', panel_id)
+        context.abort()
+    store.save()
+    LOG.info('removed panel (%s)', panel_id)
+
+
+@panel.command('list')
+@click.pass_context
+def list_cmd(context):
+    """List stored panels with the number of transcripts in each."""
+    query = (context.obj['db'].query(Panel.id, Panel.name,
+                                     func.count(PanelTranscript.transcript_key))
+                              .outerjoin(Panel.transcripts)
+                              .group_by(Panel.id, Panel.name)
+                              .order_by(Panel.id))
+    for panel_id, name, count in query:
+        click.echo("{}\t{}\t{}".format(panel_id, name or '', count))
+
+
+@panel.command()
+@click.option('-i', '--panel-id', help='panel to update, default: all')
+@click.pass_context
+def summarize(context, panel_id):
+    """Precompute mean statistics per sample for panels."""
+    store = context.obj['db']
+    count = store.update_panel_stats(panel_id=panel_id)
+    store.save()
+    LOG.info("stored %s panel summaries", count)
+
+
+@panel.command()
+@click.option('-p', '--pretty', is_flag=True)
+@click.option('-s', '--sample', multiple=True, help='sample to limit query to')
+@click.option('--precomputed', is_flag=True,
+              help="read summaries stored by 'panel summarize'")
+@click.argument('panel_id')
+@click.pass_context
+def coverage(context, panel_id, sample, precomputed, pretty):
+    """Calculate mean statistics over the transcripts in a panel."""
+    store = context.obj['db']
+    if precomputed:
+        query = store.panel_stats(panel_id, sample_ids=sample)
+    else:
+        query = store.panel_metrics(panel_id, sample_ids=sample)
+    columns = ['sample_id'] + STAT_COLUMNS
+    for result in query:
+        row = {column: value for column, value in zip(columns, result)}
+        row['panel_id'] = panel_id
+        click.echo(dump_json(row, pretty=pretty))
@@ -1,13 +1,29 @@
 # -*- coding: utf-8 -*-
 import logging
+import os.path
+from subprocess import CalledProcessError
 
 import click
 
-from chanjo.sambamba import run_sambamba
+from chanjo.load.sambamba import histogram_levels, load_transcripts
+from chanjo.sambamba import run_sambamba, stream_sambamba
+from chanjo.store.api import ChanjoDB
+from chanjo.store.constants import COMPLETENESS_LEVELS
+from .load import save_result
 
 LOG = logging.getLogger(__name__)
 
 
+def exit_status(error):
+    """Translate an error from running sambamba to an exit status."""
+    if isinstance(error, CalledProcessError):
+        return error.returncode
+    if isinstance(error, OSError):
+        # like the shell does for missing commands
+        return 127
+    return None
+
+
 @click.command()
 @click.option('-r', '--regions', type=click.Path(exists=True), required=True,
               help='Path to a bed file with exon coordinates')
@@ -16,15 +32,64 @@ LOG = logging.getLogger(__name__)
                     "for each one an extra column will be added,"
                     "the percentage of bases in the region"
                     "where coverage is more than this value"))
+@click.option('--histogram-max', type=int,
+              help=('sample completeness at every level up to this one so '
+                    'any of them can be calculated from stored histograms'))
 @click.option('-o', '--outfile', type=click.Path(exists=False),
               help='Specify path to a file where results should be stored.')
+@click.option('-l', '--load', is_flag=True,
+              help='stream results straight into the database')
+@click.option('-s', '--sample', help='override sample id from BAM (--load)')
+@click.option('-g', '--group', help='id to group related samples (--load)')
+@click.option('-n', '--name', help='display name for sample (--load)')
+@click.option('-gn', '--group-name', help='display name for sample group (--load)')
+@click.option('--threshold', default=10,
+              help='completeness level to disqualify exons (--load)')
 @click.argument('bam_file', type=click.Path(exists=True))
 @click.pass_context
-def sambamba(context, bam_file, regions, cov_thresholds, outfile):
+def sambamba(context, bam_file, regions, cov_thresholds, histogram_max,
+             outfile, load, sample, group, name, group_name, threshold):
     """Run Sambamba from chanjo."""
     LOG.info("Running chanjo sambamba")
+    if histogram_max:
+        cov_thresholds = histogram_levels(histogram_max, cov_thresholds or
+                                          COMPLETENESS_LEVELS)
+    if load:
+        stream_load(context, bam_file, regions, cov_thresholds, sample=sample,
+                    group=group, name=name, group_name=group_name,
+                    threshold=threshold, histogram=bool(histogram_max))
+        return
+
+    run_metrics = context.obj['run_metrics']
+    try:
+        with run_metrics.phase('sambamba'):
+            run_sambamba(bam_file, regions, outfile, cov_thresholds)
+    except Exception as error:
+        run_metrics.set('sambamba_exit_status', exit_status(error))
+        LOG.exception('something went really wrong :_(')
+        context.abort()
+    run_metrics.set('sambamba_exit_status', 0)
+
+
+def stream_load(context, bam_file, regions, cov_thresholds, sample=None,
+                group=None, name=None, group_name=None, threshold=None,
+                histogram=False):
+    """Pipe sambamba output directly into the database."""
+    chanjo_db = ChanjoDB(uri=context.obj['database'])
+    run_metrics = context.obj['run_metrics']
+    source = os.path.abspath(bam_file)
     try:
-        run_sambamba(bam_file, regions, outfile, cov_thresholds)
-    except Exception:
+        # parsing runs while sambamba streams so they are timed together
+        with run_metrics.phase('sambamba'):
+            with stream_sambamba(bam_file, regions, cov_thresholds or
+                                 COMPLETENESS_LEVELS) as lines:
+                result = load_transcripts(
+                    run_metrics.counted(lines, 'rows_parsed'),
+                    sample_id=sample, group_id=group, source=source,
+                    threshold=threshold, histogram=histogram)
+    except Exception as error:
+        run_metrics.set('sambamba_exit_status', exit_status(error))
         LOG.exception('something went really wrong :_(')
         context.abort()
+    run_metrics.set('sambamba_exit_status', 0)
+    save_result(context, chanjo_db, result, name=name, group_name=group_name)
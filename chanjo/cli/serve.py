@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+import logging
+
+import click
+
+from chanjo.serve import serve as run_server
+from chanjo.store.api import ChanjoDB
+
+LOG = logging.getLogger(__name__)
+
+
+@click.command()
+@click.option('-H', '--host', default='127.0.0.1', show_default=True,
+              help='interface to listen on')
+@click.option('-P', '--port', default=8000, show_default=True,
+              help='port to listen on')
+@click.option('--cache-size', default=256, show_default=True,
+              help='max number of cached responses, 0 to disable')
+@click.pass_context
+def serve(context, host, port, cache_size):
+    """Serve read-only coverage queries over HTTP/JSON."""
+    chanjo_db = ChanjoDB(uri=context.obj['database'])
+    run_server(chanjo_db, host=host, port=port, cache_size=cache_size)
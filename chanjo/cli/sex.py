@@ -3,24 +3,60 @@ import logging
 
 import click
 
-from chanjo.sex import sex_from_bam
+from chanjo.sex import drop_cached, read_cache, sex_from_bams, write_cache
+from .calculate import dump_json
 
 LOG = logging.getLogger(__name__)
 
 
 @click.command()
 @click.option('-p', '--prefix', default='', help='chromosome prefix')
-@click.argument('bam_path', type=click.Path(exists=True))
+@click.option('-m', '--manifest', type=click.File(encoding='utf-8'),
+              help='file with a BAM path in the first column of each line')
+@click.option('-j', '--jobs', default=1, help='number of BAM files in parallel')
+@click.option('--cache', type=click.Path(dir_okay=False),
+              help='JSON file to cache results in')
+@click.option('--refresh', is_flag=True,
+              help='ignore cached results for the given BAM files')
+@click.option('--json', 'as_json', is_flag=True, help='output JSON lines')
+@click.argument('bam_paths', nargs=-1, type=click.Path(exists=True))
 @click.pass_context
-def sex(context, prefix, bam_path):
-    """Guess the sex of a BAM alignment."""
+def sex(context, prefix, manifest, jobs, cache, refresh, as_json, bam_paths):
+    """Guess the sex of BAM alignments."""
+    bam_paths = list(bam_paths)
+    if manifest:
+        bam_paths.extend(line.split('\t')[0].strip() for line in manifest
+                         if line.strip() and not line.startswith('#'))
+    if not bam_paths:
+        LOG.error('provide BAM files or a manifest')
+        context.abort()
+
+    cached = read_cache(cache) if cache else {}
+    if refresh:
+        # other BAM files keep their cached results
+        cached = drop_cached(cached, bam_paths)
     try:
-        result = sex_from_bam(bam_path, prefix=prefix)
-    except Exception:
-        LOG.exception('Something went really wrong :(')
+        results = sex_from_bams(bam_paths, prefix=prefix, jobs=jobs,
+                                cache=cached)
+    except OSError as error:
+        LOG.error("can't read BAM file: %s", error.filename)
         context.abort()
+    if cache:
+        write_cache(cache, cached)
 
     # print the results to the console for pipeability (csv)
-    click.echo("#{prefix}X_coverage\t{prefix}Y_coverage\tsex"
-               .format(prefix=prefix))
-    click.echo('\t'.join(map(str, result)))
+    if not as_json:
+        click.echo("#bam\t{prefix}X_coverage\t{prefix}Y_coverage\tsex"
+                   .format(prefix=prefix))
+    failed = 0
+    for bam_path, guess, _ in results:
+        if guess is None:
+            failed += 1
+        elif as_json:
+            row = dict(guess._asdict(), bam=bam_path)
+            click.echo(dump_json(row))
+        else:
+            click.echo('\t'.join(map(str, (bam_path,) + tuple(guess))))
+    if failed:
+        LOG.error("failed to guess sex for %s BAM files", failed)
+        context.abort()
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""Coverage engine for per-base depth tracks (bedGraph).
+
+Calculates the same metrics as "sambamba depth region" (mean coverage and
+percentage of bases covered at each threshold) from an existing depth
+track. The track is read in a single sweep together with the regions, so
+there is no need for a second pass over the BAM alignment.
+"""
+from __future__ import division
+from bisect import bisect_right
+from itertools import groupby
+from operator import itemgetter
+import logging
+
+from chanjo.exc import BedFormattingError
+from chanjo.store.constants import COMPLETENESS_LEVELS
+
+log = logging.getLogger(__name__)
+
+
+def read_regions(handle):
+    """Parse regions from a (chanjo) BED file.
+
+    Args:
+        handle (iterable): BED lines
+
+    Returns:
+        List[tuple]: chrom, start, end, and list of extra columns per region
+
+    Raises:
+        BedFormattingError: failure to parse first three columns
+    """
+    regions = []
+    for line in handle:
+        if line.startswith(('#', 'track', 'browser')) or not line.strip():
+            continue
+        row = line.rstrip('\r\n').split('\t')
+        try:
+            regions.append((row[0], int(row[1]), int(row[2]), row[3:]))
+        except IndexError:
+            raise BedFormattingError('make sure fields are tab-separated')
+        except ValueError:
+            raise BedFormattingError("positions malformatted: {}".format(row))
+    return regions
+
+
+def read_bedgraph(handle):
+    """Parse a bedGraph depth track.
+
+    Args:
+        handle (iterable): bedGraph lines
+
+    Yields:
+        tuple: chrom, start, end, depth
+
+    Raises:
+        BedFormattingError: if a row can't be parsed
+    """
+    for line in handle:
+        if line.startswith(('#', 'track', 'browser')) or not line.strip():
+            continue
+        row = line.split()
+        try:
+            yield row[0], int(row[1]), int(row[2]), float(row[3])
+        except (IndexError, ValueError):
+            raise BedFormattingError("malformatted bedGraph row: {}"
+                                     .format(line))
+
+
+def region_depth(regions, intervals, thresholds=COMPLETENESS_LEVELS,
+                 sample_name=None):
+    """Calculate coverage metrics for each region from depth intervals.
+
+    The depth intervals must be grouped by chromosome and sorted by position
+    within each chromosome, like ``sort -k1,1 -k2,2n`` output. The regions
+    can be in any order. Bases not covered by any interval count as zero
+    depth.
+
+    Args:
+        regions (List[tuple]): regions from ``read_regions``
+        intervals (iterable): depth intervals from ``read_bedgraph``
+        thresholds (Optional[List[int]]): levels to sample completeness at
+        sample_name (Optional[str]): sample name to annotate records with
+
+    Yields:
+        dict: record per region in input order, same as ``depth_output``
+
+    Raises:
+        BedFormattingError: if the depth intervals aren't sorted
+    """
+    thresholds = sorted(thresholds)
+    sums = [0.] * len(regions)
+    counts = [[0] * len(thresholds) for _ in regions]
+
+    by_chrom = {}
+    for index, region in enumerate(regions):
+        by_chrom.setdefault(region[0], []).append(index)
+    for indexes in by_chrom.values():
+        indexes.sort(key=lambda index: regions[index][1])
+
+    seen_chroms = set()
+    for chrom, chrom_intervals in groupby(intervals, key=itemgetter(0)):
+        if chrom in seen_chroms:
+            # the sweep would restart at the first region of the chromosome
+            raise BedFormattingError("depth track not grouped by chromosome: {}"
+                                     .format(chrom))
+        seen_chroms.add(chrom)
+        if chrom in by_chrom:
+            sweep(regions, by_chrom[chrom], chrom_intervals, thresholds,
+                  sums, counts)
+    for region_counts in counts:
+        # bases were counted at the highest level passed only
+        for level in reversed(range(len(thresholds) - 1)):
+            region_counts[level] += region_counts[level + 1]
+
+    for index, (chrom, start, end, extra_fields) in enumerate(regions):
+        length = end - start
+        data = {
+            'chrom': chrom,
+            'chromStart': start,
+            'chromEnd': end,
+            'sampleName': sample_name,
+            'readCount': None,
+            'meanCoverage': (sums[index] / length) if length else 0.,
+            'thresholds': {threshold: ((100 * count / length) if length else 0.)
+                           for threshold, count in zip(thresholds, counts[index])},
+            'extraFields': extra_fields,
+        }
+        yield data
+
+
+def sweep(regions, indexes, intervals, thresholds, sums, counts):
+    """Add up depth intervals for the regions on a single chromosome.
+
+    Args:
+        regions (List[tuple]): all regions
+        indexes (List[int]): region indexes on the chromosome, sorted by start
+        intervals (iterable): sorted depth intervals on the chromosome
+        thresholds (List[int]): sorted completeness levels
+        sums (List[float]): running sum of depth per region (updated)
+        counts (List[List[int]]): bases with the depth in the bucket
+            between each level and the next (updated)
+
+    Raises:
+        BedFormattingError: if the depth intervals aren't sorted
+    """
+    active = []
+    next_region = 0
+    last_end = 0
+    for chrom, start, end, depth in intervals:
+        if start < last_end:
+            raise BedFormattingError("depth track not sorted: {}:{}"
+                                     .format(chrom, start))
+        last_end = end
+
+        # activate regions that start before the end of the interval
+        while next_region < len(indexes) and regions[indexes[next_region]][1] < end:
+            active.append(indexes[next_region])
+            next_region += 1
+        if not active:
+            if next_region == len(indexes):
+                # all regions on the chromosome have been covered
+                break
+            continue
+
+        levels_passed = bisect_right(thresholds, depth)
+        still_active = []
+        for index in active:
+            region_start, region_end = regions[index][1:3]
+            overlap = min(end, region_end) - max(start, region_start)
+            if overlap > 0:
+                sums[index] += depth * overlap
+                if levels_passed:
+                    counts[index][levels_passed - 1] += overlap
+            if region_end > end:
+                still_active.append(index)
+        active = still_active
+
+
+def format_sambamba(records, thresholds=COMPLETENESS_LEVELS):
+    """Format records like the "sambamba depth region" output.
+
+    Reads are not counted: "readCount" is None in the records and written
+    as "0". A missing sample name is written as an empty column.
+
+    Args:
+        records (iterable): records from ``region_depth``
+        thresholds (Optional[List[int]]): completeness levels in the records
+
+    Yields:
+        str: header and output lines
+    """
+    thresholds = sorted(thresholds)
+    header_written = False
+    for record in records:
+        if not header_written:
+            extra_columns = ["F{}".format(index + 3) for index
+                             in range(len(record['extraFields']))]
+            columns = (['# chrom', 'chromStart', 'chromEnd'] + extra_columns +
+                       ['readCount', 'meanCoverage'] +
+                       ["percentage{}".format(level) for level in thresholds] +
+                       ['sampleName'])
+            yield '\t'.join(columns) + '\n'
+            header_written = True
+        row = ([record['chrom'], str(record['chromStart']),
+                str(record['chromEnd'])] + record['extraFields'] +
+               ['0', "{:g}".format(record['meanCoverage'])] +
+               ["{:g}".format(record['thresholds'][level]) for level in thresholds] +
+               [record['sampleName'] or ''])
+        yield '\t'.join(row) + '\n'
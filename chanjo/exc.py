@@ -3,3 +3,11 @@
 
 class BedFormattingError(Exception):
     pass
+
+
+class ManifestFormattingError(Exception):
+    pass
+
+
+class MultipleSamplesError(Exception):
+    pass
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+from sqlalchemy import types
+from sqlalchemy.sql import func
+
+from chanjo.store.models import ExonRegion, ExonStat, Sample
+
+# bytes per packed float32 value
+VALUE_SIZE = 4
+
+
+class ExonMixin:
+
+    """Methods for exon level stats in the shared exon ordering."""
+
+    def exon_positions(self):
+        """Map exon positions to their index in the exon ordering.
+
+        Returns:
+            dict: (chrom, start, end) -> index
+        """
+        query = self.query(ExonRegion.chromosome, ExonRegion.start,
+                           ExonRegion.end, ExonRegion.id)
+        return {(chrom, start, end): index for chrom, start, end, index in query}
+
+    def add_exon_regions(self, exons):
+        """Append new exons to the end of the exon ordering.
+
+        Exons that are already part of the ordering are ignored. The new
+        exons are bulk inserted in the current transaction, persist them
+        using ``save``.
+
+        Args:
+            exons (List[tuple]): chrom, start, end per exon
+
+        Returns:
+            int: number of exons appended
+        """
+        positions = self.exon_positions()
+        next_index = len(positions)
+        new_exons = [exon for exon in exons if exon not in positions]
+        rows = ({'id': index, 'chromosome': chrom, 'start': start, 'end': end}
+                for index, (chrom, start, end)
+                in enumerate(new_exons, start=next_index))
+        self.bulk_insert(ExonRegion.__table__, rows)
+        return len(new_exons)
+
+    def exon_index(self, chromosome, start, end):
+        """Find the indexes of exons overlapping a genomic region.
+
+        Args:
+            chromosome (str): contig id
+            start (int): start position (0-based)
+            end (int): end position
+
+        Returns:
+            List[int]: sorted exon indexes
+        """
+        query = (self.query(ExonRegion.id)
+                     .filter(ExonRegion.chromosome == chromosome,
+                             ExonRegion.start < end, ExonRegion.end > start)
+                     .order_by(ExonRegion.id))
+        return [index for index, in query]
+
+    def exon_stats(self, metric='mean_coverage', sample_ids=None, start=0,
+                   end=None):
+        """Fetch a slice of exon level stats across samples.
+
+        Only the requested range of each packed array is read from the
+        database.
+
+        Args:
+            metric (Optional[str]): "mean_coverage" or "completeness_XX"
+            sample_ids (Optional[List[str]]): samples to limit query to
+            start (Optional[int]): first exon index
+            end (Optional[int]): exon index to stop before, default: all
+
+        Returns:
+            dict: sample id -> array of float values, NaN if missing
+        """
+        if end is None:
+            data_column = ExonStat.data
+        else:
+            data_column = func.substr(ExonStat.data, start * VALUE_SIZE + 1,
+                                      (end - start) * VALUE_SIZE,
+                                      type_=types.LargeBinary)
+        query = (self.query(Sample.id, data_column)
+                     .select_from(ExonStat)
+                     .join(ExonStat.sample)
+                     .filter(ExonStat.metric == metric))
+        if sample_ids:
+            query = query.filter(Sample.id.in_(sample_ids))
+
+        results = {}
+        for sample_id, data in query:
+            values = ExonStat.unpack(data or b'')
+            if end is None:
+                values = values[start:]
+            elif len(values) < end - start:
+                # samples loaded before exons were appended to the ordering
+                values.extend([float('nan')] * (end - start - len(values)))
+            results[sample_id] = values
+        return results
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""Prebuilt, linked SQLite databases to copy new databases from.
+
+Linking a full transcript BED file takes a while and used to be repeated
+for every new database. A template is linked once per BED file and cached.
+Templates are named by a checksum of the BED file and a version of the
+database schema, a JSON file next to each template records both together
+with a checksum of the template itself. A template is stale if any of them
+don't match, e.g. after upgrading chanjo, and is then rebuilt.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+
+from sqlalchemy.engine.url import make_url
+
+from chanjo import __version__
+from chanjo.load.fingerprint import fingerprint
+from chanjo.load.link import link_elements
+from chanjo.load.stream import open_text
+from chanjo.store.api import ChanjoDB, build_uri
+from chanjo.store.models import BASE
+
+TEMPLATE_SUFFIX = '.sqlite3'
+META_SUFFIX = '.json'
+
+log = logging.getLogger(__name__)
+
+
+def cache_dir():
+    """Return the default directory to cache templates in."""
+    cache_home = os.environ.get('XDG_CACHE_HOME') or '~/.cache'
+    return os.path.join(os.path.expanduser(cache_home), 'chanjo', 'templates')
+
+
+def schema_version():
+    """Summarize the database schema as a short, stable id.
+
+    Returns:
+        str: hash of table and column definitions
+    """
+    digest = hashlib.sha1()
+    for table in sorted(BASE.metadata.tables.values(), key=lambda t: t.name):
+        for column in table.columns:
+            digest.update("{}.{}:{}".format(table.name, column.name,
+                                            column.type).encode('utf-8'))
+    return digest.hexdigest()[:12]
+
+
+def file_checksum(path):
+    """Hash the full content of a file."""
+    with open(path, 'rb') as handle:
+        return fingerprint([handle], full=True)
+
+
+def template_path(bed_checksum, directory):
+    """Compose the path to the template for a BED file.
+
+    Args:
+        bed_checksum (str): full checksum of the BED file
+        directory (path): directory with cached templates
+
+    Returns:
+        str: path to the template database
+    """
+    bed_hash = bed_checksum.split(':')[-1][:12]
+    name = "{}-{}{}".format(bed_hash, schema_version(), TEMPLATE_SUFFIX)
+    return os.path.join(directory, name)
+
+
+def read_meta(path):
+    """Read the metadata of a template, None if missing or unreadable."""
+    try:
+        with open(path + META_SUFFIX) as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return None
+
+
+def is_fresh(path, bed_checksum=None):
+    """Check that a template matches its metadata and the current schema.
+
+    Args:
+        path (path): path to the template database
+        bed_checksum (Optional[str]): checksum the BED file should match
+
+    Returns:
+        bool: whether the template can be used as-is
+    """
+    meta = read_meta(path)
+    if meta is None or not os.path.exists(path):
+        return False
+    if meta['schema'] != schema_version():
+        log.info("template schema %s is outdated", meta['schema'])
+        return False
+    if bed_checksum and meta['bed_checksum'] != bed_checksum:
+        log.info('template was built from a different BED file')
+        return False
+    if meta['checksum'] != file_checksum(path):
+        log.warning("template was modified: %s", path)
+        return False
+    return True
+
+
+def build_template(bed_path, directory=None, force=False):
+    """Link a BED file into a template database, unless already cached.
+
+    Args:
+        bed_path (path): chanjo BED file with transcripts/exons
+        directory (Optional[path]): directory to cache templates in
+        force (Optional[bool]): rebuild even if a fresh template exists
+
+    Returns:
+        str: path to the template database
+    """
+    directory = directory or cache_dir()
+    bed_checksum = file_checksum(bed_path)
+    path = template_path(bed_checksum, directory)
+    if not force and is_fresh(path, bed_checksum=bed_checksum):
+        log.debug("using cached template: %s", path)
+        return path
+
+    log.info("building template from %s", bed_path)
+    start = time.time()
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    temp_path = "{}.{}.tmp".format(path, os.getpid())
+    chanjo_db = ChanjoDB(uri="sqlite:///{}".format(temp_path))
+    try:
+        chanjo_db.set_up()
+        with open(bed_path, 'rb') as handle:
+            result = link_elements(open_text(handle))
+            chanjo_db.add_exon_regions(result.exons)
+            tx_keys = chanjo_db.add_transcripts(result.models)
+        chanjo_db.save()
+    finally:
+        chanjo_db.session.close()
+        chanjo_db.engine.dispose()
+
+    meta = {
+        'bed': os.path.abspath(bed_path),
+        'bed_checksum': bed_checksum,
+        'schema': schema_version(),
+        'chanjo_version': __version__,
+        'checksum': file_checksum(temp_path),
+        'transcripts': len(tx_keys),
+        'exons': len(result.exons),
+        'created': time.time(),
+    }
+    os.replace(temp_path, path)
+    with open(path + META_SUFFIX + '.tmp', 'w') as handle:
+        json.dump(meta, handle, indent=2, sort_keys=True)
+    os.replace(path + META_SUFFIX + '.tmp', path + META_SUFFIX)
+    log.info("linked %s transcripts into template in %.1f s: %s",
+             len(tx_keys), time.time() - start, path)
+    return path
+
+
+def clone_template(path, target_path, force=False, verify=True):
+    """Copy a template to create a new database.
+
+    Args:
+        path (path): path to the template database
+        target_path (path): path to the new SQLite database
+        force (Optional[bool]): overwrite an existing database
+        verify (Optional[bool]): check the template isn't stale first
+
+    Raises:
+        OSError: if the target exists and not forced
+        ValueError: if the template is stale or modified
+    """
+    if os.path.exists(target_path) and not force:
+        raise OSError("database already exists: {}".format(target_path))
+    if verify and not is_fresh(path):
+        raise ValueError("template is stale, rebuild it: {}".format(path))
+    target_dir = os.path.dirname(os.path.abspath(target_path))
+    if not os.path.isdir(target_dir):
+        os.makedirs(target_dir)
+    temp_path = "{}.{}.tmp".format(target_path, os.getpid())
+    shutil.copyfile(path, temp_path)
+    os.replace(temp_path, target_path)
+    log.info("created database from template: %s", target_path)
+
+
+def create_database(db_uri, bed_path=None, directory=None, force=False):
+    """Set up a new database, copied from a linked template if possible.
+
+    Only SQLite databases can be copied, others are set up empty.
+
+    Args:
+        db_uri (str): path/URI to the new database
+        bed_path (Optional[path]): chanjo BED file to link transcripts from
+        directory (Optional[path]): directory to cache templates in
+        force (Optional[bool]): overwrite an existing database
+
+    Returns:
+        bool: whether the transcripts are linked
+    """
+    url = make_url(build_uri(db_uri))
+    if bed_path and url.drivername == 'sqlite' and url.database:
+        path = build_template(bed_path, directory=directory)
+        # just checked when looking up the template
+        clone_template(path, url.database, force=force, verify=False)
+        return True
+
+    if bed_path:
+        log.warning("templates only work for SQLite, link transcripts instead")
+    ChanjoDB(db_uri).set_up()
+    return False
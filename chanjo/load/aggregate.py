@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""Sum up length weighted exon metrics per transcript.
+
+Exons are often shared between transcripts of the same gene. The
+contributions of an exon (length times each metric) are computed once, into
+arrays with a fixed position per completeness level, and then summed by
+position for each transcript that includes the exon. Additions happen in the
+same order as in ``sambamba.tx_sums`` so results are identical, bit for bit.
+"""
+from __future__ import division
+from functools import reduce
+from operator import add, or_
+
+from chanjo.store.constants import COMPLETENESS_LEVELS
+from chanjo.store.models import Exon
+
+
+class ExonAggregator:
+
+    """Aggregate exon metrics per transcript, reusing per exon work.
+
+    Args:
+        threshold (Optional[int]): completeness level to disqualify exons
+        levels (Optional[List[int]]): completeness levels to sum up
+    """
+
+    def __init__(self, threshold=None, levels=COMPLETENESS_LEVELS):
+        self.threshold = threshold
+        self.levels = list(levels)
+        self.columns = ["completeness_{}".format(level) for level in levels]
+        self.contributions = {}
+
+    def contribution(self, exon):
+        """Compute the length weighted contributions of an exon once.
+
+        Args:
+            exon (dict): exon record like the ones from ``depth_output``
+
+        Returns:
+            tuple: exon length, weighted mean coverage, weighted completeness
+                per level (0 if missing), bit mask of levels present, and
+                the exon if incomplete at the threshold (else None)
+        """
+        cached = self.contributions.get(id(exon))
+        # the record keeps the exon alive, ids can't be reused meanwhile
+        if cached is not None and cached[0] is exon:
+            return cached[1]
+
+        exon_length = exon['chromEnd'] - exon['chromStart']
+        thresholds = exon['thresholds']
+        weighted = []
+        present = 0
+        incomplete_exon = None
+        for index, level in enumerate(self.levels):
+            completeness = thresholds.get(level)
+            if completeness is None:
+                weighted.append(0)
+                continue
+            present |= 1 << index
+            weighted.append(completeness * exon_length)
+            if level == self.threshold and completeness < 100:
+                incomplete_exon = Exon(exon['chrom'], exon['chromStart'],
+                                       exon['chromEnd'], completeness)
+
+        record = (exon_length, exon['meanCoverage'] * exon_length, weighted,
+                  present, incomplete_exon)
+        self.contributions[id(exon)] = (exon, record)
+        return record
+
+    def sums(self, exons):
+        """Sum up length weighted metrics over the exons of a transcript.
+
+        Args:
+            exons (List[dict]): exons of one transcript
+
+        Returns:
+            tuple: dict of summed metrics, list of incomplete exons (same as
+                ``sambamba.tx_sums``)
+        """
+        records = [self.contribution(exon) for exon in exons]
+        if not records:
+            return {'bases': 0, 'mean_coverage': 0}, []
+
+        # reduce adds up left to right like the plain loop, unlike ``sum``
+        # which may compensate rounding errors for floats
+        lengths, means, weighted, present, incomplete = zip(*records)
+        sums = {'bases': reduce(add, lengths, 0),
+                'mean_coverage': reduce(add, means, 0)}
+        present = reduce(or_, present, 0)
+        for index, column in enumerate(zip(*weighted)):
+            if present & (1 << index):
+                sums[self.columns[index]] = reduce(add, column, 0)
+        incomplete_exons = [exon for exon in incomplete if exon is not None]
+        return sums, incomplete_exons
+
+    def stat(self, exons):
+        """Calculate metrics for a transcript stat model.
+
+        Args:
+            exons (List[dict]): exons of one transcript
+
+        Returns:
+            dict: aggregated stats over all exons (same as
+                ``sambamba.tx_stat``)
+        """
+        sums, incomplete_exons = self.sums(exons)
+        bases = sums.pop('bases')
+        fields = {key: (value / bases) for key, value in sums.items()}
+        fields['incomplete_exons'] = incomplete_exons
+        fields['threshold'] = self.threshold
+        return fields
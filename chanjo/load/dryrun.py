@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""Run the load pipeline without a database to validate and time input.
+
+Every stage (parse, group, stats) is run to completion before the next one
+starts so the time spent in each one can be reported separately.
+"""
+from __future__ import division
+from collections import namedtuple
+import time
+
+from chanjo.metrics import peak_rss
+from .aggregate import ExonAggregator
+from .utils import groupby_tx
+
+Report = namedtuple('Report', ['rows', 'transcripts', 'stages', 'peak_rss',
+                               'problems'])
+
+
+def dry_run(exons, threshold=None, parse_errors=None):
+    """Process parsed exons all the way to transcript stats.
+
+    Args:
+        exons (iterable): exon records like the ones from ``depth_output``
+        threshold (Optional[int]): completeness level to disqualify exons
+        parse_errors (Optional[list]): line number and error for each row
+            skipped while parsing (filled in as ``exons`` are consumed)
+
+    Returns:
+        Report: counts, seconds per stage, peak memory, and problems found
+    """
+    stages = []
+    start = time.time()
+    exons = list(exons)
+    stages.append(('parse', time.time() - start))
+    problems = ["line {}: {}".format(line_number, describe_error(error))
+                for line_number, error in parse_errors or []]
+
+    start = time.time()
+    transcripts = groupby_tx(exons, sambamba=True)
+    stages.append(('group', time.time() - start))
+
+    start = time.time()
+    problems.extend(validate_exons(exons))
+    problems.extend(validate_transcripts(transcripts))
+    stages.append(('validate', time.time() - start))
+
+    start = time.time()
+    aggregator = ExonAggregator(threshold=threshold)
+    for tx_id, tx_exons in transcripts.items():
+        try:
+            aggregator.stat(tx_exons)
+        except ZeroDivisionError:
+            problems.append("{}: no exon bases".format(tx_id))
+    stages.append(('stats', time.time() - start))
+
+    return Report(rows=len(exons), transcripts=len(transcripts),
+                  stages=stages, peak_rss=peak_rss(), problems=problems)
+
+
+def describe_error(error):
+    """Describe why a row couldn't be parsed.
+
+    Args:
+        error (Exception): error raised while parsing the row
+
+    Returns:
+        str: description of the problem
+    """
+    if isinstance(error, IndexError):
+        return 'missing columns'
+    return "malformed value ({})".format(error)
+
+
+def validate_exons(exons):
+    """Check exon records for inconsistencies.
+
+    Args:
+        exons (List[dict]): exon records
+
+    Yields:
+        str: description of each problem found
+    """
+    levels = None
+    for exon in exons:
+        position = "{}:{}-{}".format(exon['chrom'], exon['chromStart'],
+                                     exon['chromEnd'])
+        if exon['chromEnd'] <= exon['chromStart']:
+            yield "{}: empty or inverted exon".format(position)
+        if exon['meanCoverage'] < 0:
+            yield "{}: negative mean coverage".format(position)
+
+        exon_levels = sorted(exon['thresholds'])
+        if levels is None:
+            levels = exon_levels
+        elif exon_levels != levels:
+            yield ("{}: thresholds {} differ from {}"
+                   .format(position, exon_levels, levels))
+        values = [exon['thresholds'][level] for level in exon_levels]
+        if any(value < 0 or value > 100 for value in values):
+            yield "{}: completeness out of range".format(position)
+        elif any(higher > lower for lower, higher in zip(values, values[1:])):
+            yield "{}: completeness increases with level".format(position)
+
+
+def validate_transcripts(transcripts):
+    """Check exons grouped per transcript for inconsistencies.
+
+    Args:
+        transcripts (dict): exons grouped per transcript id
+
+    Yields:
+        str: description of each problem found
+    """
+    for tx_id, tx_exons in transcripts.items():
+        chromosomes = set(exon['chrom'] for exon in tx_exons)
+        if len(chromosomes) > 1:
+            yield ("{}: exons on multiple chromosomes: {}"
+                   .format(tx_id, ', '.join(sorted(chromosomes))))
+
+
+def format_report(report):
+    """Format a throughput report as tab-separated lines.
+
+    Args:
+        report (Report): output from ``dry_run``
+
+    Yields:
+        str: report line
+    """
+    seconds = sum(stage_seconds for _, stage_seconds in report.stages)
+    yield "rows\t{}".format(report.rows)
+    yield "transcripts\t{}".format(report.transcripts)
+    yield "rows/s\t{:.0f}".format(report.rows / seconds if seconds else 0)
+    yield "transcripts/s\t{:.0f}".format(report.transcripts / seconds
+                                         if seconds else 0)
+    if report.peak_rss is not None:
+        yield "peak RSS (MB)\t{:.1f}".format(report.peak_rss / 1024 ** 2)
+    for name, stage_seconds in report.stages:
+        yield "{} (s)\t{:.3f}".format(name, stage_seconds)
+    yield "problems\t{}".format(len(report.problems))
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+import logging
+
+from chanjo.store.models import ExonStat
+
+log = logging.getLogger(__name__)
+
+
+def make_models(exons, positions):
+    """Pack exon level metrics for a sample, one model per metric.
+
+    The models are linked by attaching them to the sample model.
+
+    Args:
+        exons (iterable): exon records like the ones from ``depth_output``
+        positions (dict): (chrom, start, end) -> position in the ordering
+
+    Returns:
+        List[ExonStat]: one packed array per metric
+    """
+    arrays = {}
+    missing = 0
+    for exon in exons:
+        position = positions.get((exon['chrom'], exon['chromStart'],
+                                  exon['chromEnd']))
+        if position is None:
+            missing += 1
+            continue
+        metrics = [('mean_coverage', exon['meanCoverage'])]
+        metrics += [("completeness_{}".format(level), completeness)
+                    for level, completeness in exon['thresholds'].items()]
+        for metric, value in metrics:
+            if metric not in arrays:
+                arrays[metric] = [float('nan')] * len(positions)
+            arrays[metric][position] = value
+
+    if missing:
+        log.warning("%s exons not linked, skipping exon stats for them", missing)
+    return [ExonStat(metric=metric, data=ExonStat.pack(values))
+            for metric, values in sorted(arrays.items())]
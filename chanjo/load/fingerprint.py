@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""Fingerprint input files to recognize them when they are loaded again.
+
+The default fingerprint only reads a few blocks spread across the file,
+combined with the size and modification time, which takes milliseconds
+even for huge files. A full hash of the content is available as well.
+Files are read by offset so the position of the handles isn't moved.
+"""
+import hashlib
+import os
+import stat
+
+# blocks to sample across the file and bytes per block
+SAMPLE_BLOCKS = 16
+BLOCK_SIZE = 64 * 1024
+# bytes per read when hashing the full content
+FULL_BLOCK_SIZE = 1024 * 1024
+
+
+def fingerprint(handles, full=False):
+    """Compute a fingerprint of one or more open input files.
+
+    Args:
+        handles (List[file]): binary file handles
+        full (Optional[bool]): hash the full content instead of sampling
+
+    Returns:
+        str: hex fingerprint prefixed by the method, None for streams
+    """
+    digest = hashlib.sha1()
+    for handle in handles:
+        try:
+            file_no = handle.fileno()
+        except (AttributeError, OSError, ValueError):
+            return None
+        file_stat = os.fstat(file_no)
+        if not stat.S_ISREG(file_stat.st_mode):
+            return None
+
+        size = file_stat.st_size
+        if full:
+            digest.update(str(size).encode('utf-8'))
+            block_size = FULL_BLOCK_SIZE
+            offsets = range(0, size, block_size)
+        else:
+            digest.update("{}:{}".format(size, file_stat.st_mtime_ns)
+                          .encode('utf-8'))
+            block_size = BLOCK_SIZE
+            offsets = sample_offsets(size)
+        for offset in offsets:
+            digest.update(os.pread(file_no, block_size, offset))
+    method = 'sha1' if full else 'sampled'
+    return "{}:{}".format(method, digest.hexdigest())
+
+
+def sample_offsets(size, blocks=SAMPLE_BLOCKS, block_size=BLOCK_SIZE):
+    """Spread block offsets evenly across a file, including both ends.
+
+    Args:
+        size (int): file size in bytes
+        blocks (Optional[int]): max number of blocks
+        block_size (Optional[int]): bytes per block
+
+    Returns:
+        List[int]: sorted, unique offsets
+    """
+    last_offset = max(size - block_size, 0)
+    if blocks < 2 or last_offset == 0:
+        return [0]
+    step = last_offset / (blocks - 1)
+    return sorted(set(int(index * step) for index in range(blocks)))
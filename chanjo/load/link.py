@@ -6,7 +6,9 @@ from chanjo.store.models import Transcript
 from .parse import bed as parse_bed
 from .utils import groupby_tx
 
-Result = namedtuple('Result', ['models', 'count'])
+Result = namedtuple('Result', ['models', 'count', 'exons'])
+Diff = namedtuple('Diff', ['added', 'updated', 'removed'])
+LINK_COLUMNS = ('gene_id', 'gene_name', 'chromosome', 'length')
 log = logging.getLogger(__name__)
 
 
@@ -17,12 +19,16 @@ def link_elements(sequence):
         sequence (sequence): list of chanjo bed lines
 
     Returns:
-        Result: iterators of transcript models, number of transcripts processed
+        Result: iterators of transcript models, number of transcripts
+            processed, sorted list of unique exon positions
     """
     exons = parse_bed.chanjo(sequence)
     transcripts = groupby_tx(exons)
     models = (make_model(tx_id, exons) for tx_id, exons in transcripts.items())
-    return Result(models=models, count=len(transcripts))
+    positions = set((exon['chrom'], exon['chromStart'], exon['chromEnd'])
+                    for tx_exons in transcripts.values() for exon in tx_exons)
+    return Result(models=models, count=len(transcripts),
+                  exons=sorted(positions))
 
 
 def make_model(transcript_id, exons):
@@ -35,12 +41,52 @@ def make_model(transcript_id, exons):
     Returns:
         Transcript: uncommitted transcript model
     """
+    tx_model = Transcript(id=transcript_id,
+                          **transcript_fields(transcript_id, exons))
+    return tx_model
+
+
+def transcript_fields(transcript_id, exons):
+    """Collect the transcript columns from a list of exons.
+
+    Args:
+        transcript_id (str): unique transcript id
+        exons (List[dict]): list of exon dictionaries
+
+    Returns:
+        dict: values for ``LINK_COLUMNS``
+    """
     # assume the same chromosome and gene for all exons
     chromosome = exons[0]['chrom']
     gene_id = int(exons[0]['elements'][transcript_id]['gene_id'])
     gene_symbol = exons[0]['elements'][transcript_id]['symbol']
     tot_length = sum((exon['chromEnd'] - exon['chromStart']) for exon in exons)
-    tx_model = Transcript(id=transcript_id, chromosome=chromosome,
-                          length=tot_length, gene_id=gene_id,
-                          gene_name=gene_symbol)
-    return tx_model
+    return dict(chromosome=chromosome, length=tot_length, gene_id=gene_id,
+                gene_name=gene_symbol)
+
+
+def diff_transcripts(models, existing):
+    """Compare incoming transcripts to the ones already stored.
+
+    Args:
+        models (iterable): incoming transcript models
+        existing (dict): transcript id -> tuple of ``LINK_COLUMNS`` values
+
+    Returns:
+        Diff: new models, update mappings for changed transcripts, and
+            ids of stored transcripts missing from the incoming ones
+    """
+    added = []
+    updated = []
+    seen_ids = set()
+    for tx_model in models:
+        seen_ids.add(tx_model.id)
+        values = tuple(getattr(tx_model, column) for column in LINK_COLUMNS)
+        if tx_model.id not in existing:
+            added.append(tx_model)
+        elif values != tuple(existing[tx_model.id]):
+            mapping = dict(zip(LINK_COLUMNS, values))
+            mapping['id'] = tx_model.id
+            updated.append(mapping)
+    removed = sorted(set(existing) - seen_ids)
+    return Diff(added=added, updated=updated, removed=removed)
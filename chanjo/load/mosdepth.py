@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+from .parse import mosdepth
+from .sambamba import load_exons
+
+
+def load_transcripts(regions, thresholds, bed_lines, sample_id, group_id=None,
+                     source=None, threshold=None, histogram=False,
+                     exon_positions=None):
+    """Process mosdepth region output.
+
+    Args:
+        regions (sequence): lines from mosdepth "regions.bed.gz"
+        thresholds (sequence): lines from mosdepth "thresholds.bed.gz"
+        bed_lines (sequence): chanjo bed lines given to mosdepth
+        sample_id (str): unique sample id
+        group_id (Optional[str]): id to group samples
+        source (Optional[str]): path to coverage source (mosdepth output)
+        threshold (Optional[int]): completeness level to disqualify exons
+        histogram (Optional[bool]): store completeness at all levels
+        exon_positions (Optional[dict]): shared exon ordering for exon stats
+
+    Returns:
+        Result: iterators of `Transcript`, transcripts processed, sample model
+    """
+    lookup = mosdepth.region_lookup(bed_lines)
+    exons = mosdepth.regions_output(regions, thresholds, lookup,
+                                    sample_name=sample_id)
+    return load_exons(exons, sample_id=sample_id, group_id=group_id,
+                      source=source, threshold=threshold, histogram=histogram,
+                      exon_positions=exon_positions)
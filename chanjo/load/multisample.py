@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""Load sambamba output for several BAM files run together.
+
+Sambamba can process all BAM files of e.g. a family in one go and tags each
+row with the name of the sample. Rows are split by ``sampleName`` in a
+single pass over the output and transcript stats are then aggregated per
+sample, optionally in worker processes (one sample per task).
+"""
+from collections import OrderedDict
+import logging
+import multiprocessing
+
+from .aggregate import ExonAggregator
+from .link import transcript_fields
+from .sambamba import (Result, load_exons, make_model, sample_model,
+                       tx_fields)
+from .utils import groupby_tx
+
+log = logging.getLogger(__name__)
+
+
+def split_samples(exons):
+    """Partition exon records by sample name, keeping the order of rows.
+
+    Args:
+        exons (iterable): exon records like the ones from ``depth_output``
+
+    Returns:
+        OrderedDict: list of exon records per sample name in input order
+    """
+    samples = OrderedDict()
+    for exon in exons:
+        sample_name = exon['sampleName']
+        if sample_name not in samples:
+            samples[sample_name] = []
+        samples[sample_name].append(exon)
+    return samples
+
+
+def sample_sums(exons, threshold=None):
+    """Sum up metrics per transcript for the exons of one sample.
+
+    Args:
+        exons (List[dict]): exon records for a single sample
+        threshold (Optional[int]): completeness level to disqualify exons
+
+    Returns:
+        dict: tuple of sums, incomplete exons, and transcript columns per
+            transcript id
+    """
+    aggregator = ExonAggregator(threshold=threshold)
+    return {tx_id: aggregator.sums(tx_exons) +
+            (transcript_fields(tx_id, tx_exons),)
+            for tx_id, tx_exons in groupby_tx(exons, sambamba=True).items()}
+
+
+def load_samples(exons, group_id=None, source=None, threshold=None,
+                 histogram=False, exon_positions=None, jobs=1):
+    """Process parsed sambamba output with rows for one or more samples.
+
+    Args:
+        exons (iterable): exon records like the ones from ``depth_output``
+        group_id (Optional[str]): id to group samples
+        source (Optional[str]): path to coverage source (Sambamba)
+        threshold (Optional[int]): completeness level to disqualify exons
+        histogram (Optional[bool]): store completeness at all levels
+        exon_positions (Optional[dict]): shared exon ordering for exon stats
+        jobs (Optional[int]): worker processes to aggregate samples with
+
+    Returns:
+        List[Result]: one result per sample, in input order
+    """
+    samples = split_samples(exons)
+    log.info("found %s samples: %s", len(samples), ', '.join(samples))
+    if jobs > 1 and len(samples) > 1 and (histogram or exon_positions):
+        log.warning('histograms and exon stats are built in a single '
+                    'process, aggregating samples one at a time')
+    if jobs < 2 or len(samples) < 2 or histogram or exon_positions:
+        return [load_exons(sample_exons, sample_id=sample_id,
+                           group_id=group_id, source=source,
+                           threshold=threshold, histogram=histogram,
+                           exon_positions=exon_positions)
+                for sample_id, sample_exons in samples.items()]
+
+    tasks = [(sample_exons, threshold) for sample_exons in samples.values()]
+    pool = multiprocessing.Pool(min(jobs, len(tasks)))
+    try:
+        all_sums = pool.starmap(sample_sums, tasks)
+    finally:
+        pool.terminate()
+        pool.join()
+
+    results = []
+    for (sample_id, sample_exons), sums in zip(samples.items(), all_sums):
+        sample_obj = sample_model(sample_id, sample_exons, group_id=group_id,
+                                  source=source)
+        models = (make_model(sample_obj, tx_id,
+                             tx_fields(exon_sums, incomplete_exons,
+                                       threshold=threshold), link_fields)
+                  for tx_id, (exon_sums, incomplete_exons, link_fields)
+                  in sums.items())
+        results.append(Result(models=models, count=len(sums),
+                              sample=sample_obj))
+    return results
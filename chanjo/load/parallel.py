@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""Parse a single (huge) sambamba output file on multiple cores.
+
+The file is split at newline-aligned byte offsets and every chunk is parsed
+by a worker process which sums up metrics per transcript. Most transcripts
+end up in a single chunk and their sums are used as-is. Transcripts with
+exons in several chunks get the partial sums of each chunk added up in the
+parent, in file order. Floats of those transcripts can therefore differ from
+a serial ``load_transcripts`` in the last bits.
+"""
+from collections import namedtuple
+import logging
+import multiprocessing
+import os
+import stat
+
+from chanjo.exc import MultipleSamplesError
+from chanjo.store.models import Sample
+from .aggregate import ExonAggregator
+from .link import transcript_fields
+from .parse import sambamba
+from .sambamba import make_model, tx_fields
+from .stream import GZIP_MAGIC
+from .utils import groupby_tx
+
+# chunks per worker process, more chunks balance the load better
+CHUNKS_PER_JOB = 4
+
+Partial = namedtuple('Partial', ['sums', 'incomplete_exons', 'link_fields'])
+# like ``Result`` plus the number of parsed rows
+SplitResult = namedtuple('SplitResult', ['models', 'count', 'sample', 'rows'])
+log = logging.getLogger(__name__)
+
+
+def is_splittable(handle):
+    """Check if a binary stream is an uncompressed file on disk.
+
+    Args:
+        handle (file): binary file handle (or STDIN)
+
+    Returns:
+        bool: whether the file can be split into byte ranges
+    """
+    try:
+        file_stat = os.fstat(handle.fileno())
+    except (AttributeError, OSError, ValueError):
+        return False
+    if not stat.S_ISREG(file_stat.st_mode) or file_stat.st_size == 0:
+        return False
+    return handle.peek(2)[:2] != GZIP_MAGIC
+
+
+def chunk_ranges(handle, chunks):
+    """Split a file with a header line into newline-aligned byte ranges.
+
+    Args:
+        handle (file): binary file handle
+        chunks (int): number of ranges to aim for
+
+    Returns:
+        tuple: header line, list of (start, end) byte offsets
+    """
+    handle.seek(0, os.SEEK_END)
+    size = handle.tell()
+    handle.seek(0)
+    header_line = handle.readline()
+    data_start = handle.tell()
+    step = max((size - data_start) // chunks, 1)
+
+    offsets = [data_start]
+    for index in range(1, chunks):
+        # step back a byte to not skip a line starting right at the offset
+        handle.seek(data_start + index * step - 1)
+        handle.readline()
+        offset = handle.tell()
+        if offsets[-1] < offset < size:
+            offsets.append(offset)
+    offsets.append(size)
+    ranges = [(start, end) for start, end in zip(offsets[:-1], offsets[1:])
+              if start < end]
+    return header_line, ranges
+
+
+def read_exons(path, start, end, header):
+    """Parse the exons in a byte range of a sambamba output file.
+
+    Args:
+        path (str): path to sambamba output
+        start (int): offset of the first line
+        end (int): offset after the last line
+        header (dict): parsed header from ``expand_header``
+
+    Returns:
+        List[dict]: exon records
+    """
+    with open(path, 'rb') as handle:
+        handle.seek(start)
+        data = handle.read(end - start)
+    exons = []
+    for line in data.split(b'\n'):
+        row = line.decode('utf-8').strip()
+        if row:
+            exons.append(sambamba.expand_row(header, row.split('\t')))
+    return exons
+
+
+def parse_chunk(path, start, end, header, threshold=None):
+    """Sum up metrics per transcript for a chunk of sambamba output.
+
+    Args:
+        path (str): path to sambamba output
+        start (int): offset of the first line in the chunk
+        end (int): offset after the last line in the chunk
+        header (dict): parsed header from ``expand_header``
+        threshold (Optional[int]): completeness level to disqualify exons
+
+    Returns:
+        tuple: ``Partial`` per transcript id, set of sample names, and
+            number of parsed rows
+    """
+    exons = read_exons(path, start, end, header)
+    partials = {}
+    aggregator = ExonAggregator(threshold=threshold)
+    for tx_id, tx_exons in groupby_tx(exons, sambamba=True).items():
+        sums, incomplete_exons = aggregator.sums(tx_exons)
+        link_fields = transcript_fields(tx_id, tx_exons)
+        partials[tx_id] = Partial(sums=sums, incomplete_exons=incomplete_exons,
+                                  link_fields=link_fields)
+    sample_names = set(exon['sampleName'] for exon in exons)
+    return partials, sample_names, len(exons)
+
+
+def merge_partials(chunk_partials):
+    """Add up per chunk sums into sums over all exons per transcript.
+
+    Args:
+        chunk_partials (List[dict]): output from ``parse_chunk`` in file order
+
+    Returns:
+        dict: tuple of sums, incomplete exons, and transcript columns per
+            transcript id
+    """
+    merged = {}
+    split_count = 0
+    for partials in chunk_partials:
+        for tx_id, partial in partials.items():
+            if tx_id in merged:
+                merged[tx_id] = add_partials(merged[tx_id], partial)
+                split_count += 1
+            else:
+                merged[tx_id] = partial
+    if split_count:
+        log.debug("added up %s partial sums across chunks", split_count)
+    return {tx_id: (partial.sums, partial.incomplete_exons,
+                    partial.link_fields)
+            for tx_id, partial in merged.items()}
+
+
+def add_partials(first, second):
+    """Add up the partial sums of a transcript from two chunks.
+
+    Args:
+        first (Partial): sums from the earlier chunk
+        second (Partial): sums from the later chunk
+
+    Returns:
+        Partial: sums over the exons in both chunks
+    """
+    sums = dict(first.sums)
+    for key, value in second.sums.items():
+        sums[key] = sums.get(key, 0) + value
+    link_fields = dict(first.link_fields)
+    link_fields['length'] += second.link_fields['length']
+    return Partial(sums=sums,
+                   incomplete_exons=(first.incomplete_exons +
+                                     second.incomplete_exons),
+                   link_fields=link_fields)
+
+
+def load_transcripts(path, sample_id=None, group_id=None, source=None,
+                     threshold=None, jobs=2):
+    """Process a sambamba output file using multiple worker processes.
+
+    Args:
+        path (str): path to uncompressed sambamba output
+        sample_id (Optional[str]): unique sample id, else auto-guessed
+        group_id (Optional[str]): id to group samples
+        source (Optional[str]): path to coverage source (BAM/Sambamba)
+        threshold (Optional[int]): completeness level to disqualify exons
+        jobs (Optional[int]): number of worker processes
+
+    Returns:
+        SplitResult: iterators of `Transcript`, transcripts processed, sample
+            model, rows parsed
+
+    Raises:
+        MultipleSamplesError: if the rows are from more than one sample
+    """
+    with open(path, 'rb') as handle:
+        header_line, ranges = chunk_ranges(handle, jobs * CHUNKS_PER_JOB)
+        handle.seek(len(header_line))
+        first_line = handle.readline()
+    # validates the header columns as well
+    first_exons = list(sambamba.depth_output([header_line.decode('utf-8'),
+                                              first_line.decode('utf-8')]))
+    header = sambamba.expand_header(header_line.decode('utf-8')
+                                    .strip().split('\t'))
+
+    tasks = [(path, start, end, header, threshold) for start, end in ranges]
+    pool = multiprocessing.Pool(jobs)
+    try:
+        chunks = pool.starmap(parse_chunk, tasks)
+    finally:
+        pool.terminate()
+        pool.join()
+    chunk_partials = [partials for partials, _, _ in chunks]
+    sample_names = set().union(*(names for _, names, _ in chunks))
+    if len(sample_names) > 1:
+        raise MultipleSamplesError("input has rows for {} samples: {}"
+                                   .format(len(sample_names),
+                                           ', '.join(sorted(sample_names))))
+    sums = merge_partials(chunk_partials)
+
+    if sample_id is None and first_exons:
+        sample_id = first_exons[0]['sampleName']
+    sample_obj = Sample(id=sample_id, group_id=group_id, source=source)
+    models = (make_model(sample_obj, tx_id,
+                         tx_fields(exon_sums, incomplete_exons,
+                                   threshold=threshold), link_fields)
+              for tx_id, (exon_sums, incomplete_exons, link_fields)
+              in sums.items())
+    return SplitResult(models=models, count=len(sums), sample=sample_obj,
+                       rows=sum(rows for _, _, rows in chunks))
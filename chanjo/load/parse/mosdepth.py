@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""Parse the mosdepth "--by" region output.
+
+mosdepth writes mean coverage per region to "<prefix>.regions.bed.gz" and,
+with "--thresholds", the number of bases covered at each level to
+"<prefix>.thresholds.bed.gz". Only the name column of the input BED file
+is kept so transcript/gene ids are looked up from the chanjo BED file.
+"""
+from __future__ import division
+from itertools import zip_longest
+
+from chanjo.exc import BedFormattingError
+
+
+def data_rows(handle):
+    """Split non-blank lines into columns.
+
+    Args:
+        handle (iterable): tab-separated lines
+
+    Yields:
+        tuple: line number (1-based), list of columns
+    """
+    for line_number, line in enumerate(handle, start=1):
+        if line.strip():
+            yield line_number, line.rstrip('\r\n').split('\t')
+
+
+def region_lookup(handle):
+    """Index the chanjo specific columns of a BED file by position.
+
+    Args:
+        handle (iterable): Chanjo-formatted BED lines
+
+    Returns:
+        dict: (chrom, start, end) -> list of extra columns
+
+    Raises:
+        BedFormattingError: if a row doesn't start with a valid position
+    """
+    lookup = {}
+    for line_number, row in data_rows(handle):
+        if row[0].startswith('#'):
+            continue
+        try:
+            lookup[(row[0], int(row[1]), int(row[2]))] = row[3:]
+        except (IndexError, ValueError):
+            raise BedFormattingError("malformatted BED row on line {}: {}"
+                                     .format(line_number, row))
+    return lookup
+
+
+def regions_output(regions_handle, thresholds_handle, lookup, sample_name=None):
+    """Parse and join the mosdepth regions and thresholds output.
+
+    Blank lines are skipped in both outputs.
+
+    Args:
+        regions_handle (iterable): lines from "regions.bed.gz"
+        thresholds_handle (iterable): lines from "thresholds.bed.gz"
+        lookup (dict): extra columns by position from ``region_lookup``
+        sample_name (Optional[str]): sample name to annotate records with
+
+    Yields:
+        dict: parsed row, same as for sambamba ``depth_output``
+
+    Raises:
+        BedFormattingError: if the files don't line up, ids are missing, or
+            a row can't be parsed
+    """
+    threshold_rows = data_rows(thresholds_handle)
+    header_row = next(threshold_rows, (None, ['']))[1]
+    if not header_row[0].startswith('#') or len(header_row) < 5:
+        raise BedFormattingError('expected mosdepth thresholds header')
+    try:
+        levels = [int(column.rstrip('X')) for column in header_row[4:]]
+    except ValueError:
+        raise BedFormattingError("malformatted thresholds header: {}"
+                                 .format(header_row))
+
+    for regions, thresholds in zip_longest(data_rows(regions_handle),
+                                           threshold_rows):
+        if regions is None or thresholds is None:
+            raise BedFormattingError('mosdepth regions/thresholds differ in length')
+        line_number, region_row = regions
+        threshold_number, threshold_row = thresholds
+        try:
+            position = (region_row[0], int(region_row[1]), int(region_row[2]))
+            mean_coverage = float(region_row[-1])
+        except (IndexError, ValueError):
+            raise BedFormattingError("malformatted regions row on line {}: {}"
+                                     .format(line_number, region_row))
+        if tuple(threshold_row[:3]) != tuple(region_row[:3]):
+            raise BedFormattingError("mosdepth outputs out of sync at: {}"
+                                     .format(':'.join(region_row[:3])))
+        if position not in lookup:
+            raise BedFormattingError("region missing from BED file: {}"
+                                     .format(':'.join(region_row[:3])))
+        try:
+            counts = [int(count) for count in threshold_row[4:]]
+        except ValueError:
+            raise BedFormattingError("malformatted thresholds row on line {}: "
+                                     "{}".format(threshold_number,
+                                                 threshold_row))
+
+        length = position[2] - position[1]
+        data = {
+            'chrom': position[0],
+            'chromStart': position[1],
+            'chromEnd': position[2],
+            'sampleName': sample_name,
+            'readCount': None,
+            'meanCoverage': mean_coverage,
+            'thresholds': {level: ((100 * count / length) if length else 0.)
+                           for level, count in zip(levels, counts)},
+            'extraFields': lookup[position],
+        }
+        yield data
@@ -5,11 +5,13 @@ Parse the sambamba "depth region" output.
 from chanjo.exc import BedFormattingError
 
 
-def depth_output(handle):
+def depth_output(handle, errors=None):
     """Parse the output.
 
     Args:
         handle (iterable): Chanjo-formatted BED lines
+        errors (Optional[list]): collect line number and error for rows that
+            can't be parsed and skip them instead of raising
 
     Yields:
         dict: parsed sambamba output row
@@ -25,8 +27,15 @@ def depth_output(handle):
         raise BedFormattingError('make sure fields are tab-separated')
     header_data = expand_header(header_row)
     # parse rows
-    for row in rows:
-        yield expand_row(header_data, row)
+    if errors is None:
+        for row in rows:
+            yield expand_row(header_data, row)
+        return
+    for line_number, row in enumerate(rows, start=2):
+        try:
+            yield expand_row(header_data, row)
+        except (ValueError, IndexError) as error:
+            errors.append((line_number, error))
 
 
 def expand_header(row):
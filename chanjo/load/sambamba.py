@@ -2,14 +2,21 @@
 from __future__ import division
 from collections import namedtuple
 
-from chanjo.store.models import TranscriptStat, Sample, Exon
+from chanjo.exc import MultipleSamplesError
+from chanjo.sex import sex_from_exons
+from chanjo.store.constants import COMPLETENESS_LEVELS
+from chanjo.store.models import CoverageHistogram, TranscriptStat, Sample, Exon
+from .aggregate import ExonAggregator
+from .exons import make_models as exon_models
+from .link import transcript_fields
 from .parse import sambamba
 from .utils import groupby_tx
 
 Result = namedtuple('Result', ['models', 'count', 'sample'])
 
 
-def load_transcripts(sequence, sample_id=None, group_id=None, source=None, threshold=None):
+def load_transcripts(sequence, sample_id=None, group_id=None, source=None,
+                     threshold=None, histogram=False, exon_positions=None):
     """Process a sequence of exon lines.
 
     Args:
@@ -18,22 +25,142 @@ def load_transcripts(sequence, sample_id=None, group_id=None, source=None, thres
         grouip_id (Optional[str]): id to group samples
         source (Optional[str]): path to coverage source (BAM/Sambamba)
         threshold (Optional[int]): completeness level to disqualify exons
+        histogram (Optional[bool]): store completeness at all levels
+        exon_positions (Optional[dict]): shared exon ordering for exon stats
 
     Returns:
         Result: iterators of `Transcript`, transcripts processed, sample model
     """
     exons = sambamba.depth_output(sequence)
-    transcripts = groupby_tx(exons, sambamba=True)
-    raw_stats = ((tx_id, tx_stat(tx_id, exons, threshold=threshold))
-                 for tx_id, exons in transcripts.items())
+    return load_exons(exons, sample_id=sample_id, group_id=group_id,
+                      source=source, threshold=threshold, histogram=histogram,
+                      exon_positions=exon_positions)
+
+
+def load_exons(exons, sample_id=None, group_id=None, source=None,
+               threshold=None, histogram=False, exon_positions=None):
+    """Process a sequence of parsed exon records.
 
+    Args:
+        exons (iterable): exon records like the ones from ``depth_output``
+        sample_id (Optional[str]): unique sample id, else auto-guessed
+        group_id (Optional[str]): id to group samples
+        source (Optional[str]): path to coverage source (BAM/Sambamba)
+        threshold (Optional[int]): completeness level to disqualify exons
+        histogram (Optional[bool]): store completeness at all levels
+        exon_positions (Optional[dict]): shared exon ordering, if given
+            exon level stats are attached to the sample
+
+    Returns:
+        Result: iterators of `Transcript`, transcripts processed, sample model
+
+    Raises:
+        MultipleSamplesError: if the exons are from more than one sample
+    """
+    transcripts = groupby_tx(exons, sambamba=True)
+    aggregator = ExonAggregator(threshold=threshold)
+    raw_stats = ((tx_id, aggregator.stat(tx_exons))
+                 for tx_id, tx_exons in transcripts.items())
+
+    unique_exons = {id(exon): exon for tx_exons in transcripts.values()
+                    for exon in tx_exons}
+    sample_names = set(exon.get('sampleName') for exon
+                       in unique_exons.values())
+    if len(sample_names) > 1:
+        names = ', '.join(sorted(map(str, sample_names)))
+        raise MultipleSamplesError("input has rows for {} samples: {}"
+                                   .format(len(sample_names), names))
     if sample_id is None:
         sample_id = next(iter(transcripts.values()))[0]['sampleName']
+    sample_obj = sample_model(sample_id, unique_exons.values(),
+                              group_id=group_id, source=source,
+                              exon_positions=exon_positions)
+
+    models = (make_model(sample_obj, tx_id, raw_stat,
+                         transcript_fields(tx_id, transcripts[tx_id]))
+              for tx_id, raw_stat in raw_stats)
+    if histogram and transcripts:
+        models = add_histograms(models, transcripts)
+    return Result(models=models, count=len(transcripts), sample=sample_obj)
+
+
+def sample_model(sample_id, exons, group_id=None, source=None,
+                 exon_positions=None):
+    """Compose a sample model with the sex predicted from its exons.
+
+    Args:
+        sample_id (str): unique sample id
+        exons (List[dict]): unique exon records for the sample
+        group_id (Optional[str]): id to group samples
+        source (Optional[str]): path to coverage source (BAM/Sambamba)
+        exon_positions (Optional[dict]): shared exon ordering, if given
+            exon level stats are attached to the sample
+
+    Returns:
+        Sample: new sample model
+    """
     sample_obj = Sample(id=sample_id, group_id=group_id, source=source)
+    sex_guess = sex_from_exons(exons)
+    if sex_guess:
+        sample_obj.x_coverage, sample_obj.y_coverage, sample_obj.sex = sex_guess
+    if exon_positions:
+        sample_obj.exon_stats = exon_models(exons, exon_positions)
+    return sample_obj
+
+
+def add_histograms(models, transcripts):
+    """Attach coverage histograms to transcript stat models.
+
+    Args:
+        models (iterable): transcript stat models
+        transcripts (dict): exons grouped per transcript id
+
+    Yields:
+        TranscriptStat: model with histogram attached
+    """
+    first_exon = next(iter(transcripts.values()))[0]
+    levels = sorted(first_exon['thresholds'])
+    for tx_model in models:
+        bases, counts = tx_histogram(transcripts[tx_model.transcript_id], levels)
+        data = CoverageHistogram.pack(levels, bases, counts)
+        tx_model.histogram = CoverageHistogram(data=data)
+        yield tx_model
 
-    models = (make_model(sample_obj, tx_id, raw_stat) for tx_id, raw_stat
-              in raw_stats)
-    return Result(models=models, count=len(transcripts), sample=sample_obj)
+
+def histogram_levels(max_level, levels=COMPLETENESS_LEVELS):
+    """Expand completeness levels to every level up to a max.
+
+    Histograms of output sampled at these levels can answer completeness
+    at any level up to the max.
+
+    Args:
+        max_level (int): highest level to sample every level up to
+        levels (Optional[List[int]]): extra levels to sample (above the max)
+
+    Returns:
+        List[int]: sorted levels
+    """
+    return sorted(set(range(1, max_level + 1)) | set(levels))
+
+
+def tx_histogram(exons, levels):
+    """Count the exon bases covered at each level.
+
+    Args:
+        exons (List[dict]): list of exon transcripts
+        levels (List[int]): completeness levels to count bases at
+
+    Returns:
+        tuple: total exon bases, list of bases covered per level
+    """
+    bases = 0
+    counts = [0.] * len(levels)
+    for exon in exons:
+        exon_length = (exon['chromEnd'] - exon['chromStart'])
+        bases += exon_length
+        for index, level in enumerate(levels):
+            counts[index] += exon['thresholds'].get(level, 0) * exon_length / 100
+    return bases, [int(round(count)) for count in counts]
 
 
 def tx_stat(transcript_id, exons, threshold=None):
@@ -47,6 +174,23 @@ def tx_stat(transcript_id, exons, threshold=None):
     Returns:
         dict: aggregated stats over all exons
     """
+    sums, incomplete_exons = tx_sums(exons, threshold=threshold)
+    return tx_fields(sums, incomplete_exons, threshold=threshold)
+
+
+def tx_sums(exons, threshold=None):
+    """Sum up length weighted metrics over exons.
+
+    Straightforward version for a single transcript, use ``ExonAggregator``
+    to process many transcripts that share exons.
+
+    Args:
+        exons (List[dict]): list of exon transcripts
+        threshold (Optional[int]): completeness level to disqualify exons
+
+    Returns:
+        tuple: dict of summed metrics, list of incomplete exons
+    """
     sums = {'bases': 0, 'mean_coverage': 0}
     incomplete_exons = []
 
@@ -71,22 +215,40 @@ def tx_stat(transcript_id, exons, threshold=None):
                                     exon['chromEnd'], completeness)
                     incomplete_exons.append(exon_obj)
 
+    return sums, incomplete_exons
+
+
+def tx_fields(sums, incomplete_exons, threshold=None):
+    """Build transcript stat fields from summed metrics.
+
+    Args:
+        sums (dict): summed metrics from ``tx_sums``
+        incomplete_exons (List[Exon]): exons below the completeness threshold
+        threshold (Optional[int]): completeness level to disqualify exons
+
+    Returns:
+        dict: aggregated stats over all exons
+    """
     fields = {key: (value / sums['bases']) for key, value in sums.items() if key != 'bases'}
     fields['incomplete_exons'] = incomplete_exons
     fields['threshold'] = threshold
     return fields
 
 
-def make_model(sample_obj, transcript_id, fields):
+def make_model(sample_obj, transcript_id, fields, link_fields=None):
     """Compose a transcript stat model from fields.
 
     Args:
         sample_obj (Sample): Sample database model
         transcript_id (str): unique transcript id
         fields (dict): key/values of metrics
+        link_fields (Optional[dict]): columns to link the transcript with if
+            it isn't linked already
 
     Returns:
         Transcript: composed transcript model
     """
-    tx_model = TranscriptStat(sample_id=sample_obj.id, transcript_id=transcript_id, **fields)
+    tx_model = TranscriptStat(sample_id=sample_obj.id,
+                              transcript_id=transcript_id, **fields)
+    tx_model.transcript_fields = link_fields
     return tx_model
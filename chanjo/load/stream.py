@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""Open (optionally compressed) input streams as decoded text lines.
+
+Both plain gzip and BGZF (blocked gzip, as written by ``bgzip``) inputs are
+supported. BGZF blocks are independent gzip members which means they can be
+inflated in parallel worker threads (``zlib`` releases the GIL).
+"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import gzip
+import io
+import logging
+import os
+import struct
+import zlib
+
+GZIP_MAGIC = b'\x1f\x8b'
+# gzip header (12 bytes) + the "BC" extra subfield holding the block size
+BGZF_HEADER_SIZE = 18
+
+log = logging.getLogger(__name__)
+
+
+def open_text(handle, threads=None, encoding='utf-8'):
+    """Open a binary stream as text lines, decompressing if needed.
+
+    Args:
+        handle (file): binary file handle (or STDIN)
+        threads (Optional[int]): worker threads for BGZF decompression
+        encoding (Optional[str]): text encoding of the uncompressed data
+
+    Returns:
+        iterable: decoded text lines
+    """
+    if not hasattr(handle, 'peek'):
+        handle = io.BufferedReader(handle)
+    magic = handle.peek(BGZF_HEADER_SIZE)[:BGZF_HEADER_SIZE]
+    if is_bgzf(magic):
+        log.debug('reading BGZF compressed input')
+        return bgzf_lines(handle, threads=threads, encoding=encoding)
+    elif magic.startswith(GZIP_MAGIC):
+        log.debug('reading gzip compressed input')
+        handle = gzip.GzipFile(fileobj=handle, mode='rb')
+    return io.TextIOWrapper(handle, encoding=encoding)
+
+
+def is_bgzf(header):
+    """Check if the first bytes of a stream belong to a BGZF block.
+
+    Args:
+        header (bytes): at least the first 18 bytes of a stream
+
+    Returns:
+        bool: whether the header matches the BGZF specification
+    """
+    if len(header) < BGZF_HEADER_SIZE or not header.startswith(GZIP_MAGIC):
+        return False
+    flags = header[3]
+    # the "FEXTRA" flag must be set and the first subfield be "BC"
+    return bool(flags & 4) and header[12:14] == b'BC'
+
+
+def bgzf_blocks(handle):
+    """Split a BGZF stream into raw compressed blocks.
+
+    Args:
+        handle (file): binary BGZF file handle
+
+    Yields:
+        bytes: complete BGZF block including header and footer
+
+    Raises:
+        ValueError: if a block is truncated or malformatted
+    """
+    while True:
+        header = handle.read(BGZF_HEADER_SIZE)
+        if not header:
+            break
+        elif not is_bgzf(header):
+            raise ValueError('malformatted BGZF block header')
+        block_size = struct.unpack('<H', header[16:18])[0] + 1
+        body = handle.read(block_size - BGZF_HEADER_SIZE)
+        if len(body) != block_size - BGZF_HEADER_SIZE:
+            raise ValueError('truncated BGZF block')
+        yield header + body
+
+
+def inflate_block(block):
+    """Decompress a single BGZF block.
+
+    Args:
+        block (bytes): complete BGZF block
+
+    Returns:
+        bytes: uncompressed block data
+    """
+    extra_length = struct.unpack('<H', block[10:12])[0]
+    data = zlib.decompress(block[12 + extra_length:-8], -zlib.MAX_WBITS)
+    expected_crc, expected_size = struct.unpack('<2I', block[-8:])
+    if len(data) != expected_size or zlib.crc32(data) != expected_crc:
+        raise ValueError('corrupt BGZF block')
+    return data
+
+
+def bgzf_inflate(handle, threads=None):
+    """Decompress BGZF blocks in parallel while keeping their order.
+
+    Args:
+        handle (file): binary BGZF file handle
+        threads (Optional[int]): number of worker threads
+
+    Yields:
+        bytes: uncompressed data per block
+    """
+    threads = threads or min(4, os.cpu_count() or 1)
+    if threads == 1:
+        for block in bgzf_blocks(handle):
+            yield inflate_block(block)
+        return
+
+    # bound the number of blocks in flight to keep memory use in check
+    window = threads * 4
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        pending = deque()
+        for block in bgzf_blocks(handle):
+            pending.append(executor.submit(inflate_block, block))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def bgzf_lines(handle, threads=None, encoding='utf-8'):
+    """Iterate over text lines in a BGZF compressed stream.
+
+    Args:
+        handle (file): binary BGZF file handle
+        threads (Optional[int]): number of worker threads
+        encoding (Optional[str]): text encoding of the uncompressed data
+
+    Yields:
+        str: decoded line including line ending
+    """
+    remainder = b''
+    for data in bgzf_inflate(handle, threads=threads):
+        lines = (remainder + data).split(b'\n')
+        remainder = lines.pop()
+        for line in lines:
+            yield line.decode(encoding) + '\n'
+    if remainder:
+        yield remainder.decode(encoding)
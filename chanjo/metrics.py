@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""Collect run metrics for a command and write them to a file.
+
+Metrics are written as JSON or in the Prometheus text exposition format
+(for the node exporter "textfile" collector), picked by the file extension
+(``.prom``) unless given explicitly.
+"""
+from __future__ import division
+from collections import OrderedDict
+from contextlib import contextmanager
+import json
+import os
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None
+
+PROMETHEUS_PREFIX = 'chanjo_'
+
+
+def peak_rss():
+    """Return the peak resident memory of the process in bytes.
+
+    Returns:
+        int: peak RSS or None if it can't be measured
+    """
+    if resource is None:  # pragma: no cover
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # reported in bytes on macOS, kilobytes elsewhere
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+
+def file_size(handle):
+    """Return the size of a regular file behind a handle, else None."""
+    try:
+        return os.fstat(handle.fileno()).st_size
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+class RunMetrics:
+
+    """Counters and phase timings for a single command run.
+
+    Collecting is cheap and does nothing for disabled metrics.
+
+    Args:
+        command (Optional[str]): name of the command
+        enabled (Optional[bool]): whether metrics will be written
+    """
+
+    def __init__(self, command=None, enabled=True):
+        self.command = command
+        self.enabled = enabled
+        self.values = OrderedDict()
+        self.phases = OrderedDict()
+        self.start = time.time()
+
+    def set(self, name, value):
+        """Set the value of a metric."""
+        self.values[name] = value
+
+    def add(self, name, value=1):
+        """Increase the value of a counter."""
+        self.values[name] = self.values.get(name, 0) + value
+
+    @contextmanager
+    def phase(self, name):
+        """Time a phase of the run, adding up repeated phases."""
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.phases[name] = (self.phases.get(name, 0.) +
+                                 time.time() - start)
+
+    def counted(self, iterable, name):
+        """Count items as they are consumed.
+
+        Args:
+            iterable (iterable): items to count
+            name (str): counter to increase
+
+        Returns:
+            iterable: the same items
+        """
+        if not self.enabled:
+            return iterable
+        return self._count(iterable, name)
+
+    def _count(self, iterable, name):
+        count = 0
+        try:
+            for item in iterable:
+                count += 1
+                yield item
+        finally:
+            self.add(name, count)
+
+    def summary(self):
+        """Summarize the run.
+
+        Returns:
+            dict: command, metric values, seconds per phase, wall time, and
+                peak RSS
+        """
+        return {
+            'command': self.command,
+            'timestamp': self.start,
+            'wall_seconds': time.time() - self.start,
+            'peak_rss_bytes': peak_rss(),
+            'metrics': dict(self.values),
+            'phase_seconds': dict(self.phases),
+        }
+
+    def to_json(self):
+        """Format metrics as JSON."""
+        return json.dumps(self.summary(), indent=2, sort_keys=True)
+
+    def to_prometheus(self):
+        """Format metrics in the Prometheus text exposition format."""
+        summary = self.summary()
+        labels = 'command="{}"'.format(summary['command'] or '')
+        samples = [('wall_seconds', labels, summary['wall_seconds']),
+                   ('peak_rss_bytes', labels, summary['peak_rss_bytes']),
+                   ('last_run_timestamp_seconds', labels,
+                    summary['timestamp'])]
+        samples += [(name, labels, value) for name, value
+                    in sorted(summary['metrics'].items())]
+        samples += [('phase_seconds', '{},phase="{}"'.format(labels, name),
+                     seconds)
+                    for name, seconds in summary['phase_seconds'].items()]
+
+        lines = []
+        for name, sample_labels, value in samples:
+            if value is None:
+                continue
+            metric = PROMETHEUS_PREFIX + name
+            if not any(line == "# TYPE {} gauge".format(metric)
+                       for line in lines):
+                lines.append("# TYPE {} gauge".format(metric))
+            lines.append("{}{{{}}} {}".format(metric, sample_labels,
+                                              float(value)))
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path, fmt=None):
+        """Write metrics to a file, replacing it atomically.
+
+        Args:
+            path (path): output file
+            fmt (Optional[str]): "json" or "prometheus", default: by extension
+        """
+        if fmt is None:
+            fmt = 'prometheus' if path.endswith('.prom') else 'json'
+        content = self.to_prometheus() if fmt == 'prometheus' else self.to_json()
+        temp_path = "{}.tmp".format(path)
+        with open(temp_path, 'w') as handle:
+            handle.write(content)
+        os.replace(temp_path, path)
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+import logging
+
+from sqlalchemy import or_, select
+from sqlalchemy.sql import func
+
+from chanjo.store.constants import STAT_COLUMNS
+from chanjo.store.models import (Panel, PanelStat, PanelTranscript, Sample,
+                                 Transcript, TranscriptStat)
+
+log = logging.getLogger(__name__)
+
+
+class PanelMixin:
+
+    """Methods for stored gene panels.
+
+    Panels are stored as the transcripts of their genes. Coverage queries
+    join against the membership instead of binding long lists of genes.
+    """
+
+    def add_panel(self, panel_id, genes, name=None):
+        """Store a gene panel, replacing any panel with the same id.
+
+        The changes are only flushed, persist them using ``save``.
+
+        Args:
+            panel_id (str): unique panel id
+            genes (List[str]): gene ids (numeric) or gene names
+            name (Optional[str]): display name for the panel
+
+        Returns:
+            int: number of transcripts in the panel
+        """
+        self.remove_panel(panel_id)
+        genes = [str(gene) for gene in genes]
+        gene_ids = [int(gene) for gene in genes if gene.isdigit()]
+        gene_names = [gene for gene in genes if not gene.isdigit()]
+        filters = []
+        if gene_ids:
+            filters.append(Transcript.gene_id.in_(gene_ids))
+        if gene_names:
+            filters.append(Transcript.gene_name.in_(gene_names))
+        rows = []
+        if filters:
+            rows = (self.query(Transcript.key, Transcript.gene_id,
+                               Transcript.gene_name)
+                        .filter(or_(*filters)).all())
+
+        found = set()
+        for _, gene_id, gene_name in rows:
+            found.update([str(gene_id), gene_name])
+        missing = [gene for gene in genes if gene not in found]
+        if missing:
+            log.warning("genes without linked transcripts: %s",
+                        ', '.join(missing))
+
+        self.add(Panel(id=panel_id, name=name))
+        self.session.flush()
+        memberships = ({'panel_id': panel_id, 'transcript_key': tx_key}
+                       for tx_key in set(row[0] for row in rows))
+        return self.bulk_insert(PanelTranscript.__table__, memberships)
+
+    def remove_panel(self, panel_id):
+        """Remove a gene panel along with its precomputed stats.
+
+        Args:
+            panel_id (str): unique panel id
+
+        Returns:
+            bool: whether the panel existed
+        """
+        for model in (PanelStat, PanelTranscript):
+            (self.query(model).filter_by(panel_id=panel_id)
+                 .delete(synchronize_session=False))
+        count = (self.query(Panel).filter_by(id=panel_id)
+                     .delete(synchronize_session=False))
+        return count > 0
+
+    def panel_metrics(self, panel_id, sample_ids=None):
+        """Calculate mean statistics over the transcripts in a panel.
+
+        Args:
+            panel_id (str): unique panel id
+            sample_ids (Optional[List[str]]): samples to limit query to
+
+        Returns:
+            Query: sample id and mean metrics per sample
+        """
+        query = (self.mean(sample_ids=sample_ids)
+                     .join(PanelTranscript, PanelTranscript.transcript_key ==
+                           TranscriptStat.transcript_key)
+                     .filter(PanelTranscript.panel_id == panel_id))
+        return query
+
+    def update_panel_stats(self, panel_id=None):
+        """Precompute mean statistics per sample for panels.
+
+        Args:
+            panel_id (Optional[str]): panel to update, else all panels
+
+        Returns:
+            int: number of panel stats stored
+        """
+        delete_query = self.query(PanelStat)
+        if panel_id:
+            delete_query = delete_query.filter_by(panel_id=panel_id)
+        delete_query.delete(synchronize_session=False)
+
+        columns = [PanelTranscript.panel_id, TranscriptStat.sample_key]
+        columns += [func.avg(getattr(TranscriptStat, column))
+                    for column in STAT_COLUMNS]
+        stats_query = (select(columns)
+                       .select_from(TranscriptStat.__table__.join(
+                           PanelTranscript.__table__,
+                           PanelTranscript.transcript_key ==
+                           TranscriptStat.transcript_key))
+                       .group_by(PanelTranscript.panel_id,
+                                 TranscriptStat.sample_key))
+        if panel_id:
+            stats_query = stats_query.where(PanelTranscript.panel_id ==
+                                            panel_id)
+        insert = PanelStat.__table__.insert().from_select(
+            ['panel_id', 'sample_key'] + STAT_COLUMNS, stats_query)
+        result = self.session.execute(insert)
+        return result.rowcount
+
+    def panel_stats(self, panel_id, sample_ids=None):
+        """Fetch precomputed mean statistics for a panel.
+
+        Args:
+            panel_id (str): unique panel id
+            sample_ids (Optional[List[str]]): samples to limit query to
+
+        Returns:
+            Query: sample id and mean metrics per sample
+        """
+        columns = [getattr(PanelStat, column) for column in STAT_COLUMNS]
+        query = (self.query(Sample.id, *columns)
+                     .join(PanelStat.sample)
+                     .filter(PanelStat.panel_id == panel_id)
+                     .order_by(Sample.id))
+        if sample_ids:
+            query = query.filter(Sample.id.in_(sample_ids))
+        return query
@@ -1,4 +1,6 @@
 # -*- coding: utf-8 -*-
+from contextlib import contextmanager
+import io
 import logging
 import subprocess
 
@@ -7,14 +9,17 @@ from subprocess import CalledProcessError
 log = logging.getLogger(__name__)
 
 
-def run_sambamba(bam_file, region_file, outfile=None, cov_thresholds=()):
-    """Run sambamba from Chanjo.
+def sambamba_command(bam_file, region_file, outfile=None, cov_thresholds=()):
+    """Compose the sambamba "depth region" call.
 
     Args:
         bam_file (Path): path to the BAM alignment file
         region_file (Path): path to the input BED file defining exon regions
         outfile (Optional[Path]): file to write to (otherwise STDOUT)
         cov_thresholds (Optional[List[int]]): levels to sample completeness at
+
+    Returns:
+        List[str]: command line arguments
     """
     sambamba_call = ['sambamba', 'depth', 'region', '--regions', region_file, bam_file]
 
@@ -24,6 +29,21 @@ def run_sambamba(bam_file, region_file, outfile=None, cov_thresholds=()):
     for coverage_threshold in cov_thresholds:
         sambamba_call += ['-T', str(coverage_threshold)]
 
+    return sambamba_call
+
+
+def run_sambamba(bam_file, region_file, outfile=None, cov_thresholds=()):
+    """Run sambamba from Chanjo.
+
+    Args:
+        bam_file (Path): path to the BAM alignment file
+        region_file (Path): path to the input BED file defining exon regions
+        outfile (Optional[Path]): file to write to (otherwise STDOUT)
+        cov_thresholds (Optional[List[int]]): levels to sample completeness at
+    """
+    sambamba_call = sambamba_command(bam_file, region_file, outfile=outfile,
+                                     cov_thresholds=cov_thresholds)
+
     log.info("Running sambamba with call: %s", ' '.join(sambamba_call))
     try:
         subprocess.check_call(sambamba_call)  # stderr=log_stream
@@ -36,3 +56,49 @@ def run_sambamba(bam_file, region_file, outfile=None, cov_thresholds=()):
         raise error
 
     log.debug("sambamba ran successfully")
+
+
+@contextmanager
+def stream_sambamba(bam_file, region_file, cov_thresholds=()):
+    """Run sambamba and stream the output through a pipe.
+
+    The output is never written to disk. The exit status is checked once
+    the caller is done with the lines.
+
+    Args:
+        bam_file (Path): path to the BAM alignment file
+        region_file (Path): path to the input BED file defining exon regions
+        cov_thresholds (Optional[List[int]]): levels to sample completeness at
+
+    Yields:
+        io.TextIOWrapper: decoded lines of sambamba output
+
+    Raises:
+        CalledProcessError: if sambamba exits with an error
+    """
+    sambamba_call = sambamba_command(bam_file, region_file,
+                                     cov_thresholds=cov_thresholds)
+
+    log.info("Streaming sambamba with call: %s", ' '.join(sambamba_call))
+    try:
+        process = subprocess.Popen(sambamba_call, stdout=subprocess.PIPE)
+    except OSError as error:
+        log.critical("sambamba seems to not exist on your system.")
+        raise error
+
+    try:
+        yield io.TextIOWrapper(process.stdout, encoding='utf-8')
+    except Exception:
+        process.kill()
+        process.wait()
+        raise
+    finally:
+        process.stdout.close()
+
+    returncode = process.wait()
+    if returncode != 0:  # pragma: no cover
+        log.critical("Something went wrong when running sambamba. "
+                     "Please see sambamba error output.")
+        raise CalledProcessError(returncode, sambamba_call)
+
+    log.debug("sambamba ran successfully")
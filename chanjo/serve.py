@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""Read-only HTTP/JSON query service on top of a warm database connection.
+
+A plain WSGI app served by ``wsgiref`` from the standard library. Identical
+queries are answered from an LRU cache and the latency of every request is
+recorded for the ``/stats`` endpoint. Cached responses are kept until the
+service is restarted; disable the cache for databases that are loaded
+into while serving.
+
+Endpoints (all GET, multiple values by repeating a parameter):
+
+- ``/samples``: all samples
+- ``/mean?sample=ID``: mean metrics per sample
+- ``/genes?gene=ID``: mean metrics per sample and gene
+- ``/incomplete?sample=ID``: incomplete exons per transcript for a sample
+- ``/stats``: request count, cache usage, and latency percentiles
+"""
+from __future__ import division
+from collections import deque
+from functools import lru_cache
+import json
+import logging
+import math
+import time
+from urllib.parse import parse_qs
+from wsgiref.simple_server import make_server
+
+from chanjo.store.constants import STAT_COLUMNS
+from chanjo.store.models import Sample, Transcript, TranscriptStat
+
+# latencies to keep for calculating percentiles
+LATENCY_WINDOW = 10000
+PERCENTILES = (50, 90, 95, 99)
+
+log = logging.getLogger(__name__)
+
+
+class QueryError(Exception):
+
+    """Error in a request that should be reported to the client."""
+
+    def __init__(self, message, status='400 Bad Request'):
+        super(QueryError, self).__init__(message)
+        self.status = status
+
+
+def percentile(values, percent):
+    """Calculate a percentile using the nearest-rank method.
+
+    Args:
+        values (List[float]): sorted values
+        percent (int): percentile to calculate
+
+    Returns:
+        float: value at the percentile, None if there are no values
+    """
+    if not values:
+        return None
+    rank = max(math.ceil(percent / 100 * len(values)), 1)
+    return values[rank - 1]
+
+
+class QueryApp:
+
+    """WSGI app answering coverage queries.
+
+    Args:
+        chanjo_db (ChanjoDB): connected database, kept open between requests
+        cache_size (Optional[int]): max number of cached responses
+    """
+
+    def __init__(self, chanjo_db, cache_size=256):
+        self.chanjo_db = chanjo_db
+        self.cached_query = lru_cache(maxsize=cache_size)(self.query)
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.requests = 0
+        self.endpoints = {
+            '/samples': self.samples,
+            '/mean': self.mean,
+            '/genes': self.genes,
+            '/incomplete': self.incomplete,
+        }
+
+    def __call__(self, environ, start_response):
+        start = time.time()
+        path = environ.get('PATH_INFO', '/').rstrip('/') or '/'
+        params = parse_qs(environ.get('QUERY_STRING', ''))
+        params = tuple(sorted((key, tuple(values))
+                              for key, values in params.items()))
+        status = '200 OK'
+        try:
+            if path == '/stats':
+                body = json.dumps(self.stats()).encode('utf-8')
+            else:
+                body = self.cached_query(path, params)
+        except QueryError as error:
+            status = error.status
+            body = json.dumps({'error': error.args[0]}).encode('utf-8')
+        finally:
+            # end the read transaction to pick up new data in later queries
+            self.chanjo_db.session.rollback()
+        self.requests += 1
+        self.latencies.append(time.time() - start)
+        start_response(status, [('Content-Type', 'application/json'),
+                                ('Content-Length', str(len(body)))])
+        return [body]
+
+    def query(self, path, params):
+        """Run the query for an endpoint.
+
+        Args:
+            path (str): endpoint
+            params (tuple): sorted (name, values) per query parameter
+
+        Returns:
+            bytes: JSON encoded response
+        """
+        endpoint = self.endpoints.get(path)
+        if endpoint is None:
+            raise QueryError("unknown endpoint: {}".format(path),
+                             status='404 Not Found')
+        return json.dumps(endpoint(dict(params))).encode('utf-8')
+
+    def samples(self, params):
+        """List all samples."""
+        columns = ['id', 'group_id', 'name', 'group_name', 'source', 'sex']
+        query = (self.chanjo_db.query(*[getattr(Sample, column)
+                                        for column in columns])
+                               .order_by(Sample.id))
+        return [dict(zip(columns, row)) for row in query]
+
+    def mean(self, params):
+        """Calculate mean metrics per sample."""
+        query = self.chanjo_db.mean(sample_ids=params.get('sample'))
+        columns = ['sample_id'] + STAT_COLUMNS
+        return [dict(zip(columns, row)) for row in query]
+
+    def genes(self, params):
+        """Calculate mean metrics per sample and gene."""
+        try:
+            gene_ids = [int(gene_id) for gene_id in params.get('gene', [])]
+        except ValueError:
+            raise QueryError('gene ids must be integers')
+        if not gene_ids:
+            raise QueryError('provide at least one gene')
+        query = self.chanjo_db.gene_metrics(*gene_ids)
+        columns = ['sample_id'] + STAT_COLUMNS + ['gene_id']
+        return [dict(zip(columns, row)) for row in query]
+
+    def incomplete(self, params):
+        """List incomplete exons per transcript for a sample."""
+        sample_ids = params.get('sample')
+        if not sample_ids or len(sample_ids) > 1:
+            raise QueryError('provide a single sample')
+        query = (self.chanjo_db.query(Transcript.id,
+                                      TranscriptStat._incomplete_exons)
+                               .join(TranscriptStat.transcript)
+                               .filter(TranscriptStat.sample_id ==
+                                       sample_ids[0],
+                                       TranscriptStat._incomplete_exons
+                                                     .isnot(None))
+                               .order_by(Transcript.id))
+        return {tx_id: [exon._asdict() for exon
+                        in TranscriptStat.parse_exons(raw_exons)]
+                for tx_id, raw_exons in query}
+
+    def stats(self):
+        """Summarize requests, cache usage, and latencies (milliseconds)."""
+        cache_info = self.cached_query.cache_info()
+        latencies = sorted(self.latencies)
+        latency_ms = {}
+        for percent in PERCENTILES:
+            value = percentile(latencies, percent)
+            latency_ms["p{}".format(percent)] = (None if value is None
+                                                 else value * 1000)
+        return {
+            'requests': self.requests,
+            'cache': {'hits': cache_info.hits, 'misses': cache_info.misses,
+                      'size': cache_info.currsize},
+            'latency_ms': latency_ms,
+        }
+
+
+def serve(chanjo_db, host='127.0.0.1', port=8000, cache_size=256):
+    """Serve queries until interrupted.
+
+    Args:
+        chanjo_db (ChanjoDB): connected database
+        host (Optional[str]): interface to listen on
+        port (Optional[int]): port to listen on
+        cache_size (Optional[int]): max number of cached responses
+    """
+    app = QueryApp(chanjo_db, cache_size=cache_size)
+    server = make_server(host, port, app)
+    log.info("serving on http://%s:%s", host, server.server_port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        log.info('shutting down')
+    finally:
+        server.server_close()
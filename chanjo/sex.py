@@ -4,15 +4,26 @@
 The component reads coverage for subsections of each sex chromosome.
 Based on the ratio between the average coverage across chromosomes it
 makes a simple sex prediction.
+
+The same prediction can be made from exons on the sex chromosomes in
+Sambamba output that is loaded anyway, which avoids extra BAM passes.
+
+Many BAM files can be processed by a pool of worker processes. Results can
+be cached in a JSON file keyed by the path, size, and modification time of
+each BAM file so unchanged files aren't read again.
 """
 from __future__ import division
 from collections import namedtuple
+import json
 import logging
+import multiprocessing
+import os
 import subprocess
 
 LOG = logging.getLogger(__name__)
 
 SexGuess = namedtuple('SexGuess', ['x_coverage', 'y_coverage', 'sex'])
+SEX_CHROMOSOMES = ['X', 'Y', 'chrX', 'chrY']
 
 
 def predict_sex(x_coverage, y_coverage):
@@ -77,3 +88,187 @@ def sex_from_bam(bam_path, prefix=''):
     x_coverage, y_coverage = list(averages)
     sex = predict_sex(x_coverage, y_coverage)
     return SexGuess(x_coverage, y_coverage, sex)
+
+
+def guess_sex(sums):
+    """Predict the sex from length-weighted coverage on the sex chromosomes.
+
+    Args:
+        sums (dict): coverage times bases, bases per chromosome (X/Y)
+
+    Returns:
+        SexGuess: tuple of X coverage, Y coverage, and sex prediction or
+            None if there are no bases on either of the X and Y chromosomes
+    """
+    averages = []
+    for chromosome in ('X', 'Y'):
+        coverage_sum, bases = sums.get(chromosome) or (0., 0)
+        averages.append((coverage_sum / bases) if bases else None)
+    x_coverage, y_coverage = averages
+    if x_coverage is None or y_coverage is None:
+        # the regions don't cover both, the sex can't be told apart
+        return None
+    return SexGuess(x_coverage, y_coverage, predict_sex(x_coverage, y_coverage))
+
+
+def sex_from_exons(exons):
+    """Predict the sex from exons in Sambamba output.
+
+    Args:
+        exons (iterable): unique exon records like the ones from
+            ``depth_output``
+
+    Returns:
+        SexGuess: tuple of X coverage, Y coverage, and sex prediction or
+            None if there are no exons on either of the X and Y chromosomes
+    """
+    sums = {}
+    for exon in exons:
+        if exon['chrom'] not in SEX_CHROMOSOMES:
+            continue
+        chromosome = exon['chrom'][-1]
+        bases = exon['chromEnd'] - exon['chromStart']
+        coverage_sum, total_bases = sums.get(chromosome, (0., 0))
+        sums[chromosome] = (coverage_sum + exon['meanCoverage'] * bases,
+                            total_bases + bases)
+    return guess_sex(sums)
+
+
+def cache_key(bam_path, prefix=''):
+    """Build the cache key for a BAM file.
+
+    The key changes whenever the file is modified.
+
+    Args:
+        bam_path (path): path to a BAM alignment file
+        prefix (str, optional): string to prefix to 'X', 'Y'
+
+    Returns:
+        str: cache key
+    """
+    bam_stat = os.stat(bam_path)
+    return "{}:{}:{}:{}".format(os.path.abspath(bam_path), bam_stat.st_size,
+                                bam_stat.st_mtime_ns, prefix)
+
+
+def read_cache(cache_path):
+    """Read cached sex guesses.
+
+    Args:
+        cache_path (path): path to JSON cache file
+
+    Returns:
+        dict: SexGuess per cache key, empty if the file is missing/corrupt
+    """
+    try:
+        with open(cache_path) as handle:
+            data = json.load(handle)
+    except (IOError, ValueError):
+        return {}
+    return {key: SexGuess(*values) for key, values in data.items()}
+
+
+def write_cache(cache_path, cache):
+    """Write cached sex guesses, dropping entries for changed BAM files.
+
+    Entries for BAM files that are missing or were modified since are stale.
+    The file is replaced atomically.
+
+    Args:
+        cache_path (path): path to JSON cache file
+        cache (dict): SexGuess per cache key
+    """
+    data = {key: list(guess) for key, guess in cache.items()
+            if is_current(key)}
+    temp_path = "{}.tmp".format(cache_path)
+    with open(temp_path, 'w') as handle:
+        json.dump(data, handle)
+    os.replace(temp_path, cache_path)
+
+
+def is_current(key):
+    """Check that a cache key still matches its BAM file on disk.
+
+    Args:
+        key (str): cache key from ``cache_key``
+
+    Returns:
+        bool: False if the BAM file is missing or was modified since
+    """
+    bam_path, _, _, prefix = key.rsplit(':', 3)
+    try:
+        return cache_key(bam_path, prefix=prefix) == key
+    except OSError:
+        return False
+
+
+def drop_cached(cache, bam_paths):
+    """Drop the cached guesses for some BAM files, keeping all others.
+
+    Args:
+        cache (dict): SexGuess per cache key
+        bam_paths (List[path]): BAM files to forget
+
+    Returns:
+        dict: remaining SexGuess per cache key
+    """
+    dropped = set(os.path.abspath(bam_path) for bam_path in bam_paths)
+    return {key: guess for key, guess in cache.items()
+            if key.rsplit(':', 3)[0] not in dropped}
+
+
+def guess_bam(bam_path, prefix=''):
+    """Predict the sex from a BAM file, logging instead of raising errors.
+
+    Returns:
+        SexGuess: the guess or None if it failed
+    """
+    try:
+        return sex_from_bam(bam_path, prefix=prefix)
+    except Exception:
+        LOG.exception("failed to guess sex: %s", bam_path)
+        return None
+
+
+def sex_from_bams(bam_paths, prefix='', jobs=1, cache=None):
+    """Predict the sex for many BAM files using a pool of workers.
+
+    Args:
+        bam_paths (List[path]): paths to BAM alignment files
+        prefix (str, optional): string to prefix to 'X', 'Y'
+        jobs (Optional[int]): number of worker processes
+        cache (Optional[dict]): cached guesses, updated with new guesses
+
+    Returns:
+        List[tuple]: BAM path, SexGuess (None if failed), and whether it was
+            cached; in the same order as the input
+    """
+    cache = {} if cache is None else cache
+    keys = [cache_key(bam_path, prefix=prefix) for bam_path in bam_paths]
+    pending = [bam_path for bam_path, key in zip(bam_paths, keys)
+               if key not in cache]
+    LOG.info("%s cached, %s BAM files to process",
+             len(bam_paths) - len(pending), len(pending))
+
+    if jobs > 1 and len(pending) > 1:
+        pool = multiprocessing.Pool(min(jobs, len(pending)))
+        try:
+            guesses = pool.starmap(guess_bam, [(bam_path, prefix)
+                                               for bam_path in pending])
+        finally:
+            pool.terminate()
+            pool.join()
+    else:
+        guesses = [guess_bam(bam_path, prefix=prefix) for bam_path in pending]
+    new_guesses = dict(zip(pending, guesses))
+
+    results = []
+    for bam_path, key in zip(bam_paths, keys):
+        if bam_path in new_guesses:
+            guess = new_guesses[bam_path]
+            if guess is not None:
+                cache[key] = guess
+            results.append((bam_path, guess, False))
+        else:
+            results.append((bam_path, cache[key], True))
+    return results
@@ -4,14 +4,39 @@ import logging
 import os
 
 from alchy import Manager
+from sqlalchemy.orm import configure_mappers
 
 from chanjo.calculate import CalculateMixin
-from .models import BASE
+from chanjo.exons import ExonMixin
+from chanjo.panels import PanelMixin
+from .bulk import writer_for
+from .timing import QueryTimer
+from .models import (BASE, CoverageHistogram, ExonStat, PanelStat, Sample,
+                     Transcript, TranscriptStat)
 
+# columns copied from transcript stat models when bulk inserting
+STAT_COLUMNS = [column.name for column in TranscriptStat.__table__.columns
+                if column.name not in ('id', 'sample_key', 'transcript_key')]
 log = logging.getLogger(__name__)
 
 
-class ChanjoDB(Manager, CalculateMixin):
+def build_uri(db_uri):
+    """Expand a path to a SQLite database to a full database URI.
+
+    Args:
+        db_uri (str): path/URI to the database
+
+    Returns:
+        str: database URI
+    """
+    if '://' in db_uri:
+        return db_uri
+    # expect only a path to a sqlite database
+    db_path = os.path.abspath(os.path.expanduser(db_uri))
+    return "sqlite:///{}".format(db_path)
+
+
+class ChanjoDB(Manager, CalculateMixin, ExonMixin, PanelMixin):
     """SQLAlchemy-based database object.
 
     Bundles functionality required to setup and interact with various
@@ -61,16 +86,27 @@ class ChanjoDB(Manager, CalculateMixin):
         config = {'SQLALCHEMY_ECHO': debug}
         if 'mysql' in db_uri:  # pragma: no cover
             config['SQLALCHEMY_POOL_RECYCLE'] = 3600
-        elif '://' not in db_uri:
-            # expect only a path to a sqlite database
-            db_path = os.path.abspath(os.path.expanduser(db_uri))
-            db_uri = "sqlite:///{}".format(db_path)
-            self.uri = db_uri
+        db_uri = build_uri(db_uri)
+        self.uri = db_uri
 
         config['SQLALCHEMY_DATABASE_URI'] = db_uri
 
         # connect to the SQL database
         super(ChanjoDB, self).__init__(config=config, Model=self.Model)
+        # set up backrefs (e.g. ``TranscriptStat.sample``) used in queries
+        configure_mappers()
+
+    def instrument(self, slow_ms=None, explain=True):
+        """Start timing every SQL statement run on the database.
+
+        Args:
+            slow_ms (Optional[float]): log statements slower than this
+            explain (Optional[bool]): log the query plan of slow SELECTs
+
+        Returns:
+            QueryTimer: collects statistics per statement
+        """
+        return QueryTimer(slow_ms=slow_ms, explain=explain).attach(self.engine)
 
     @property
     def dialect(self):
@@ -122,3 +158,190 @@ class ChanjoDB(Manager, CalculateMixin):
             self.session.rollback()
             raise error
         return self
+
+    def add(self, *instances):
+        """Add instances to the session, like ``session.add_all()``.
+
+        Transcript stats created with string ids are linked to the keys of
+        their sample and transcript. Pending changes are flushed first so
+        new samples have keys assigned by the database.
+
+        Returns:
+            Session: the session for chainability
+
+        Raises:
+            ValueError: if a sample or transcript can't be resolved
+        """
+        models = []
+        for instance in instances:
+            models.extend(instance if isinstance(instance, list)
+                          else [instance])
+        stats = [model for model in models
+                 if isinstance(model, TranscriptStat) and
+                 (model.sample_key is None or model.transcript_key is None)]
+        super(ChanjoDB, self).add(*[model for model in models
+                                    if model not in stats])
+        if stats:
+            self.link_stats(stats)
+        return super(ChanjoDB, self).add(*stats)
+
+    def link_stats(self, stats):
+        """Resolve the string ids of transcript stats to integer keys.
+
+        Transcripts that aren't linked yet are registered from the
+        ``transcript_fields`` of the stat.
+
+        Args:
+            stats (List[TranscriptStat]): stats without keys
+
+        Raises:
+            ValueError: if a sample or transcript can't be resolved
+        """
+        self.session.flush()
+        sample_keys = dict(self.query(Sample.id, Sample.key))
+        tx_keys = dict(self.query(Transcript.id, Transcript.key))
+        new_transcripts = {}
+        for stat in stats:
+            tx_id = stat.transcript_id
+            if stat.transcript is None and tx_id not in tx_keys:
+                if stat.transcript_fields is None:
+                    raise ValueError("transcript not linked: {}"
+                                     .format(tx_id))
+                new_transcripts[tx_id] = Transcript(
+                    id=tx_id, **stat.transcript_fields)
+        if new_transcripts:
+            log.info("linking %s new transcripts", len(new_transcripts))
+            tx_keys.update(self.add_transcripts(new_transcripts.values()))
+
+        for stat in stats:
+            if stat.sample is None and stat.sample_key is None:
+                if stat.sample_id not in sample_keys:
+                    raise ValueError("sample not found: {}"
+                                     .format(stat.sample_id))
+                stat.sample_key = sample_keys[stat.sample_id]
+            if stat.transcript is None and stat.transcript_key is None:
+                stat.transcript_key = tx_keys[stat.transcript_id]
+
+    def delete_sample(self, sample_id):
+        """Delete a sample and all related stats with bulk statements.
+
+        Avoids loading every transcript stat through the ORM cascade. The
+        changes are only flushed, persist them using ``save``.
+
+        Args:
+            sample_id (str): unique sample id
+
+        Returns:
+            int: number of deleted transcript stats
+        """
+        sample_key = (self.query(Sample.key).filter_by(id=sample_id)
+                          .scalar())
+        if sample_key is None:
+            return 0
+        stats_query = (self.query(TranscriptStat)
+                           .filter_by(sample_key=sample_key))
+        stat_ids = stats_query.with_entities(TranscriptStat.id).subquery()
+        histograms_query = (self.query(CoverageHistogram)
+                                .filter(CoverageHistogram.id.in_(stat_ids)))
+        histograms_query.delete(synchronize_session=False)
+        count = stats_query.delete(synchronize_session=False)
+        exon_query = self.query(ExonStat).filter_by(sample_key=sample_key)
+        exon_query.delete(synchronize_session=False)
+        panel_query = self.query(PanelStat).filter_by(sample_key=sample_key)
+        panel_query.delete(synchronize_session=False)
+        sample_query = self.query(Sample).filter_by(key=sample_key)
+        sample_query.delete(synchronize_session=False)
+        return count
+
+    def bulk_insert(self, table, rows):
+        """Insert rows using the fastest path for the database dialect.
+
+        Runs ``COPY`` on PostgreSQL, multi-row ``VALUES`` on MySQL, and
+        ``executemany`` otherwise. The rows are inserted in the current
+        transaction, persist them using ``save``.
+
+        Args:
+            table (Table): table to insert into
+            rows (iterable): dicts with a value for every column
+
+        Returns:
+            int: number of inserted rows
+        """
+        writer = writer_for(self.dialect)
+        log.debug("bulk inserting into %s using %s", table.name,
+                  writer.__name__)
+        return writer(self.session.connection(), table, rows)
+
+    def add_transcripts(self, models):
+        """Add new transcripts with a bulk insert.
+
+        Surrogate keys are assigned by the database and read back after.
+
+        Args:
+            models (iterable): transcript models not yet in the database
+
+        Returns:
+            dict: surrogate key per transcript id
+        """
+        columns = [column.name for column in Transcript.__table__.columns
+                   if column.name != 'key']
+        rows = [{column: getattr(tx_model, column) for column in columns}
+                for tx_model in models]
+        self.bulk_insert(Transcript.__table__, rows)
+        new_ids = set(row['id'] for row in rows)
+        return {tx_id: key for tx_id, key in
+                self.query(Transcript.id, Transcript.key)
+                if tx_id in new_ids}
+
+    def add_stats(self, sample_obj, models):
+        """Add a sample with transcript stats using bulk inserts.
+
+        Transcripts that aren't linked yet are registered first. Coverage
+        histograms attached to the models are inserted as well. The changes
+        are only flushed, persist them using ``save``.
+
+        Args:
+            sample_obj (Sample): new sample model
+            models (iterable): transcript stat models for the sample
+
+        Returns:
+            int: number of inserted transcript stats
+
+        Raises:
+            ValueError: if a transcript isn't linked and can't be registered
+        """
+        self.add(sample_obj)
+        self.session.flush()
+        tx_keys = dict(self.query(Transcript.id, Transcript.key))
+        new_transcripts = {}
+        rows = []
+        histograms = {}
+        for tx_model in models:
+            tx_id = tx_model.transcript_id
+            if tx_id not in tx_keys and tx_id not in new_transcripts:
+                if tx_model.transcript_fields is None:
+                    raise ValueError("transcript not linked: {}".format(tx_id))
+                new_transcripts[tx_id] = Transcript(
+                    id=tx_id, **tx_model.transcript_fields)
+            row = {column: getattr(tx_model, column) for column in STAT_COLUMNS}
+            row['sample_key'] = sample_obj.key
+            rows.append((tx_id, row))
+            if tx_model.histogram is not None:
+                histograms[tx_id] = tx_model.histogram.data
+
+        if new_transcripts:
+            log.info("linking %s new transcripts", len(new_transcripts))
+            tx_keys.update(self.add_transcripts(new_transcripts.values()))
+        for tx_id, row in rows:
+            row['transcript_key'] = tx_keys[tx_id]
+        count = self.bulk_insert(TranscriptStat.__table__,
+                                 (row for _, row in rows))
+
+        if histograms:
+            stat_ids = dict(self.query(TranscriptStat.transcript_key,
+                                       TranscriptStat.id)
+                                .filter_by(sample_key=sample_obj.key))
+            histogram_rows = ({'id': stat_ids[tx_keys[tx_id]], 'data': data}
+                              for tx_id, data in histograms.items())
+            self.bulk_insert(CoverageHistogram.__table__, histogram_rows)
+        return count
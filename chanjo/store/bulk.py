@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""Dialect specific paths to insert a lot of rows at once.
+
+PostgreSQL streams rows through ``COPY ... FROM STDIN`` and MySQL uses
+multi-row ``INSERT ... VALUES`` statements. Other dialects (SQLite) fall
+back to a regular ``executemany``. All paths run on the connection of the
+current session so they take part in the ongoing transaction.
+"""
+import csv
+import io
+from itertools import islice
+
+# rows per COPY buffer/INSERT statement
+CHUNK_SIZE = 10000
+VALUES_CHUNK_SIZE = 1000
+
+
+def chunked(rows, size):
+    """Split rows into lists of at most ``size`` rows.
+
+    Args:
+        rows (iterable): rows to split up
+        size (int): max rows per chunk
+
+    Yields:
+        list: chunk of rows
+    """
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            break
+        yield chunk
+
+
+def copy_value(value):
+    """Format a value for a CSV field read by ``COPY``.
+
+    Binary values (e.g. packed histograms) use the ``bytea`` hex format,
+    ``csv`` would otherwise write their Python representation.
+
+    Args:
+        value: column value
+
+    Returns:
+        value as written to the CSV buffer
+    """
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return '\\x' + bytes(value).hex()
+    return value
+
+
+def csv_buffer(rows, columns):
+    """Write rows as CSV to a text buffer as expected by ``COPY``.
+
+    ``None`` values are written as unquoted empty fields (NULL).
+
+    Args:
+        rows (List[dict]): rows to write
+        columns (List[str]): column names to write in order
+
+    Returns:
+        io.StringIO: buffer rewound to the start
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    for row in rows:
+        writer.writerow([copy_value(row[column]) for column in columns])
+    buffer.seek(0)
+    return buffer
+
+
+def copy_rows(connection, table, rows):
+    """Insert rows using ``COPY ... FROM STDIN`` (PostgreSQL).
+
+    Args:
+        connection (Connection): SQLAlchemy connection
+        table (Table): table to insert into
+        rows (iterable): dicts with a value for every column
+
+    Returns:
+        int: number of inserted rows
+    """
+    count = 0
+    columns = None
+    preparer = connection.dialect.identifier_preparer
+    cursor = connection.connection.cursor()
+    try:
+        for chunk in chunked(rows, CHUNK_SIZE):
+            if columns is None:
+                columns = sorted(chunk[0])
+                statement = ("COPY {} ({}) FROM STDIN WITH CSV"
+                             .format(preparer.format_table(table),
+                                     ', '.join(preparer.quote(column)
+                                               for column in columns)))
+            cursor.copy_expert(statement, csv_buffer(chunk, columns))
+            count += len(chunk)
+    finally:
+        cursor.close()
+    return count
+
+
+def values_statements(table, rows, size=VALUES_CHUNK_SIZE):
+    """Build multi-row ``INSERT ... VALUES`` statements.
+
+    Args:
+        table (Table): table to insert into
+        rows (iterable): dicts with a value for every column
+        size (Optional[int]): max rows per statement
+
+    Yields:
+        tuple: insert statement, number of rows in it
+    """
+    for chunk in chunked(rows, size):
+        yield table.insert().values(chunk), len(chunk)
+
+
+def values_rows(connection, table, rows):
+    """Insert rows using multi-row ``INSERT ... VALUES`` (MySQL).
+
+    Args:
+        connection (Connection): SQLAlchemy connection
+        table (Table): table to insert into
+        rows (iterable): dicts with a value for every column
+
+    Returns:
+        int: number of inserted rows
+    """
+    count = 0
+    for statement, size in values_statements(table, rows):
+        connection.execute(statement)
+        count += size
+    return count
+
+
+def executemany_rows(connection, table, rows):
+    """Insert rows using ``executemany``.
+
+    Args:
+        connection (Connection): SQLAlchemy connection
+        table (Table): table to insert into
+        rows (iterable): dicts with a value for every column
+
+    Returns:
+        int: number of inserted rows
+    """
+    count = 0
+    for chunk in chunked(rows, CHUNK_SIZE):
+        connection.execute(table.insert(), chunk)
+        count += len(chunk)
+    return count
+
+
+WRITERS = {
+    'postgresql': copy_rows,
+    'mysql': values_rows,
+}
+
+
+def writer_for(dialect):
+    """Pick the fastest bulk insert function for a dialect.
+
+    Args:
+        dialect (str): name of the database dialect
+
+    Returns:
+        function: bulk insert function
+    """
+    return WRITERS.get(dialect, executemany_rows)
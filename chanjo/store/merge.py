@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""Merge samples from other chanjo databases into a central store.
+
+Each node of a cluster can load samples into a local SQLite file which are
+then gathered into one database. Rows are streamed from the source database
+and bulk inserted into the target in a single transaction per source.
+Surrogate keys are local to each database and are remapped along the way.
+"""
+from collections import namedtuple
+import logging
+import time
+
+from sqlalchemy import select
+
+from .migrate import needs_migration
+from .models import (CoverageHistogram, ExonRegion, ExonStat, Sample,
+                     Transcript, TranscriptStat)
+
+CONFLICT_MODES = ('abort', 'skip', 'replace')
+# transcript columns that must agree between databases
+TRANSCRIPT_COLUMNS = ('gene_id', 'gene_name', 'chromosome', 'length')
+
+MergeReport = namedtuple('MergeReport', ['samples', 'transcripts', 'stats',
+                                         'seconds', 'conflicts'])
+log = logging.getLogger(__name__)
+
+
+def merge_database(store, engine, on_conflict='abort'):
+    """Copy samples and their stats from a source database into a store.
+
+    The changes are only flushed, persist them using ``save``.
+
+    Args:
+        store (ChanjoDB): target database
+        engine (Engine): source database engine
+        on_conflict (Optional[str]): what to do with samples that are in both
+            databases: "abort", "skip" them, or "replace" the target samples
+
+    Returns:
+        MergeReport: counts, seconds spent, and conflicting sample ids
+
+    Raises:
+        ValueError: for sample conflicts (abort) or an outdated source
+    """
+    if on_conflict not in CONFLICT_MODES:
+        raise ValueError("unknown conflict mode: {}".format(on_conflict))
+    if needs_migration(engine):
+        raise ValueError('source database must be migrated first')
+    start_time = time.time()
+
+    with engine.connect() as connection:
+        samples = [dict(row) for row in
+                   connection.execute(select([Sample.__table__]))]
+        existing_ids = set(sample_id for sample_id, in store.query(Sample.id))
+        conflicts = sorted(sample['id'] for sample in samples
+                           if sample['id'] in existing_ids)
+        if conflicts and on_conflict == 'abort':
+            raise ValueError("samples already in database: {}"
+                             .format(', '.join(conflicts[:10])))
+        elif on_conflict == 'skip':
+            samples = [sample for sample in samples
+                       if sample['id'] not in existing_ids]
+        elif on_conflict == 'replace':
+            for sample_id in conflicts:
+                log.info("replacing sample: %s", sample_id)
+                store.delete_sample(sample_id)
+
+        tx_keys, new_transcripts = merge_transcripts(store, connection)
+        sample_keys = merge_samples(store, samples)
+        stats = merge_stats(store, connection, sample_keys, tx_keys)
+        merge_exon_stats(store, connection, sample_keys)
+
+    return MergeReport(samples=len(sample_keys), transcripts=new_transcripts,
+                       stats=stats, seconds=time.time() - start_time,
+                       conflicts=conflicts)
+
+
+def merge_transcripts(store, connection):
+    """Add transcripts missing from the store and map their keys.
+
+    Transcripts defined differently in the two databases keep the
+    definition in the store.
+
+    Args:
+        store (ChanjoDB): target database
+        connection (Connection): source database connection
+
+    Returns:
+        tuple: target key per source key, number of new transcripts
+    """
+    columns = ['id', 'key'] + list(TRANSCRIPT_COLUMNS)
+    existing = {row[0]: row for row in
+                store.query(*[getattr(Transcript, column)
+                              for column in columns])}
+    tx_keys = {}
+    new_transcripts = {}
+    mismatches = 0
+    query = select([Transcript.__table__.c[column] for column in columns])
+    for row in connection.execute(query):
+        target_row = existing.get(row['id'])
+        if target_row is None:
+            new_transcripts[row['key']] = Transcript(
+                id=row['id'], **{column: row[column]
+                                 for column in TRANSCRIPT_COLUMNS})
+        else:
+            tx_keys[row['key']] = target_row[1]
+            if tuple(target_row[2:]) != tuple(row[2:]):
+                mismatches += 1
+    if mismatches:
+        log.warning("%s transcripts differ between databases, keeping "
+                    "existing definitions", mismatches)
+    if new_transcripts:
+        key_map = store.add_transcripts(new_transcripts.values())
+        for source_key, tx_model in new_transcripts.items():
+            tx_keys[source_key] = key_map[tx_model.id]
+    return tx_keys, len(new_transcripts)
+
+
+def merge_samples(store, samples):
+    """Insert samples, the database assigns them new surrogate keys.
+
+    Args:
+        store (ChanjoDB): target database
+        samples (List[dict]): sample rows from the source database
+
+    Returns:
+        dict: target key per source key
+    """
+    if not samples:
+        return {}
+    rows = [{column: value for column, value in sample.items()
+             if column != 'key'} for sample in samples]
+    store.bulk_insert(Sample.__table__, rows)
+    new_keys = dict(store.query(Sample.id, Sample.key))
+    return {sample['key']: new_keys[sample['id']] for sample in samples}
+
+
+def merge_stats(store, connection, sample_keys, tx_keys):
+    """Stream transcript stats and coverage histograms into the store.
+
+    Args:
+        store (ChanjoDB): target database
+        connection (Connection): source database connection
+        sample_keys (dict): target sample key per source key
+        tx_keys (dict): target transcript key per source key
+
+    Returns:
+        int: number of copied transcript stats
+    """
+    if not sample_keys:
+        return 0
+    stat_table = TranscriptStat.__table__
+    columns = [column for column in stat_table.columns if column.name != 'id']
+    stream = connection.execution_options(stream_results=True)
+    rows = (dict(row, sample_key=sample_keys[row['sample_key']],
+                 transcript_key=tx_keys[row['transcript_key']])
+            for row in stream.execute(select(columns))
+            if row['sample_key'] in sample_keys)
+    count = store.bulk_insert(stat_table, rows)
+
+    histogram_table = CoverageHistogram.__table__
+    histogram_query = (select([stat_table.c.sample_key,
+                               stat_table.c.transcript_key,
+                               histogram_table.c.data])
+                       .select_from(stat_table.join(histogram_table)))
+    histograms = [row for row in stream.execute(histogram_query)
+                  if row[0] in sample_keys]
+    if histograms:
+        stat_ids = {(sample_key, tx_key): stat_id for sample_key, tx_key, stat_id
+                    in store.query(TranscriptStat.sample_key,
+                                   TranscriptStat.transcript_key,
+                                   TranscriptStat.id)
+                            .filter(TranscriptStat.sample_key.in_(
+                                list(sample_keys.values())))}
+        histogram_rows = ({'id': stat_ids[(sample_keys[sample_key],
+                                           tx_keys[tx_key])],
+                           'data': data}
+                          for sample_key, tx_key, data in histograms)
+        store.bulk_insert(histogram_table, histogram_rows)
+    return count
+
+
+def merge_exon_stats(store, connection, sample_keys):
+    """Copy exon level stats, reordered to the exon ordering of the store.
+
+    Exons missing from the store are appended to its ordering.
+
+    Args:
+        store (ChanjoDB): target database
+        connection (Connection): source database connection
+        sample_keys (dict): target sample key per source key of merged samples
+
+    Returns:
+        int: number of copied exon stats
+    """
+    region_table = ExonRegion.__table__
+    regions = [(row['chromosome'], row['start'], row['end']) for row in
+               connection.execute(select([region_table])
+                                  .order_by(region_table.c.id))]
+    if not regions or not sample_keys:
+        return 0
+    store.add_exon_regions(regions)
+    positions = store.exon_positions()
+    # source exon index -> store exon index
+    indexes = [positions[region] for region in regions]
+    size = len(positions)
+
+    rows = []
+    for row in connection.execute(select([ExonStat.__table__])):
+        if row['sample_key'] not in sample_keys:
+            continue
+        values = [float('nan')] * size
+        for index, value in zip(indexes, ExonStat.unpack(row['data'])):
+            values[index] = value
+        rows.append({'sample_key': sample_keys[row['sample_key']],
+                     'metric': row['metric'], 'data': ExonStat.pack(values)})
+    store.session.flush()
+    return store.bulk_insert(ExonStat.__table__, rows)
@@ -0,0 +1,372 @@
+# -*- coding: utf-8 -*-
+"""Migrate databases set up before the integer surrogate keys.
+
+Older databases link transcript stats to samples and transcripts by their
+string ids. The migration rebuilds the sample and transcript tables with
+an integer key (assigned by the database) as primary key, and the
+transcript stat (and coverage histogram) tables to only store those keys.
+Columns added to existing tables since are created too.
+
+SQLite tables are rebuilt the way SQLite alters them: a new table is
+created, filled, and swapped in. MySQL tables are altered in place instead,
+MySQL commits each ``ALTER TABLE`` right away so back up the database first.
+Other dialects are refused, set them up from scratch and merge the old
+database into them instead.
+"""
+from sqlalchemy import MetaData, Table, inspect, select
+from sqlalchemy.schema import CreateTable
+
+from .models import CoverageHistogram, Sample, Transcript, TranscriptStat
+
+LEGACY_SUFFIX = '_legacy'
+NEW_SUFFIX = '_new'
+STAT_COLUMNS = ('id', 'mean_coverage', 'completeness_10', 'completeness_15',
+                'completeness_20', 'completeness_50', 'completeness_100',
+                'threshold', '_incomplete_exons')
+# columns added to existing tables after they were first released
+NEW_COLUMNS = tuple(Sample.__table__.c[column] for column in
+                    ('fingerprint', 'sex', 'x_coverage', 'y_coverage'))
+# dialects that tables can be rebuilt in
+REBUILD_DIALECTS = ('sqlite',)
+# dialects that tables can be altered in place in
+ALTER_DIALECTS = ('mysql',)
+
+
+def needs_migration(engine):
+    """Check if the database is set up with an outdated schema.
+
+    Args:
+        engine (Engine): database engine
+
+    Returns:
+        bool: whether ``migrate_keys`` should be run
+    """
+    inspector = inspect(engine)
+    if TranscriptStat.__tablename__ not in inspector.get_table_names():
+        return False
+    return needs_rebuild(inspector) or bool(missing_columns(inspector))
+
+
+def links_by_ids(inspector):
+    """Check if the transcript stats still link by string ids."""
+    columns = inspector.get_columns(TranscriptStat.__tablename__)
+    return 'sample_id' in set(column['name'] for column in columns)
+
+
+def needs_rebuild(inspector):
+    """Check if samples or transcripts aren't keyed by integers yet.
+
+    Args:
+        inspector (Inspector): database inspector
+
+    Returns:
+        bool: whether any of the tables have to be rebuilt
+    """
+    if links_by_ids(inspector):
+        return True
+    for model in (Sample, Transcript):
+        primary_key = inspector.get_pk_constraint(model.__tablename__)
+        if primary_key['constrained_columns'] != ['key']:
+            return True
+    return False
+
+
+def missing_columns(inspector):
+    """List new columns that are missing from existing tables.
+
+    Args:
+        inspector (Inspector): database inspector
+
+    Returns:
+        List[Column]: columns to add
+    """
+    missing = []
+    for column in NEW_COLUMNS:
+        names = set(existing['name'] for existing
+                    in inspector.get_columns(column.table.name))
+        if column.name not in names:
+            missing.append(column)
+    return missing
+
+
+def migrate_keys(engine):
+    """Move samples, transcripts, and their stats over to integer keys.
+
+    Runs in a single transaction. Adds any missing new columns as well.
+
+    Args:
+        engine (Engine): database engine
+
+    Returns:
+        int: number of migrated transcript stats
+
+    Raises:
+        ValueError: if stats are linked to transcripts that aren't stored or
+            the tables can't be rebuilt in the database dialect
+    """
+    with engine.begin() as connection:
+        inspector = inspect(connection)
+        rebuild = needs_rebuild(inspector)
+        dialect = connection.dialect.name
+        if rebuild and dialect not in REBUILD_DIALECTS + ALTER_DIALECTS:
+            raise ValueError("can't migrate {} databases in place, set up a "
+                             "new database and merge into it"
+                             .format(dialect))
+        legacy_stats = links_by_ids(inspector)
+        if legacy_stats:
+            check_linked(connection)
+
+        for column in missing_columns(inspector):
+            add_column(connection, column)
+            add_index(connection, column)
+        if not rebuild:
+            return 0
+        if dialect in ALTER_DIALECTS:
+            return alter_keys(connection, legacy_stats)
+        for model in (Sample, Transcript):
+            rebuild_table(connection, model.__table__)
+        if not legacy_stats:
+            return 0
+
+        stat_table = rename_legacy(connection, TranscriptStat.__table__)
+        legacy_stats = Table(stat_table, MetaData(), autoload=True,
+                             autoload_with=connection)
+        histogram_table = None
+        inspector = inspect(connection)
+        if CoverageHistogram.__tablename__ in inspector.get_table_names():
+            histogram_table = rename_legacy(connection,
+                                            CoverageHistogram.__table__)
+
+        TranscriptStat.__table__.create(connection)
+        CoverageHistogram.__table__.create(connection)
+
+        columns = [legacy_stats.c[column] for column in STAT_COLUMNS]
+        stats_query = (select(columns + [Sample.key, Transcript.key])
+                       .select_from(legacy_stats
+                                    .join(Sample, Sample.id ==
+                                          legacy_stats.c.sample_id)
+                                    .join(Transcript, Transcript.id ==
+                                          legacy_stats.c.transcript_id)))
+        new_columns = list(STAT_COLUMNS) + ['sample_key', 'transcript_key']
+        result = connection.execute(TranscriptStat.__table__.insert()
+                                    .from_select(new_columns, stats_query))
+        count = result.rowcount
+
+        if histogram_table:
+            legacy_histograms = Table(histogram_table, MetaData(),
+                                      autoload=True, autoload_with=connection)
+            histograms_query = select([legacy_histograms.c.id,
+                                       legacy_histograms.c.data])
+            connection.execute(CoverageHistogram.__table__.insert()
+                               .from_select(['id', 'data'], histograms_query))
+            legacy_histograms.drop(connection)
+        legacy_stats.drop(connection)
+    return count
+
+
+def check_linked(connection):
+    """Check that all legacy transcript stats link to stored transcripts.
+
+    Args:
+        connection (Connection): database connection
+
+    Raises:
+        ValueError: if stats are linked to transcripts that aren't stored
+    """
+    legacy_stats = Table(TranscriptStat.__tablename__, MetaData(),
+                         autoload=True, autoload_with=connection)
+    transcripts = Table(Transcript.__tablename__, MetaData(), autoload=True,
+                        autoload_with=connection)
+    unlinked = (select([legacy_stats.c.transcript_id]).distinct()
+                .where(~legacy_stats.c.transcript_id.in_(
+                    select([transcripts.c.id]))))
+    unlinked_ids = [row[0] for row in connection.execute(unlinked)]
+    if unlinked_ids:
+        raise ValueError("link transcripts first, missing: {}"
+                         .format(', '.join(unlinked_ids[:10])))
+
+
+def alter_keys(connection, legacy_stats):
+    """Move over to integer keys by altering the tables in place (MySQL).
+
+    Transcript stats keep their ids so coverage histograms are left as-is.
+
+    Args:
+        connection (Connection): database connection
+        legacy_stats (bool): whether stats still link by string ids
+
+    Returns:
+        int: number of migrated transcript stats
+    """
+    preparer = connection.dialect.identifier_preparer
+    stat_table = TranscriptStat.__table__
+    if legacy_stats:
+        # the foreign keys reference the primary keys that are replaced
+        foreign_keys = inspect(connection).get_foreign_keys(stat_table.name)
+        if foreign_keys:
+            connection.execute("ALTER TABLE {} {}".format(
+                preparer.format_table(stat_table),
+                ', '.join("DROP FOREIGN KEY {}"
+                          .format(preparer.quote(foreign_key['name']))
+                          for foreign_key in foreign_keys)))
+
+    for model in (Sample, Transcript):
+        add_index(connection, model.__table__.c.id)
+        connection.execute(key_statement(model.__table__, connection.dialect))
+    if not legacy_stats:
+        return 0
+
+    for column in ('sample_key', 'transcript_key'):
+        add_column(connection, stat_table.c[column])
+    legacy_table = Table(stat_table.name, MetaData(), autoload=True,
+                         autoload_with=connection)
+    samples, transcripts = Sample.__table__, Transcript.__table__
+    result = connection.execute(
+        legacy_table.update().values(
+            sample_key=(select([samples.c.key])
+                        .where(samples.c.id == legacy_table.c.sample_id)
+                        .as_scalar()),
+            transcript_key=(select([transcripts.c.key])
+                            .where(transcripts.c.id ==
+                                   legacy_table.c.transcript_id)
+                            .as_scalar())))
+    connection.execute(link_statement(stat_table, connection.dialect))
+    return result.rowcount
+
+
+def key_statement(table, dialect):
+    """Compose the statement to key a sample or transcript table by integer.
+
+    The database assigns keys in the order of the old string primary key.
+
+    Args:
+        table (Table): sample or transcript table in the new schema
+        dialect (Dialect): MySQL database dialect
+
+    Returns:
+        str: ``ALTER TABLE`` statement
+    """
+    preparer = dialect.identifier_preparer
+    return ("ALTER TABLE {} DROP PRIMARY KEY, ADD COLUMN {} {} NOT NULL "
+            "AUTO_INCREMENT PRIMARY KEY FIRST"
+            .format(preparer.format_table(table),
+                    preparer.format_column(table.c.key),
+                    table.c.key.type.compile(dialect=dialect)))
+
+
+def link_statement(table, dialect):
+    """Compose the statement to link transcript stats by the integer keys.
+
+    Drops the string id columns and constrains the filled in key columns.
+
+    Args:
+        table (Table): transcript stat table in the new schema
+        dialect (Dialect): MySQL database dialect
+
+    Returns:
+        str: ``ALTER TABLE`` statement
+    """
+    preparer = dialect.identifier_preparer
+    constraint = next(constraint for constraint in table.constraints
+                      if constraint.name == '_sample_transcript_uc')
+    changes = ["DROP INDEX {}".format(preparer.format_constraint(constraint)),
+               'DROP COLUMN sample_id', 'DROP COLUMN transcript_id']
+    for column in ('sample_key', 'transcript_key'):
+        changes.append("MODIFY {} {} NOT NULL".format(
+            column, table.c[column].type.compile(dialect=dialect)))
+    changes.append("ADD CONSTRAINT {} UNIQUE (sample_key, transcript_key)"
+                   .format(preparer.format_constraint(constraint)))
+    links = [('sample_key', Sample.__table__),
+             ('transcript_key', Transcript.__table__)]
+    for column, parent_table in links:
+        changes.append("ADD FOREIGN KEY ({}) REFERENCES {} ({})".format(
+            column, preparer.format_table(parent_table),
+            preparer.format_column(parent_table.c.key)))
+    return "ALTER TABLE {} {}".format(preparer.format_table(table),
+                                      ', '.join(changes))
+
+
+def rebuild_table(connection, table):
+    """Rebuild a sample or transcript table keyed by the integer key.
+
+    Keys already assigned are kept, the database assigns the rest in the
+    order of ids.
+
+    Args:
+        connection (Connection): database connection
+        table (Table): sample or transcript table in the new schema
+    """
+    old_table = Table(table.name, MetaData(), autoload=True,
+                      autoload_with=connection)
+    new_table = table.tometadata(MetaData(), name=table.name + NEW_SUFFIX)
+    # indexes are created once the table has its final name
+    connection.execute(CreateTable(new_table))
+    columns = [column.name for column in table.columns
+               if column.name in old_table.c]
+    rows_query = (select([old_table.c[column] for column in columns])
+                  .order_by(old_table.c.id))
+    connection.execute(new_table.insert().from_select(columns, rows_query))
+    old_table.drop(connection)
+
+    preparer = connection.dialect.identifier_preparer
+    connection.execute("ALTER TABLE {} RENAME TO {}"
+                       .format(preparer.format_table(new_table),
+                               preparer.format_table(table)))
+    for index in table.indexes:
+        index.create(connection)
+
+
+def add_index(connection, column):
+    """Create the index of a single column unless it's already there.
+
+    Args:
+        connection (Connection): database connection
+        column (Column): indexed column in the new schema
+    """
+    table = column.table
+    indexes = inspect(connection).get_indexes(table.name)
+    if not any(index['column_names'] == [column.name] for index in indexes):
+        for index in table.indexes:
+            if list(index.columns) == [column]:
+                index.create(connection)
+
+
+def add_column(connection, column):
+    """Add a column to an existing table unless it's already there.
+
+    Args:
+        connection (Connection): database connection
+        column (Column): column in the new schema
+
+    Returns:
+        bool: whether the column was added
+    """
+    table = column.table
+    columns = inspect(connection).get_columns(table.name)
+    if column.name in set(existing['name'] for existing in columns):
+        return False
+    # "key" is a reserved word in some dialects
+    preparer = connection.dialect.identifier_preparer
+    connection.execute("ALTER TABLE {} ADD COLUMN {} {}"
+                       .format(preparer.format_table(table),
+                               preparer.format_column(column),
+                               column.type.compile(dialect=connection.dialect)))
+    return True
+
+
+def rename_legacy(connection, table):
+    """Rename a table out of the way for the new schema.
+
+    Args:
+        connection (Connection): database connection
+        table (Table): table in the new schema
+
+    Returns:
+        str: name of the legacy table
+    """
+    legacy_name = table.name + LEGACY_SUFFIX
+    preparer = connection.dialect.identifier_preparer
+    connection.execute("ALTER TABLE {} RENAME TO {}"
+                       .format(preparer.format_table(table),
+                               preparer.quote(legacy_name)))
+    return legacy_name
@@ -1,9 +1,15 @@
 # -*- coding: utf-8 -*-
+from __future__ import division
+from array import array
 from collections import namedtuple
 from datetime import datetime
+from operator import truediv
+import sys
 
 from alchy import ModelBase, make_declarative_base
-from sqlalchemy import Column, types, ForeignKey, UniqueConstraint, orm
+from sqlalchemy import (Column, and_, select, types, ForeignKey,
+                        UniqueConstraint, orm)
+from sqlalchemy.ext.hybrid import Comparator, hybrid_property
 
 Exon = namedtuple('Exon', ['chrom', 'start', 'end', 'completeness'])
 
@@ -17,7 +23,12 @@ class Transcript(BASE):
 
     A :class:`Transcript` can *only* be related to a single gene.
 
+    The string id is the primary key of the model, e.g. for
+    ``Transcript.query.get(...)``. The table is keyed by the integer key
+    which stats link to.
+
     Args:
+        key (int): compact surrogate key, assigned by the database
         id (str): unique transcript id (e.g. CCDS)
         gene_id (str): related gene
         chromosome (str): related contig id
@@ -26,12 +37,15 @@ class Transcript(BASE):
 
     __tablename__ = 'transcript'
 
-    id = Column(types.String(32), primary_key=True)
+    key = Column(types.Integer, primary_key=True)
+    id = Column(types.String(32), index=True, unique=True, nullable=False)
     gene_id = Column(types.Integer, index=True, nullable=False)
     gene_name = Column(types.String(32), index=True)
     chromosome = Column(types.String(10))
     length = Column(types.Integer)
 
+    __mapper_args__ = {'primary_key': [id]}
+
     stats = orm.relationship('TranscriptStat', backref='transcript')
 
 
@@ -39,31 +53,92 @@ class Sample(BASE):
 
     """Metadata for a single sample.
 
+    Keyed like :class:`Transcript`, by string id in the model.
+
     Args:
+        key (int): compact surrogate key, assigned by the database
         id (str): unique sample id
         group_id (str): unique group id
         source (str): path to coverage source Sambamba output/BAM file
+        fingerprint (str): fingerprint of the loaded input file(s)
+        sex (str): predicted sex, "male", "female", or "unknown"
+        x_coverage (float): mean coverage of exons on the X chromosome
+        y_coverage (float): mean coverage of exons on the Y chromosome
         created_at (DateTime): date of addition to database
     """
 
     __tablename__ = 'sample'
 
-    id = Column(types.String(32), primary_key=True)
+    key = Column(types.Integer, primary_key=True)
+    id = Column(types.String(32), index=True, unique=True, nullable=False)
     group_id = Column(types.String(128), index=True)
     source = Column(types.String(256))
+    fingerprint = Column(types.String(64), index=True)
+    sex = Column(types.String(16))
+    x_coverage = Column(types.Float)
+    y_coverage = Column(types.Float)
     created_at = Column(types.DateTime, default=datetime.now)
 
     name = Column(types.String(128))
     group_name = Column(types.String(128))
 
+    __mapper_args__ = {'primary_key': [id]}
+
     sample = orm.relationship('TranscriptStat', cascade='all,delete',
                               backref='sample')
+    exon_stats = orm.relationship('ExonStat', cascade='all,delete',
+                                  backref='sample')
+    panel_stats = orm.relationship('PanelStat', cascade='all,delete',
+                                   backref='sample')
+
+
+class KeyComparator(Comparator):
+
+    """Compare string ids by joining the related table on the integer key.
+
+    Comparisons add the related table to the query together with the join
+    condition, e.g. ``filter_by(sample_id=...)`` looks up the indexed
+    ``sample.id`` once instead of per row. Selecting the attribute itself
+    falls back to a subquery, select ``Sample.id`` over a join instead.
+
+    Args:
+        key_column (Column): surrogate key column on the related table
+        model (class): model with the string ``id`` and ``key`` columns
+    """
+
+    def __init__(self, key_column, model):
+        expression = (select([model.id])
+                      .where(model.key == key_column)
+                      .as_scalar())
+        super(KeyComparator, self).__init__(expression)
+        self.key_column = key_column
+        self.model = model
+
+    def joined(self, criterion):
+        """Combine a criterion on the string id with the join condition."""
+        return and_(self.key_column == self.model.key, criterion)
+
+    def __eq__(self, other):
+        return self.joined(self.model.id == other)
+
+    def __ne__(self, other):
+        return self.joined(self.model.id != other)
+
+    def in_(self, other):
+        return self.joined(self.model.id.in_(other))
+
+    def notin_(self, other):
+        return self.joined(self.model.id.notin_(other))
 
 
 class TranscriptStat(BASE):
 
     """Statistics on transcript level, related to sample and transcript.
 
+    Rows only store the integer keys of the sample and transcript. String
+    ids can still be used to query models, new models are linked through
+    the ``sample``/``transcript`` relationships or the keys directly.
+
     Args:
         sample_id (str): link to sample record
         sample (Sample): parent Sample record
@@ -75,7 +150,7 @@ class TranscriptStat(BASE):
     """
 
     __tablename__ = 'transcript_stat'
-    __table_args__ = (UniqueConstraint('sample_id', 'transcript_id',
+    __table_args__ = (UniqueConstraint('sample_key', 'transcript_key',
                                        name='_sample_transcript_uc'),)
 
     id = Column(types.Integer, primary_key=True)
@@ -89,16 +164,63 @@ class TranscriptStat(BASE):
     threshold = Column(types.Integer)
     _incomplete_exons = Column(types.Text)
 
-    sample_id = Column(types.String(32), ForeignKey('sample.id'),
-                       nullable=False)
-    transcript_id = Column(types.String(32), ForeignKey('transcript.id'),
-                           nullable=False)
+    sample_key = Column(types.Integer, ForeignKey('sample.key'),
+                        nullable=False)
+    transcript_key = Column(types.Integer, ForeignKey('transcript.key'),
+                            nullable=False)
+
+    # transcript columns to register an unlinked transcript with when bulk
+    # inserted (not stored)
+    transcript_fields = None
+
+    @hybrid_property
+    def sample_id(self):
+        """Return the id of the related sample."""
+        sample_id = getattr(self, '_sample_id', None)
+        if sample_id is None and self.sample is not None:
+            sample_id = self.sample.id
+        return sample_id
+
+    @sample_id.setter
+    def sample_id(self, value):
+        self._sample_id = value
+
+    @sample_id.comparator
+    def sample_id(cls):
+        return KeyComparator(cls.sample_key, Sample)
+
+    @hybrid_property
+    def transcript_id(self):
+        """Return the id of the related transcript."""
+        transcript_id = getattr(self, '_transcript_id', None)
+        if transcript_id is None and self.transcript is not None:
+            transcript_id = self.transcript.id
+        return transcript_id
+
+    @transcript_id.setter
+    def transcript_id(self, value):
+        self._transcript_id = value
+
+    @transcript_id.comparator
+    def transcript_id(cls):
+        return KeyComparator(cls.transcript_key, Transcript)
 
     @property
     def incomplete_exons(self):
         """Return a list of exons ids."""
-        raw_exons = (self._incomplete_exons.split(',') if
-                     self._incomplete_exons else [])
+        return self.parse_exons(self._incomplete_exons)
+
+    @staticmethod
+    def parse_exons(raw_value):
+        """Parse stored incomplete exons.
+
+        Args:
+            raw_value (str): comma separated list of exon ids
+
+        Yields:
+            Exon: incomplete exon
+        """
+        raw_exons = raw_value.split(',') if raw_value else []
         for raw_exon in raw_exons:
             data = raw_exon.split('|')
             yield Exon(chrom=data[0], start=int(data[1]), end=int(data[2]),
@@ -108,3 +230,285 @@ class TranscriptStat(BASE):
     def incomplete_exons(self, exon_list):
         raw_exons = ['|'.join(map(str, exon)) for exon in exon_list]
         self._incomplete_exons = ','.join(raw_exons) if raw_exons else None
+
+
+class CoverageHistogram(BASE):
+
+    """Cumulative coverage histogram for a transcript stat.
+
+    Stores the number of exon bases covered at each level, packed into a
+    compact binary column of little-endian uint32 values: the number of
+    levels, the levels, total bases, and the base counts. Completeness at
+    any of the stored levels can be derived without going back to the BAM
+    alignment. Output generated with ``--histogram-max`` stores every level
+    from 1 up to the max, so any level up to the max can be answered.
+
+    Args:
+        id (int): link to transcript stat record
+        stat (TranscriptStat): parent transcript stat record
+        data (bytes): packed levels, total bases, and base counts
+    """
+
+    __tablename__ = 'coverage_histogram'
+
+    id = Column(types.Integer, ForeignKey('transcript_stat.id'),
+                primary_key=True)
+    data = Column(types.LargeBinary, nullable=False)
+
+    stat = orm.relationship('TranscriptStat', backref=orm.backref(
+        'histogram', uselist=False, cascade='all,delete-orphan'))
+
+    @staticmethod
+    def pack(levels, bases, counts):
+        """Pack a histogram into bytes.
+
+        Args:
+            levels (List[int]): coverage levels (breakpoints)
+            bases (int): total number of exon bases
+            counts (List[int]): bases covered at each level
+
+        Returns:
+            bytes: packed histogram
+        """
+        values = array('I', [len(levels)] + list(levels) + [bases] +
+                       list(counts))
+        if sys.byteorder == 'big':  # pragma: no cover
+            values.byteswap()
+        return values.tobytes()
+
+    @staticmethod
+    def unpack_all(data):
+        """Unpack the values of one or more concatenated histograms.
+
+        Args:
+            data (bytes): packed histogram(s)
+
+        Returns:
+            array: unpacked uint32 values
+        """
+        values = array('I')
+        values.frombytes(data)
+        if sys.byteorder == 'big':  # pragma: no cover
+            values.byteswap()
+        return values
+
+    @classmethod
+    def unpack(cls, data):
+        """Unpack a histogram from bytes.
+
+        Args:
+            data (bytes): packed histogram
+
+        Returns:
+            tuple: levels, total bases, base counts
+        """
+        values = cls.unpack_all(data)
+        size = values[0]
+        return (list(values[1:size + 1]), values[size + 1],
+                list(values[size + 2:]))
+
+    @property
+    def levels(self):
+        """Return the stored coverage levels."""
+        return self.unpack(self.data)[0]
+
+    def completeness(self, level):
+        """Calculate the completeness at one of the stored levels.
+
+        Args:
+            level (int): coverage level
+
+        Returns:
+            float: percentage of bases covered at the level
+
+        Raises:
+            ValueError: if the level isn't stored in the histogram
+        """
+        levels, bases, counts = self.unpack(self.data)
+        return (100 * counts[levels.index(level)] / bases) if bases else 0.
+
+    @classmethod
+    def mean_completeness(cls, datas, level):
+        """Calculate the mean completeness over many histograms at once.
+
+        Histograms with the same levels are unpacked together as a single
+        array. Total bases and counts at the level are then read as strided
+        slices of it instead of unpacking histograms one by one.
+
+        Args:
+            datas (List[bytes]): packed histograms
+            level (int): coverage level
+
+        Returns:
+            float: mean percentage of bases covered at the level
+
+        Raises:
+            ValueError: if the level isn't stored in all histograms
+        """
+        header = cls.unpack_all(datas[0])
+        size = header[0]
+        row_size = size + 2 + size
+        values = cls.unpack_all(b''.join(datas))
+        same_levels = (set(map(len, datas)) == {len(datas[0])} and
+                       all(values[index::row_size].count(header[index]) ==
+                           len(datas) for index in range(size + 1)))
+        if not same_levels:
+            return (sum(cls(data=data).completeness(level) for data in datas) /
+                    len(datas))
+
+        index = list(header[1:size + 1]).index(level)
+        bases = values[size + 1::row_size]
+        counts = values[size + 2 + index::row_size]
+        if 0 in bases:
+            total = sum((count / total_bases) if total_bases else 0.
+                        for count, total_bases in zip(counts, bases))
+        else:
+            total = sum(map(truediv, counts, bases))
+        return 100 * total / len(datas)
+
+
+class ExonRegion(BASE):
+
+    """Exon in the shared ordering used for exon level stats.
+
+    The ordering is fixed when linking; new exons are only ever appended.
+
+    Args:
+        id (int): position of the exon in packed exon stat arrays
+        chromosome (str): related contig id
+        start (int): start position (0-based)
+        end (int): end position
+    """
+
+    __tablename__ = 'exon_region'
+    __table_args__ = (UniqueConstraint('chromosome', 'start', 'end',
+                                       name='_exon_region_uc'),)
+
+    id = Column(types.Integer, primary_key=True, autoincrement=False)
+    chromosome = Column(types.String(10), nullable=False)
+    start = Column(types.Integer, nullable=False)
+    end = Column(types.Integer, nullable=False)
+
+
+class ExonStat(BASE):
+
+    """Exon level metric for all exons of a sample.
+
+    Values are packed as little-endian float32 in the order of
+    :class:`ExonRegion` ids, exons without data are NaN. Rows link to the
+    sample by its integer key, like transcript stats.
+
+    Args:
+        sample_key (int): link to sample record
+        sample_id (str): id of the linked sample (read-only)
+        sample (Sample): parent Sample record
+        metric (str): name of the metric, e.g. "mean_coverage"
+        data (bytes): packed values
+    """
+
+    __tablename__ = 'exon_stat'
+
+    sample_key = Column(types.Integer, ForeignKey('sample.key'),
+                        primary_key=True)
+    metric = Column(types.String(32), primary_key=True)
+    data = Column(types.LargeBinary, nullable=False)
+
+    @hybrid_property
+    def sample_id(self):
+        """Return the id of the related sample."""
+        return self.sample.id if self.sample is not None else None
+
+    @sample_id.comparator
+    def sample_id(cls):
+        return KeyComparator(cls.sample_key, Sample)
+
+    @staticmethod
+    def pack(values):
+        """Pack values into little-endian float32 bytes."""
+        packed = array('f', values)
+        if sys.byteorder == 'big':  # pragma: no cover
+            packed.byteswap()
+        return packed.tobytes()
+
+    @staticmethod
+    def unpack(data):
+        """Unpack little-endian float32 bytes.
+
+        Returns:
+            array: unpacked values
+        """
+        values = array('f')
+        values.frombytes(data)
+        if sys.byteorder == 'big':  # pragma: no cover
+            values.byteswap()
+        return values
+
+    @property
+    def values(self):
+        """Return all exon values for the metric."""
+        return self.unpack(self.data)
+
+
+class Panel(BASE):
+
+    """Named set of genes, stored as its transcripts.
+
+    Args:
+        id (str): unique panel id
+        name (str): display name for the panel
+        created_at (DateTime): date of addition to database
+    """
+
+    __tablename__ = 'panel'
+
+    id = Column(types.String(32), primary_key=True)
+    name = Column(types.String(128))
+    created_at = Column(types.DateTime, default=datetime.now)
+
+    transcripts = orm.relationship('PanelTranscript', cascade='all,delete',
+                                   backref='panel')
+    stats = orm.relationship('PanelStat', cascade='all,delete',
+                             backref='panel')
+
+
+class PanelTranscript(BASE):
+
+    """Membership of a transcript in a gene panel.
+
+    Args:
+        panel_id (str): link to panel record
+        transcript_key (int): link to transcript record
+    """
+
+    __tablename__ = 'panel_transcript'
+
+    panel_id = Column(types.String(32), ForeignKey('panel.id'),
+                      primary_key=True)
+    transcript_key = Column(types.Integer, ForeignKey('transcript.key'),
+                            primary_key=True)
+
+
+class PanelStat(BASE):
+
+    """Precomputed mean statistics over the transcripts in a panel.
+
+    Args:
+        panel_id (str): link to panel record
+        sample_key (int): link to sample record
+        mean_coverage (Float): mean coverage across all transcripts
+        completeness_XX (Float): mean completeness at XX
+    """
+
+    __tablename__ = 'panel_stat'
+
+    panel_id = Column(types.String(32), ForeignKey('panel.id'),
+                      primary_key=True)
+    sample_key = Column(types.Integer, ForeignKey('sample.key'),
+                        primary_key=True)
+    mean_coverage = Column(types.Float)
+    completeness_10 = Column(types.Float)
+    completeness_15 = Column(types.Float)
+    completeness_20 = Column(types.Float)
+    completeness_50 = Column(types.Float)
+    completeness_100 = Column(types.Float)
+
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""Opt-in timing of SQL statements through SQLAlchemy engine events.
+
+Statements are grouped by a normalised form where literals and lists of
+parameters are replaced by placeholders. Statements slower than a threshold
+are logged together with their query plan and aggregated statistics can be
+logged at any time, e.g. when the process exits.
+"""
+from __future__ import division
+import hashlib
+import logging
+import re
+import time
+
+from sqlalchemy import event
+
+# statement prefix to show the query plan per dialect
+EXPLAIN_PREFIXES = {
+    'sqlite': 'EXPLAIN QUERY PLAN ',
+    'mysql': 'EXPLAIN ',
+    'postgresql': 'EXPLAIN ',
+}
+NORMALIZE_PATTERNS = [
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'%\(\w+\)s|%s|:\w+'), '?'),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(...)'),
+    # multi-row VALUES
+    (re.compile(r'\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+'), '(...)'),
+    (re.compile(r'\s+'), ' '),
+]
+
+log = logging.getLogger(__name__)
+
+
+def normalize(statement):
+    """Normalise a SQL statement to group similar statements.
+
+    Args:
+        statement (str): SQL statement
+
+    Returns:
+        str: statement with placeholders for literals and parameter lists
+    """
+    for pattern, replacement in NORMALIZE_PATTERNS:
+        statement = pattern.sub(replacement, statement)
+    return statement.strip()
+
+
+def fingerprint(statement):
+    """Build a short, stable id for a normalised statement."""
+    return hashlib.sha1(statement.encode('utf-8')).hexdigest()[:12]
+
+
+class QueryTimer:
+
+    """Record latency and row counts for every SQL statement.
+
+    Args:
+        slow_ms (Optional[float]): log statements slower than this
+        explain (Optional[bool]): log the query plan of slow SELECTs
+
+    Attributes:
+        stats (dict): count, total/max seconds, and rows per statement
+    """
+
+    def __init__(self, slow_ms=None, explain=True):
+        self.slow_ms = slow_ms
+        self.explain = explain
+        self.stats = {}
+        self.targets = []
+
+    def attach(self, target):
+        """Start listening to statements run by an engine.
+
+        Args:
+            target (Engine): engine, or the ``Engine`` class for all engines
+
+        Returns:
+            QueryTimer: self
+        """
+        event.listen(target, 'before_cursor_execute', self.before_execute)
+        event.listen(target, 'after_cursor_execute', self.after_execute)
+        self.targets.append(target)
+        return self
+
+    def detach(self):
+        """Stop listening to statements."""
+        for target in self.targets:
+            event.remove(target, 'before_cursor_execute', self.before_execute)
+            event.remove(target, 'after_cursor_execute', self.after_execute)
+        self.targets = []
+
+    def before_execute(self, conn, cursor, statement, parameters, context,
+                       executemany):
+        conn.info.setdefault('chanjo_query_start', []).append(time.time())
+
+    def after_execute(self, conn, cursor, statement, parameters, context,
+                      executemany):
+        seconds = time.time() - conn.info['chanjo_query_start'].pop()
+        rows = cursor.rowcount if cursor.rowcount >= 0 else None
+        normalized = normalize(statement)
+        stat = self.stats.setdefault(normalized, {
+            'fingerprint': fingerprint(normalized), 'count': 0,
+            'total_seconds': 0., 'max_seconds': 0., 'rows': 0,
+        })
+        stat['count'] += 1
+        stat['total_seconds'] += seconds
+        stat['max_seconds'] = max(stat['max_seconds'], seconds)
+        stat['rows'] += rows or 0
+
+        if self.slow_ms is not None and seconds * 1000 >= self.slow_ms:
+            log.warning("slow query %s (%.1f ms, %s rows): %s",
+                        stat['fingerprint'], seconds * 1000,
+                        'unknown' if rows is None else rows, normalized)
+            if self.explain and not executemany:
+                self.log_plan(conn, statement, parameters)
+
+    def log_plan(self, conn, statement, parameters):
+        """Log the query plan of a SELECT statement."""
+        prefix = EXPLAIN_PREFIXES.get(conn.dialect.name)
+        is_select = statement.lstrip().upper().startswith('SELECT')
+        if prefix is None or not is_select:
+            return
+        cursor = conn.connection.cursor()
+        try:
+            cursor.execute(prefix + statement, parameters)
+            for row in cursor.fetchall():
+                log.warning("  plan: %s", ' | '.join(map(str, row)))
+        except Exception as error:
+            log.debug("failed to explain query: %s", error)
+        finally:
+            cursor.close()
+
+    def report(self, limit=None):
+        """Aggregate statistics per statement, slowest in total first.
+
+        Args:
+            limit (Optional[int]): max number of statements
+
+        Returns:
+            List[dict]: statistics including the normalised statement
+        """
+        rows = [dict(stat, statement=statement,
+                     mean_seconds=stat['total_seconds'] / stat['count'])
+                for statement, stat in self.stats.items()]
+        rows.sort(key=lambda row: row['total_seconds'], reverse=True)
+        return rows[:limit] if limit else rows
+
+    def log_report(self, limit=10):
+        """Log aggregated statistics for the slowest statements."""
+        rows = self.report(limit=limit)
+        if not rows:
+            return
+        log.info("SQL statements by total time (top %s):", len(rows))
+        for row in rows:
+            log.info("%s: %s calls, %.1f ms total, %.1f ms mean, %.1f ms max, "
+                     "%s rows: %.200s", row['fingerprint'], row['count'],
+                     row['total_seconds'] * 1000, row['mean_seconds'] * 1000,
+                     row['max_seconds'] * 1000, row['rows'], row['statement'])
@@ -101,6 +101,10 @@ setup(
             'load = chanjo.cli:load',
             'link = chanjo.cli:link',
             'calculate = chanjo.cli:calculate',
+            'batch = chanjo.cli:batch',
+            'depth = chanjo.cli:depth',
+            'panel = chanjo.cli:panel',
+            'serve = chanjo.cli:serve',
         ]
     },
 
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+from chanjo.store.models import Sample
+
+
+def test_batch_skip(popexist_db, invoke_cli, bam_path, bed_path, tmpdir):
+    # GIVEN a manifest with a sample that is already loaded
+    manifest = tmpdir.join('manifest.tsv')
+    manifest.write("{}\tsample\tgroup\n".format(bam_path))
+    # WHEN running the batch
+    result = invoke_cli(['--database', popexist_db.uri, 'batch', '-r',
+                         bed_path, str(manifest)])
+    # THEN it should skip the sample and report it
+    assert result.exit_code == 0
+    assert 'sample\tgroup\tskipped' in result.output
+    assert Sample.query.count() == 1
+
+
+def test_batch_malformatted(existing_db, invoke_cli, bed_path, tmpdir):
+    # GIVEN a manifest without sample ids
+    manifest = tmpdir.join('manifest.tsv')
+    manifest.write("alignment.bam\n")
+    # WHEN running the batch
+    result = invoke_cli(['--database', existing_db.uri, 'batch', '-r',
+                         bed_path, str(manifest)])
+    # THEN it should abort
+    assert result.exit_code != 0
@@ -22,6 +22,25 @@ def test_mean(popexist_db, cli_runner):
     assert isinstance(data['mean_coverage'], float)
 
 
+def test_completeness(existing_db, invoke_cli, sambamba_path):
+    # GIVEN a sample loaded with coverage histograms
+    db_uri = existing_db.uri
+    invoke_cli(['--database', db_uri, 'load', '--histogram', sambamba_path])
+    # WHEN calculating completeness at a level
+    result = invoke_cli(['--database', db_uri, 'calculate', 'completeness',
+                         '--level', '100'])
+    # THEN it should return JSON results
+    assert result.exit_code == 0
+    data = json.loads(result.output.strip())
+    assert isinstance(data['completeness_100'], float)
+
+    # WHEN asking for a level that wasn't sampled
+    result = invoke_cli(['--database', db_uri, 'calculate', 'completeness',
+                         '--level', '30'])
+    # THEN it should abort
+    assert result.exit_code != 0
+
+
 def test_dump_json():
     # GIVEN some dict
     data = {'name': 'PT Anderson', 'age': 45}
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+
+
+def test_depth(invoke_cli, tmpdir):
+    # GIVEN a region BED file and a depth track
+    bed_file = tmpdir.join('regions.bed')
+    bed_file.write('1\t10\t20\t1-10-20\tTX1\t1\tGENE1\n')
+    depth_file = tmpdir.join('depth.bedGraph')
+    depth_file.write('1\t0\t15\t30\n1\t15\t30\t10\n')
+    # WHEN calculating coverage
+    result = invoke_cli(['depth', '-r', str(bed_file), '-s', 'sample',
+                         '-t', '10', '-t', '20', str(depth_file)])
+    # THEN it should output sambamba formatted lines
+    assert result.exit_code == 0
+    lines = result.output.strip().split('\n')
+    assert lines[1].split('\t')[-4:] == ['20', '100', '50', 'sample']
+
+
+def test_depth_histogram_max(invoke_cli, tmpdir):
+    # GIVEN a region BED file and a depth track
+    bed_file = tmpdir.join('regions.bed')
+    bed_file.write('1\t10\t20\t1-10-20\tTX1\t1\tGENE1\n')
+    depth_file = tmpdir.join('depth.bedGraph')
+    depth_file.write('1\t0\t15\t30\n1\t15\t30\t10\n')
+    # WHEN calculating coverage with every level up to a max
+    result = invoke_cli(['depth', '-r', str(bed_file), '-s', 'sample',
+                         '-t', '20', '--histogram-max', '3',
+                         str(depth_file)])
+    # THEN it should output a column for every level
+    assert result.exit_code == 0
+    header = result.output.split('\n')[0].split('\t')
+    assert header[-5:] == ['percentage1', 'percentage2', 'percentage3',
+                           'percentage20', 'sampleName']
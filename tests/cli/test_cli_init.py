@@ -44,3 +44,17 @@ def test_init_no_bootstrap(tmpdir, invoke_cli):
     with open(str(conf_path), 'r') as handle:
         data = ruamel.yaml.safe_load(handle)
     assert 'coverage.sqlite3' in data['database']
+
+
+def test_init_demo_template(tmpdir, invoke_cli):
+    # GIVEN an empty directory and template cache
+    target_dir = tmpdir.join('chanjo-demo')
+    cache_dir = tmpdir.join('cache')
+    # WHEN setting up the demo from a template
+    result = invoke_cli(['init', '--demo', '--template', '--cache-dir',
+                         str(cache_dir), str(target_dir)])
+    # THEN the database should be copied with transcripts linked
+    assert result.exit_code == 0
+    assert 'Transcripts are linked' in result.output
+    assert len(target_dir.listdir()) == (4 + 1 + 1)
+    assert len(cache_dir.listdir()) == 2
@@ -1,5 +1,10 @@
 # -*- coding: utf-8 -*-
-from chanjo.store.models import Sample, Transcript
+import gzip
+import json
+import logging
+import sys
+
+from chanjo.store.models import Sample, Transcript, TranscriptStat
 
 
 def test_load(existing_db, invoke_cli, sambamba_path):
@@ -12,6 +17,51 @@ def test_load(existing_db, invoke_cli, sambamba_path):
     assert Sample.query.count() == 1
 
 
+def test_load_gzip(existing_db, invoke_cli, sambamba_path, tmpdir):
+    # GIVEN gzip compressed sambamba depth output
+    gz_path = str(tmpdir.join('sambamba.depth.bed.gz'))
+    with open(sambamba_path, 'rb') as in_handle:
+        with gzip.open(gz_path, 'wb') as out_handle:
+            out_handle.write(in_handle.read())
+    # WHEN loading into database
+    result = invoke_cli(['--database', existing_db.uri, 'load', gz_path])
+    # THEN it should be decompressed on the fly
+    assert result.exit_code == 0
+    assert Sample.query.count() == 1
+
+
+def test_load_mosdepth(existing_db, invoke_cli, mosdepth_paths, bed_path):
+    # GIVEN mosdepth output and the BED file used to generate it
+    regions_path, thresholds_path = mosdepth_paths
+    # WHEN loading into database
+    result = invoke_cli(['--database', existing_db.uri, 'load', '--sample',
+                         'sample', '--mosdepth-thresholds', thresholds_path,
+                         '--regions', bed_path, regions_path])
+    # THEN the sample should be loaded
+    assert result.exit_code == 0
+    assert TranscriptStat.query.count() == 5
+
+    # WHEN leaving out the sample id
+    result = invoke_cli(['--database', existing_db.uri, 'load',
+                         '--mosdepth-thresholds', thresholds_path,
+                         '--regions', bed_path, regions_path])
+    # THEN it should abort
+    assert result.exit_code != 0
+
+
+def test_load_exons(existing_db, invoke_cli, sambamba_path):
+    # GIVEN a database with linked exons
+    db_uri = existing_db.uri
+    result = invoke_cli(['--database', db_uri, 'link', sambamba_path])
+    assert result.exit_code == 0
+    # WHEN loading with exon level stats
+    result = invoke_cli(['--database', db_uri, 'load', '--exons', sambamba_path])
+    # THEN exon stats should be stored for the sample
+    assert result.exit_code == 0
+    stats = existing_db.exon_stats()
+    assert len(stats['ADM992A10']) == len(existing_db.exon_positions())
+
+
 def test_load_conflict(popexist_db, invoke_cli, sambamba_path):
     # GIVEN an existing database with a sample
     db_uri = popexist_db.uri
@@ -25,6 +75,21 @@ def test_load_conflict(popexist_db, invoke_cli, sambamba_path):
     assert Sample.query.count() == 1
 
 
+def test_load_replace(popexist_db, invoke_cli, sambamba_path):
+    # GIVEN an existing database with a sample
+    db_uri = popexist_db.uri
+    sample_id = 'sample'
+    stats_count = TranscriptStat.query.count()
+    # WHEN loading the same sample id again, replacing the old one
+    result = invoke_cli(['--database', db_uri, 'load', '--sample', sample_id,
+                         '--replace', sambamba_path])
+    # THEN the old stats should be swapped out for the new ones
+    assert result.exit_code == 0
+    assert Sample.query.count() == 1
+    assert Sample.query.first().source.endswith('sambamba.depth.bed')
+    assert TranscriptStat.query.count() == stats_count
+
+
 def test_link(existing_db, invoke_cli, bed_path):
     # GIVEN chanjo bed file and an existing database
     db_uri = existing_db.uri
@@ -36,11 +101,43 @@ def test_link(existing_db, invoke_cli, bed_path):
 
     # WHEN loading again...
     result = invoke_cli(['--database', db_uri, 'link', bed_path])
-    # THEN it should error and rollback the session
-    assert result.exit_code != 0
+    # THEN nothing should change
+    assert result.exit_code == 0
     assert Transcript.query.count() == 5
 
 
+def test_link_update(popexist_db, invoke_cli, tmpdir, caplog, monkeypatch):
+    # GIVEN a database with transcripts and stats for a sample
+    db_uri = popexist_db.uri
+    stats_count = TranscriptStat.query.count()
+    tx_obj = Transcript.query.get('NM_152486')
+    tx_length = tx_obj.length
+    # ... and a BED file with one longer transcript, one new transcript
+    bed_file = tmpdir.join('update.bed')
+    bed_file.write('1\t1\t1000000\t1-1-1000000\tNM_152486\t28706\tSAMD11\n'
+                   '1\t5\t10\t1-5-10\tNM_NEW\t1\tNEW1\n')
+    # WHEN re-linking, showing only a few of the missing transcripts
+    monkeypatch.setattr(sys.modules['chanjo.cli.load'], 'REMOVED_SHOWN', 3)
+    with caplog.at_level(logging.DEBUG):
+        result = invoke_cli(['--database', db_uri, 'link', str(bed_file)])
+    # THEN transcripts should be added/updated and stats left intact
+    assert result.exit_code == 0
+    popexist_db.session.expire_all()
+    assert Transcript.query.get('NM_152486').length != tx_length
+    assert Transcript.query.get('NM_NEW').gene_name == 'NEW1'
+    assert TranscriptStat.query.count() == stats_count
+    # ... and the missing transcripts summed up with the first few ids
+    removed_count = Transcript.query.count() - 2
+    messages = {record.levelno: record.getMessage()
+                for record in caplog.records
+                if 'missing from BED file' in record.getMessage()}
+    assert messages[logging.WARNING].startswith(str(removed_count))
+    shown = messages[logging.WARNING].split(': ')[1].split(', ')
+    assert len(shown) == 3
+    assert messages[logging.DEBUG].split(': ')[1].split(', ')[:3] == shown
+    assert len(messages[logging.DEBUG].split(', ')) == removed_count
+
+
 # def test_load_with_stdin(invoke_cli):
 #     # GIVEN the STDIN is empty
 #     # WHEN loading data
@@ -48,3 +145,141 @@ def test_link(existing_db, invoke_cli, bed_path):
 #     # THEN it should complain
 #     assert result.exit_code != 0
 #     assert result.exception == click.BadParameter
+
+
+def test_load_jobs(existing_db, invoke_cli, sambamba_path, tmpdir):
+    # GIVEN sambamba depth output on disk
+    json_path = str(tmpdir.join('load.json'))
+    # WHEN loading with multiple worker processes
+    result = invoke_cli(['--database', existing_db.uri, '--metrics',
+                         json_path, 'load', '--jobs', '2', sambamba_path])
+    # THEN all transcripts should be loaded
+    assert result.exit_code == 0
+    assert TranscriptStat.query.count() == 9
+    # ... and the rows parsed by the workers counted
+    with open(json_path) as handle:
+        assert json.load(handle)['metrics']['rows_parsed'] == 35
+
+
+def test_load_dry_run(invoke_cli, sambamba_path, tmpdir):
+    # GIVEN sambamba output and a database that doesn't exist
+    db_path = tmpdir.join('coverage.sqlite3')
+    # WHEN running a dry run
+    result = invoke_cli(['--database', str(db_path), 'load', '--dry-run',
+                         sambamba_path])
+    # THEN it should report throughput without touching the database
+    assert result.exit_code == 0
+    assert 'transcripts\t9' in result.output
+    assert 'rows/s' in result.output
+    assert not db_path.exists()
+
+
+def test_load_dry_run_malformed(invoke_cli, sambamba_path, tmpdir):
+    # GIVEN sambamba output with a malformed number
+    with open(sambamba_path) as handle:
+        lines = handle.readlines()
+    lines[1] = lines[1].replace('\t232\t', '\tNA\t')
+    bad_path = tmpdir.join('malformed.bed')
+    bad_path.write(''.join(lines))
+    # WHEN running a dry run
+    result = invoke_cli(['--database', str(tmpdir.join('coverage.sqlite3')),
+                         'load', '--dry-run', str(bad_path)])
+    # THEN it should print the report and then abort
+    assert result.exit_code != 0
+    assert 'problems\t1' in result.output
+    assert isinstance(result.exception, SystemExit)
+
+
+def test_load_fingerprint(existing_db, invoke_cli, sambamba_path):
+    # GIVEN a loaded sample
+    db_uri = existing_db.uri
+    result = invoke_cli(['--database', db_uri, 'load', sambamba_path])
+    assert result.exit_code == 0
+    assert Sample.query.first().fingerprint.startswith('sampled:')
+    # WHEN loading the same input again, e.g. when retrying a pipeline
+    result = invoke_cli(['--database', db_uri, 'load', sambamba_path])
+    # THEN it should skip it without failing
+    assert result.exit_code == 0
+    assert Sample.query.count() == 1
+
+
+def test_load_metrics(existing_db, invoke_cli, sambamba_path, bed_path,
+                      tmpdir):
+    # GIVEN paths to write run metrics to
+    json_path = str(tmpdir.join('load.json'))
+    prom_path = str(tmpdir.join('link.prom'))
+    # WHEN loading and linking with metrics enabled
+    result = invoke_cli(['--database', existing_db.uri, '--metrics',
+                         json_path, 'load', sambamba_path])
+    assert result.exit_code == 0
+    result = invoke_cli(['--database', existing_db.uri, '--metrics',
+                         prom_path, 'link', bed_path])
+    assert result.exit_code == 0
+    # THEN counters and phase timings should be written in either format
+    with open(json_path) as handle:
+        data = json.load(handle)
+    assert data['command'] == 'load'
+    assert data['metrics']['rows_parsed'] == 35
+    assert data['metrics']['transcripts_written'] == 9
+    assert set(data['phase_seconds']) == {'parse', 'write'}
+    with open(prom_path) as handle:
+        prom_lines = handle.read().splitlines()
+    assert 'chanjo_rows_parsed{command="link"} 19.0' in prom_lines
+    assert any(line.startswith('chanjo_phase_seconds{command="link",'
+                               'phase="compare"}') for line in prom_lines)
+
+
+def test_load_multi_sample(existing_db, invoke_cli, exon_lines, tmpdir):
+    # GIVEN sambamba output for two BAM files
+    rows = [line for line in exon_lines[1:] if line.strip()]
+    family_path = tmpdir.join('family.depth.bed')
+    family_path.write(''.join([exon_lines[0]] + rows +
+                              [line.replace('ADM992A10', 'ADM992A11')
+                               for line in rows]))
+    # WHEN loading it as a single sample
+    result = invoke_cli(['--database', existing_db.uri, 'load',
+                         str(family_path)])
+    # THEN it should fail
+    assert result.exit_code != 0
+    assert Sample.query.count() == 0
+
+    # WHEN loading every sample
+    result = invoke_cli(['--database', existing_db.uri, 'load', '--group',
+                         'family', '--multi-sample', str(family_path)])
+    # THEN both samples should be loaded together
+    assert result.exit_code == 0
+    samples = Sample.query.order_by(Sample.id).all()
+    assert [sample.id for sample in samples] == ['ADM992A10', 'ADM992A11']
+    assert all(sample.group_id == 'family' for sample in samples)
+    assert TranscriptStat.query.count() == 18
+
+
+def test_load_multi_sample_fingerprint(existing_db, invoke_cli, exon_lines,
+                                       tmpdir):
+    # GIVEN sambamba output for two BAM files where only one sample is loaded
+    rows = [line for line in exon_lines[1:] if line.strip()]
+    family_path = tmpdir.join('family.depth.bed')
+    family_path.write(''.join([exon_lines[0]] + rows +
+                              [line.replace('ADM992A10', 'ADM992A11')
+                               for line in rows]))
+    db_uri = existing_db.uri
+    result = invoke_cli(['--database', db_uri, 'load', '--multi-sample',
+                         str(family_path)])
+    assert result.exit_code == 0
+    existing_db.delete_sample('ADM992A11')
+    existing_db.save()
+    # WHEN loading the same input again
+    result = invoke_cli(['--database', db_uri, 'load', '--multi-sample',
+                         str(family_path)])
+    # THEN the sample that is missing should be loaded
+    assert result.exit_code == 0
+    samples = Sample.query.order_by(Sample.id).all()
+    assert [sample.id for sample in samples] == ['ADM992A10', 'ADM992A11']
+    assert TranscriptStat.query.count() == 18
+
+    # WHEN loading it once more with every sample loaded
+    result = invoke_cli(['--database', db_uri, 'load', '--multi-sample',
+                         str(family_path)])
+    # THEN it should skip it without failing
+    assert result.exit_code == 0
+    assert Sample.query.count() == 2
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+import json
+
+from chanjo.store.models import Panel, PanelStat
+
+
+def test_panel(popexist_db, invoke_cli):
+    # GIVEN an existing database with linked transcripts and a sample
+    db_uri = popexist_db.uri
+    # WHEN adding a panel
+    result = invoke_cli(['-d', db_uri, 'panel', 'add', '-n', 'Panel 1',
+                         'panel1', '28706', 'OR4F5'])
+    # THEN it should be stored and listed
+    assert result.exit_code == 0
+    assert Panel.query.count() == 1
+    result = invoke_cli(['-d', db_uri, 'panel', 'list'])
+    panel_id, name, count = result.output.strip().split('\t')
+    assert (panel_id, name) == ('panel1', 'Panel 1')
+    assert int(count) >= 2
+
+    # WHEN calculating coverage over the panel
+    result = invoke_cli(['-d', db_uri, 'panel', 'coverage', 'panel1'])
+    # THEN it should return JSON results per sample
+    assert result.exit_code == 0
+    data = json.loads(result.output.strip())
+    assert data['sample_id'] == 'sample'
+    assert data['panel_id'] == 'panel1'
+    assert isinstance(data['mean_coverage'], float)
+
+    # WHEN precomputing summaries and reading them back
+    result = invoke_cli(['-d', db_uri, 'panel', 'summarize'])
+    assert result.exit_code == 0
+    assert PanelStat.query.count() == 1
+    result = invoke_cli(['-d', db_uri, 'panel', 'coverage', '--precomputed',
+                         'panel1'])
+    # THEN they should match the metrics calculated on the fly
+    stored = json.loads(result.output.strip())
+    assert stored['mean_coverage'] == data['mean_coverage']
+
+    # WHEN removing the panel
+    result = invoke_cli(['-d', db_uri, 'panel', 'remove', 'panel1'])
+    # THEN it should be gone
+    assert result.exit_code == 0
+    assert Panel.query.count() == 0
+
+
+def test_panel_add_without_genes(popexist_db, invoke_cli):
+    # GIVEN an existing database
+    # WHEN adding a panel without any genes
+    result = invoke_cli(['-d', popexist_db.uri, 'panel', 'add', 'panel1'])
+    # THEN it should abort
+    assert result.exit_code == 1
@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+from chanjo.store.models import Sample
 
 
 def test_sambamba(invoke_cli, bam_path, bed_path):
@@ -16,3 +17,16 @@ def test_sambamba_with_bai(invoke_cli, bam_path, bed_path):
     result = invoke_cli(['sambamba', '-r', bed_path, bai_path])
     # THEN command should exit with error
     assert result.exit_code != 0
+
+
+def test_sambamba_load(existing_db, invoke_cli, bam_path, bed_path):
+    # GIVEN a BAM file, a BED file and an empty database
+    assert Sample.query.count() == 0
+    # WHEN running sambamba and loading the output in one go
+    result = invoke_cli(['--database', existing_db.uri, 'sambamba', '--load',
+                         '-r', bed_path, '-s', 'sample', bam_path])
+    # THEN the sample should be loaded with the BAM as source
+    assert result.exit_code == 0
+    sample_obj = Sample.query.first()
+    assert sample_obj.id == 'sample'
+    assert sample_obj.source.endswith('.bam')
@@ -1,5 +1,8 @@
 # -*- coding: utf-8 -*-
+import json
+
 from chanjo.cli import root
+from chanjo.sex import SexGuess, cache_key, read_cache, write_cache
 
 
 def test_sex(cli_runner, bam_path):
@@ -12,3 +15,41 @@ def test_sex_with_wrong_file(cli_runner, bam_path):
     bai_path = "{}.bai".format(bam_path)
     result = cli_runner.invoke(root, ['sex', bai_path])
     assert result.exit_code != 0
+
+
+def test_sex_cached(cli_runner, bam_path, tmpdir):
+    # GIVEN a cached result for a BAM file listed in a manifest
+    cache_path = str(tmpdir.join('cache.json'))
+    write_cache(cache_path, {cache_key(bam_path): SexGuess(20., 1., 'male')})
+    manifest = tmpdir.join('manifest.tsv')
+    manifest.write("{}\tsample\n".format(bam_path))
+    # WHEN guessing the sex
+    result = cli_runner.invoke(root, ['sex', '--cache', cache_path, '--json',
+                                      '--manifest', str(manifest)])
+    # THEN it should output the cached result as JSON
+    assert result.exit_code == 0
+    data = json.loads(result.output.strip().split('\n')[-1])
+    assert data['bam'] == bam_path
+    assert data['sex'] == 'male'
+
+
+def test_sex_refresh(cli_runner, bam_path, tmpdir):
+    # GIVEN cached results for two BAM files
+    other_path = tmpdir.join('other.bam')
+    other_path.write_binary(b'BAM')
+    cache_path = str(tmpdir.join('cache.json'))
+    other_key = cache_key(str(other_path))
+    write_cache(cache_path, {cache_key(bam_path): SexGuess(20., 1., 'male'),
+                             other_key: SexGuess(20., 0., 'female')})
+    # WHEN refreshing one of them
+    cli_runner.invoke(root, ['sex', '--cache', cache_path, '--refresh',
+                             str(other_path)])
+    # THEN the cached result of the other BAM file should be kept
+    cached = read_cache(cache_path)
+    assert cache_key(bam_path) in cached
+    assert other_key not in cached
+
+
+def test_sex_without_bams(cli_runner):
+    result = cli_runner.invoke(root, ['sex'])
+    assert result.exit_code != 0
@@ -1,7 +1,8 @@
 # -*- coding: utf-8 -*-
 
 from chanjo.cli import root
-from chanjo.store.models import Sample, TranscriptStat
+from chanjo.store.api import ChanjoDB
+from chanjo.store.models import Sample, Transcript, TranscriptStat
 
 
 def test_setup(cli_runner, tmpdir):
@@ -15,6 +16,27 @@ def test_setup(cli_runner, tmpdir):
     assert tmpdir.listdir() == [db_path]
 
 
+def test_setup_template(cli_runner, bed_path, tmpdir):
+    # GIVEN a path for a new database and a BED file
+    db_path = tmpdir.join('shard1.sqlite3')
+    cache_dir = tmpdir.join('cache')
+    # WHEN setting up the database from a template
+    result = cli_runner.invoke(root, ['--database', str(db_path), 'db',
+                                      'setup', '--template', bed_path,
+                                      '--cache-dir', str(cache_dir)])
+    # THEN it should be copied with transcripts linked
+    assert result.exit_code == 0
+    assert db_path.check()
+    assert ChanjoDB(str(db_path)).query(Transcript).count() == 5
+
+    # WHEN setting up the same database again
+    result = cli_runner.invoke(root, ['--database', str(db_path), 'db',
+                                      'setup', '--template', bed_path,
+                                      '--cache-dir', str(cache_dir)])
+    # THEN it should refuse to overwrite it
+    assert result.exit_code != 0
+
+
 def test_setup_reset(cli_runner, popexist_db):
     # GIVEN an existing database with a single sample
     assert Sample.query.count() == 1
@@ -42,3 +64,31 @@ def test_remove(cli_runner, popexist_db):
                                       'remove', 'no-sample-id'])
     # THEN context is aborted
     assert result.exit_code == 1
+
+
+def test_migrate(cli_runner, popexist_db):
+    # GIVEN a database that is up to date
+    # WHEN running the migration
+    result = cli_runner.invoke(root, ['--database', popexist_db.uri, 'db',
+                                      'migrate'])
+    # THEN it should leave it be
+    assert result.exit_code == 0
+    assert TranscriptStat.query.filter_by(sample_id='sample').count() > 0
+
+
+def test_merge(cli_runner, popexist_db, tmpdir):
+    # GIVEN an existing database and an empty central database
+    central_path = str(tmpdir.join('central.sqlite3'))
+    cli_runner.invoke(root, ['--database', central_path, 'db', 'setup'])
+    # WHEN merging the existing database into the central one
+    result = cli_runner.invoke(root, ['--database', central_path, 'db',
+                                      'merge', popexist_db.uri])
+    # THEN the sample should be copied
+    assert result.exit_code == 0
+    assert Sample.query.get('sample') is not None
+
+    # WHEN merging it again
+    result = cli_runner.invoke(root, ['--database', central_path, 'db',
+                                      'merge', popexist_db.uri])
+    # THEN it should abort on the conflicting sample
+    assert result.exit_code == 1
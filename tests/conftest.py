@@ -124,3 +124,18 @@ def bed_path():
 def sambamba_path():
     _sambamba_path = 'tests/fixtures/sambamba.depth.bed'
     return _sambamba_path
+
+
+@pytest.fixture
+def mosdepth_paths():
+    return ('tests/fixtures/mosdepth.regions.bed',
+            'tests/fixtures/mosdepth.thresholds.bed')
+
+
+@pytest.fixture
+def mosdepth_lines(mosdepth_paths):
+    _lines = []
+    for path in mosdepth_paths:
+        with codecs.open(path, 'r', encoding='utf-8') as stream:
+            _lines.append([line for line in stream])
+    return _lines
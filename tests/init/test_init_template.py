@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+import os
+
+import pytest
+
+from chanjo.init import template
+from chanjo.store.api import ChanjoDB
+from chanjo.store.models import ExonRegion, Transcript
+
+
+def test_build_template(bed_path, tmpdir):
+    # GIVEN a chanjo BED file and an empty cache
+    cache_dir = str(tmpdir.join('cache'))
+    # WHEN building a template
+    path = template.build_template(bed_path, directory=cache_dir)
+    # THEN a linked database should be cached with its metadata
+    meta = template.read_meta(path)
+    assert meta['transcripts'] == 5
+    assert meta['schema'] == template.schema_version()
+    assert template.is_fresh(path, bed_checksum=meta['bed_checksum'])
+
+    # WHEN building it again
+    mtime = os.path.getmtime(path)
+    assert template.build_template(bed_path, directory=cache_dir) == path
+    # THEN the cached template should be reused
+    assert os.path.getmtime(path) == mtime
+
+
+def test_clone_template(bed_path, tmpdir):
+    # GIVEN a cached template
+    path = template.build_template(bed_path, directory=str(tmpdir))
+    target_path = str(tmpdir.join('project', 'coverage.sqlite3'))
+    # WHEN cloning it
+    template.clone_template(path, target_path)
+    # THEN the new database should be linked
+    chanjo_db = ChanjoDB(target_path)
+    assert chanjo_db.query(Transcript).count() == 5
+    assert chanjo_db.query(ExonRegion).count() > 0
+    # ... and existing databases aren't overwritten
+    with pytest.raises(OSError):
+        template.clone_template(path, target_path)
+
+
+def test_stale_template(bed_path, tmpdir):
+    # GIVEN a template that was modified after it was built
+    path = template.build_template(bed_path, directory=str(tmpdir))
+    with open(path, 'ab') as handle:
+        handle.write(b'\0')
+    # WHEN checking it
+    # THEN it should be stale and not cloned
+    assert template.is_fresh(path) is False
+    with pytest.raises(ValueError):
+        template.clone_template(path, str(tmpdir.join('new.sqlite3')))
+    # ... but rebuilt on the next lookup
+    assert template.build_template(bed_path, directory=str(tmpdir)) == path
+    assert template.is_fresh(path)
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from chanjo.load.parse import mosdepth
+from chanjo.exc import BedFormattingError
+
+
+def test_region_lookup(bed_lines):
+    lookup = mosdepth.region_lookup(bed_lines)
+    assert len(lookup) == 19
+    assert lookup[('1', 11, 18)] == ['1-11-18', 'NM_152486', '28706', 'SAMD11']
+
+
+def test_regions_output(mosdepth_lines, bed_lines):
+    # GIVEN mosdepth regions and thresholds output
+    regions, thresholds = mosdepth_lines
+    lookup = mosdepth.region_lookup(bed_lines)
+    # WHEN parsing them together
+    exons = list(mosdepth.regions_output(regions, thresholds, lookup,
+                                         sample_name='sample'))
+    # THEN base counts should be converted to completeness
+    assert len(exons) == 19
+    assert exons[0]['meanCoverage'] == 12.
+    assert exons[0]['thresholds'][10] == 100.
+    assert exons[0]['thresholds'][20] == pytest.approx(200 / 7)
+    assert exons[3]['thresholds'][100] == 50.
+    assert exons[0]['extraFields'][1] == 'NM_152486'
+
+
+def test_regions_output_out_of_sync(mosdepth_lines, bed_lines):
+    # GIVEN thresholds output missing a row
+    regions, thresholds = mosdepth_lines
+    lookup = mosdepth.region_lookup(bed_lines)
+    # WHEN parsing them together
+    # THEN it should complain
+    with pytest.raises(BedFormattingError):
+        list(mosdepth.regions_output(regions, thresholds[:1] + thresholds[2:],
+                                     lookup))
+
+
+def test_regions_output_blank_lines(mosdepth_lines, bed_lines):
+    # GIVEN outputs with blank (whitespace only) lines
+    regions, thresholds = mosdepth_lines
+    lookup = mosdepth.region_lookup(bed_lines + ['  \n'])
+    regions = regions[:1] + [' \n'] + regions[1:] + ['\n']
+    # WHEN parsing them together
+    exons = list(mosdepth.regions_output(regions, thresholds, lookup))
+    # THEN the blank lines should be skipped
+    assert len(exons) == 19
+
+
+def test_regions_output_malformed(mosdepth_lines, bed_lines):
+    # GIVEN regions output with a malformed mean coverage on line 2
+    regions, thresholds = mosdepth_lines
+    lookup = mosdepth.region_lookup(bed_lines)
+    regions = regions[:1] + [regions[1].replace('0.00', 'NA')] + regions[2:]
+    # WHEN parsing them together
+    # THEN it should complain with the line number
+    with pytest.raises(BedFormattingError) as error:
+        list(mosdepth.regions_output(regions, thresholds, lookup))
+    assert 'line 2' in str(error.value)
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from chanjo.load import sambamba
+from chanjo.load.aggregate import ExonAggregator
+from chanjo.load.utils import groupby_tx
+
+
+@pytest.mark.parametrize('threshold', [None, 10, 20, 100])
+def test_sums_match_tx_sums(sambamba_exons, threshold):
+    # GIVEN exons grouped per transcript, some shared between transcripts
+    transcripts = groupby_tx(sambamba_exons, sambamba=True)
+    aggregator = ExonAggregator(threshold=threshold)
+    for tx_exons in transcripts.values():
+        # WHEN summing up metrics with precomputed contributions
+        sums, incomplete_exons = aggregator.sums(tx_exons)
+        # THEN the result should be identical to the reference
+        assert (sums, incomplete_exons) == sambamba.tx_sums(
+            tx_exons, threshold=threshold)
+        assert aggregator.stat(tx_exons) == sambamba.tx_stat(
+            None, tx_exons, threshold=threshold)
+
+
+def test_sums_missing_levels():
+    # GIVEN exons with partly missing completeness levels
+    exons = [{'chrom': '1', 'chromStart': 0, 'chromEnd': 3, 'meanCoverage': .1,
+              'thresholds': {10: 100.}},
+             {'chrom': '1', 'chromStart': 5, 'chromEnd': 12,
+              'meanCoverage': 7.3, 'thresholds': {10: 1 / 3, 20: 0.7}}]
+    aggregator = ExonAggregator(threshold=20)
+    # WHEN summing up metrics
+    sums, incomplete_exons = aggregator.sums(exons)
+    # THEN only levels present in some exon should be included
+    assert set(sums) == {'bases', 'mean_coverage', 'completeness_10',
+                         'completeness_20'}
+    assert (sums, incomplete_exons) == sambamba.tx_sums(exons, threshold=20)
+    assert incomplete_exons[0].start == 5
+
+
+def test_contribution_reused():
+    # GIVEN an exon shared by two transcripts
+    exon = {'chrom': '1', 'chromStart': 0, 'chromEnd': 10, 'meanCoverage': 2.,
+            'thresholds': {10: 50.}}
+    aggregator = ExonAggregator()
+    # WHEN aggregating both transcripts
+    aggregator.sums([exon])
+    aggregator.sums([exon])
+    # THEN the contributions should be computed only once
+    assert len(aggregator.contributions) == 1
+    assert aggregator.contribution(exon) is aggregator.contribution(exon)
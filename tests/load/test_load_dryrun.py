@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+from chanjo.load import dryrun
+from chanjo.load.parse import sambamba
+
+
+def test_dry_run(exon_lines):
+    # GIVEN sambamba output
+    exons = sambamba.depth_output(exon_lines)
+    # WHEN running the pipeline without a database
+    report = dryrun.dry_run(exons, threshold=10)
+    # THEN it should count and time every stage
+    assert report.rows == len(exon_lines) - 1
+    assert report.transcripts == 9
+    stages = [name for name, _ in report.stages]
+    assert stages == ['parse', 'group', 'validate', 'stats']
+    assert report.peak_rss > 0
+    assert report.problems == []
+    lines = list(dryrun.format_report(report))
+    assert lines[0] == "rows\t{}".format(report.rows)
+
+
+def test_dry_run_parse_errors(exon_lines):
+    # GIVEN sambamba output with a malformed number and a truncated row
+    exon_lines = list(exon_lines)
+    exon_lines[1] = exon_lines[1].replace('\t232\t', '\tNA\t')
+    exon_lines[4] = '1\t1000\n'
+    # WHEN running the pipeline without a database
+    parse_errors = []
+    exons = sambamba.depth_output(exon_lines, errors=parse_errors)
+    report = dryrun.dry_run(exons, parse_errors=parse_errors)
+    # THEN it should report each row by line number and keep going
+    assert report.rows == len(exon_lines) - 3
+    assert report.problems[0].startswith('line 2: malformed value')
+    assert report.problems[1] == 'line 5: missing columns'
+
+
+def test_validate_exons(sambamba_exons):
+    # GIVEN exons with inconsistent data
+    exons = list(sambamba_exons)[:3]
+    exons[0]['chromEnd'] = exons[0]['chromStart']
+    exons[1]['thresholds'] = {10: 50., 20: 60., 100: 0.}
+    exons[2]['thresholds'] = {10: 100.}
+    # WHEN validating them
+    problems = list(dryrun.validate_exons(exons))
+    # THEN each problem should be reported
+    assert len(problems) == 3
+    assert 'empty' in problems[0]
+    assert 'increases' in problems[1]
+    assert 'differ' in problems[2]
+
+
+def test_validate_transcripts(sambamba_exons):
+    # GIVEN a transcript spread over two chromosomes
+    exons = list(sambamba_exons)[:2]
+    exons[1]['chrom'] = 'X'
+    # WHEN validating it
+    problems = list(dryrun.validate_transcripts({'tx1': exons}))
+    # THEN it should be reported
+    assert problems == ['tx1: exons on multiple chromosomes: 1, X']
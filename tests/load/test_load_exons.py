@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+import math
+
+from chanjo.load import exons
+
+
+def test_make_models(sambamba_exons):
+    # GIVEN parsed sambamba rows and an ordering missing most exons
+    sambamba_exons = list(sambamba_exons)
+    positions = {('1', 69089, 70007): 1, ('X', 1, 2): 0}
+    # WHEN packing exon stats
+    models = exons.make_models(sambamba_exons, positions)
+    # THEN there should be one array per metric
+    metrics = {model.metric: model.values for model in models}
+    assert sorted(metrics) == ['completeness_10', 'completeness_100',
+                               'completeness_20', 'mean_coverage']
+    values = metrics['mean_coverage']
+    assert len(values) == 2
+    assert math.isnan(values[0])
+    assert round(values[1], 4) == 25.4946
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+import io
+
+from chanjo.load.fingerprint import fingerprint, sample_offsets
+
+
+def test_fingerprint(tmpdir):
+    # GIVEN an input file
+    path = tmpdir.join('input.bed')
+    path.write_binary(b'1\t10\t20\n' * 100)
+    # WHEN fingerprinting it twice
+    with open(str(path), 'rb') as handle:
+        first = fingerprint([handle])
+        second = fingerprint([handle])
+        # THEN it shouldn't move the position of the handle
+        assert handle.tell() == 0
+    # ... and the fingerprints should match
+    assert first == second
+    assert first.startswith('sampled:')
+
+    # WHEN the content changes
+    path.write_binary(b'1\t10\t21\n' * 100)
+    with open(str(path), 'rb') as handle:
+        full = fingerprint([handle], full=True)
+        # THEN the fingerprint should change
+        assert fingerprint([handle]) != first
+    assert full.startswith('sha1:')
+
+
+def test_fingerprint_stream():
+    # GIVEN an in-memory stream (like STDIN)
+    handle = io.BytesIO(b'1\t10\t20\n')
+    # WHEN fingerprinting it
+    # THEN it should give up
+    assert fingerprint([handle]) is None
+
+
+def test_sample_offsets():
+    # GIVEN a file smaller than a block
+    # THEN only the start should be sampled
+    assert sample_offsets(100, blocks=4, block_size=1000) == [0]
+    # GIVEN a larger file
+    offsets = sample_offsets(10000, blocks=4, block_size=1000)
+    # THEN the blocks should cover both ends
+    assert offsets == [0, 3000, 6000, 9000]
@@ -6,3 +6,21 @@ def test_process(bed_lines):
     result = link.link_elements(bed_lines)
     models = list(result.models)
     assert result.count == 5  # 5 transcripts
+
+
+def test_diff_transcripts(bed_lines):
+    # GIVEN all transcripts, one stored with a different length and one
+    # stored that isn't in the BED file
+    models = list(link.link_elements(bed_lines).models)
+    existing = {tx_model.id: tuple(getattr(tx_model, column) for column
+                                   in link.LINK_COLUMNS)
+                for tx_model in models[1:]}
+    changed_id = models[1].id
+    existing[changed_id] = existing[changed_id][:-1] + (0,)
+    existing['NM_OLD'] = (1, 'OLD1', '1', 100)
+    # WHEN comparing them
+    diff = link.diff_transcripts(models, existing)
+    # THEN it should sort out what to add, update, and remove
+    assert diff.added == models[:1]
+    assert [mapping['id'] for mapping in diff.updated] == [changed_id]
+    assert diff.removed == ['NM_OLD']
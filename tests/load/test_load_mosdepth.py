@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+from chanjo.store.models import TranscriptStat
+from chanjo.load import mosdepth
+
+
+def test_load_transcripts(mosdepth_lines, bed_lines):
+    # GIVEN mosdepth output and the BED file used to generate it
+    regions, thresholds = mosdepth_lines
+    # WHEN loading transcript stats
+    result = mosdepth.load_transcripts(regions, thresholds, bed_lines,
+                                       sample_id='sample', threshold=20)
+    # THEN transcript models should be generated
+    assert result.count == 5
+    assert result.sample.id == 'sample'
+    models = {model.transcript_id: model for model in result.models}
+    assert isinstance(models['NM_152486'], TranscriptStat)
+    assert len(list(models['NM_152486'].incomplete_exons)) == 2
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+import logging
+
+import pytest
+
+from chanjo.exc import MultipleSamplesError
+from chanjo.load import multisample, sambamba
+from chanjo.load.parse import sambamba as parse_sambamba
+
+
+@pytest.fixture
+def family_lines(exon_lines):
+    """Sambamba output with the rows repeated for a second sample."""
+    rows = [line for line in exon_lines[1:] if line.strip()]
+    return ([exon_lines[0]] + rows +
+            [line.replace('ADM992A10', 'ADM992A11') for line in rows])
+
+
+def test_split_samples(family_lines):
+    # GIVEN exon records for two samples
+    exons = parse_sambamba.depth_output(family_lines)
+    # WHEN partitioning by sample name
+    samples = multisample.split_samples(exons)
+    # THEN rows should be split in input order
+    assert list(samples) == ['ADM992A10', 'ADM992A11']
+    assert len(samples['ADM992A10']) == len(samples['ADM992A11'])
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_load_samples(exon_lines, family_lines, jobs):
+    # GIVEN sambamba output for two samples
+    exons = parse_sambamba.depth_output(family_lines)
+    # WHEN loading all samples
+    results = multisample.load_samples(exons, group_id='family',
+                                       threshold=20, jobs=jobs)
+    # THEN each sample should get the same stats as loaded on its own
+    single = sambamba.load_transcripts(exon_lines, threshold=20)
+    expected = {tx_model.transcript_id: tx_model.mean_coverage
+                for tx_model in single.models}
+    assert [result.sample.id for result in results] == ['ADM992A10',
+                                                        'ADM992A11']
+    for result in results:
+        assert result.sample.group_id == 'family'
+        assert result.sample.sex == single.sample.sex
+        assert result.count == single.count
+        assert {tx_model.transcript_id: tx_model.mean_coverage
+                for tx_model in result.models} == expected
+
+
+def test_load_samples_serial(family_lines, caplog):
+    # GIVEN sambamba output for two samples
+    exons = parse_sambamba.depth_output(family_lines)
+    # WHEN loading with histograms and multiple worker processes
+    with caplog.at_level(logging.WARNING):
+        results = multisample.load_samples(exons, histogram=True, jobs=2)
+    # THEN it should say that the samples are aggregated one at a time
+    assert len(results) == 2
+    assert 'one at a time' in caplog.text
+
+
+def test_load_transcripts_multiple_samples(family_lines):
+    # GIVEN sambamba output for two samples
+    # WHEN loading it as a single sample
+    # THEN it should refuse to mix the rows
+    with pytest.raises(MultipleSamplesError):
+        sambamba.load_transcripts(family_lines)
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from chanjo.exc import MultipleSamplesError
+from chanjo.load import parallel, sambamba
+from chanjo.load.parse import sambamba as sambamba_parse
+
+
+def test_chunk_ranges(sambamba_path):
+    # GIVEN a sambamba output file
+    with open(sambamba_path, 'rb') as handle:
+        data = handle.read()
+        # WHEN splitting it into a lot of chunks
+        header_line, ranges = parallel.chunk_ranges(handle, 8)
+    # THEN the header should be left out
+    assert header_line.startswith(b'# chrom')
+    assert ranges[0][0] == len(header_line)
+    # THEN the ranges should cover the rest of the file line by line
+    assert len(ranges) > 1
+    assert ranges[-1][1] == len(data)
+    for (_, end), (start, _) in zip(ranges[:-1], ranges[1:]):
+        assert end == start
+        assert data[start - 1:start] == b'\n'
+
+
+def test_merge_partials():
+    # GIVEN partial sums for a transcript in two chunks
+    first = parallel.Partial(sums={'bases': 10, 'mean_coverage': 50.},
+                             incomplete_exons=['exon1'],
+                             link_fields={'chromosome': '1', 'length': 10})
+    second = parallel.Partial(sums={'bases': 30, 'mean_coverage': 30.,
+                                    'completeness_10': 900.},
+                              incomplete_exons=['exon2'],
+                              link_fields={'chromosome': '1', 'length': 30})
+    # WHEN merging the chunks
+    merged = parallel.merge_partials([{'tx1': first}, {'tx1': second}])
+    # THEN the sums should be added up, keeping exons in file order
+    sums, incomplete_exons, link_fields = merged['tx1']
+    assert sums == {'bases': 40, 'mean_coverage': 80.,
+                    'completeness_10': 900.}
+    assert incomplete_exons == ['exon1', 'exon2']
+    assert link_fields == {'chromosome': '1', 'length': 40}
+
+
+def test_load_transcripts(sambamba_path, exon_lines):
+    # GIVEN sambamba output and a serial load of it
+    serial = sambamba.load_transcripts(exon_lines, threshold=100)
+    expected = {model.transcript_id: model for model in serial.models}
+    # WHEN loading it in (a lot of) chunks
+    result = parallel.load_transcripts(sambamba_path, threshold=100, jobs=3)
+    models = list(result.models)
+    # THEN it should pick up the sample id
+    assert result.sample.id == 'ADM992A10'
+    # THEN it should count the rows parsed by the workers
+    assert result.rows == len(exon_lines) - 1
+    # THEN the stats should match, also across chunk boundaries
+    assert result.count == serial.count == len(models)
+    for model in models:
+        expected_model = expected[model.transcript_id]
+        assert model.mean_coverage == pytest.approx(expected_model
+                                                    .mean_coverage)
+        assert model.completeness_10 == pytest.approx(expected_model
+                                                      .completeness_10)
+        assert model.completeness_100 == pytest.approx(expected_model
+                                                       .completeness_100)
+        assert (list(model.incomplete_exons) ==
+                list(expected_model.incomplete_exons))
+
+
+def test_load_transcripts_split(exon_lines, tmpdir):
+    # GIVEN sambamba output where every exon is part of another transcript
+    split_lines = [exon_lines[0]]
+    for line in exon_lines[1:]:
+        row = line.split('\t')
+        row[4:7] = [row[4] + ',NM_SPLIT', row[5] + ',999', row[6] + ',SPLIT']
+        split_lines.append('\t'.join(row))
+    path = tmpdir.join('split.bed')
+    path.write(''.join(split_lines))
+    serial = sambamba.load_transcripts(split_lines, threshold=100)
+    expected = {model.transcript_id: model for model in serial.models}
+    # WHEN splitting it into chunks
+    jobs = 2
+    with open(str(path), 'rb') as handle:
+        header_line, ranges = parallel.chunk_ranges(
+            handle, jobs * parallel.CHUNKS_PER_JOB)
+    header = sambamba_parse.expand_header(header_line.decode('utf-8')
+                                          .strip().split('\t'))
+    # THEN the transcript should be part of every chunk
+    for start, end in ranges:
+        partials, _, _ = parallel.parse_chunk(str(path), start, end, header)
+        assert 'NM_SPLIT' in partials
+    # WHEN loading it in parallel
+    result = parallel.load_transcripts(str(path), threshold=100, jobs=jobs)
+    models = {model.transcript_id: model for model in result.models}
+    # THEN the partial sums of all chunks should be added up
+    model = models['NM_SPLIT']
+    assert model.mean_coverage == pytest.approx(expected['NM_SPLIT']
+                                                .mean_coverage)
+    assert (list(model.incomplete_exons) ==
+            list(expected['NM_SPLIT'].incomplete_exons))
+    assert (model.transcript_fields ==
+            expected['NM_SPLIT'].transcript_fields)
+
+
+def test_load_transcripts_samples(exon_lines, tmpdir):
+    # GIVEN sambamba output with rows for another sample in a later chunk
+    exon_lines = list(exon_lines)
+    exon_lines[-1] = exon_lines[-1].replace('ADM992A10', 'ADM992A11')
+    path = tmpdir.join('samples.bed')
+    path.write(''.join(exon_lines))
+    # WHEN loading it in chunks
+    # THEN it should refuse to mix samples
+    with pytest.raises(MultipleSamplesError):
+        parallel.load_transcripts(str(path), jobs=2)
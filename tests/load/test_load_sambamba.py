@@ -1,4 +1,6 @@
 # -*- coding: utf-8 -*-
+import pytest
+
 from chanjo.store.models import TranscriptStat
 from chanjo.load import sambamba
 
@@ -13,6 +15,9 @@ def test_load_transcripts(exon_lines):
     assert result.sample.id == 'sample'
     assert result.sample.group_id == 'group'
     assert isinstance(list(result.models)[0], TranscriptStat)
+    # ... and the sex predicted from exons on X and Y
+    assert result.sample.sex in ('male', 'female', 'unknown')
+    assert result.sample.x_coverage > 0
 
     # GIVEN no explicit sample id
     # WHEN loading transcript stats
@@ -30,3 +35,33 @@ def test_load_transcripts_with_threshold(exon_lines):
     incompletes = [transcript for transcript in result.models
                    if transcript.incomplete_exons]
     assert len(incompletes) > 0
+
+
+def test_load_transcripts_with_histogram(exon_lines):
+    # GIVEN sambamba depth output lines
+    # WHEN loading transcript stats with histograms
+    result = sambamba.load_transcripts(exon_lines, histogram=True)
+    # THEN each model should get a histogram matching the stats
+    for tx_model in result.models:
+        assert tx_model.histogram.levels == [10, 20, 100]
+        assert (tx_model.histogram.completeness(20) ==
+                pytest.approx(tx_model.completeness_20, abs=0.1))
+
+
+def test_histogram_levels():
+    # GIVEN a max level and the standard completeness levels
+    # WHEN expanding the levels
+    levels = sambamba.histogram_levels(12)
+    # THEN every level up to the max should be included once
+    assert levels == list(range(1, 13)) + [15, 20, 50, 100]
+
+
+def test_tx_histogram():
+    # GIVEN two exons with completeness values
+    exons = [{'chromStart': 0, 'chromEnd': 100, 'thresholds': {10: 50.}},
+             {'chromStart': 200, 'chromEnd': 300, 'thresholds': {10: 100.}}]
+    # WHEN counting bases per level
+    bases, counts = sambamba.tx_histogram(exons, [10, 20])
+    # THEN levels that are missing count as uncovered
+    assert bases == 200
+    assert counts == [150, 0]
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+import gzip
+import io
+import struct
+import zlib
+
+import pytest
+
+from chanjo.load import stream
+
+
+def bgzf_compress(data, block_size=256):
+    """Compress data into (small) BGZF blocks + EOF marker."""
+    blocks = []
+    for index in range(0, len(data), block_size):
+        chunk = data[index:index + block_size]
+        compressor = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+        deflated = compressor.compress(chunk) + compressor.flush()
+        header = struct.pack('<4BI2BH2BHH', 31, 139, 8, 4, 0, 0, 255, 6,
+                             66, 67, 2, len(deflated) + 25)
+        footer = struct.pack('<2I', zlib.crc32(chunk), len(chunk))
+        blocks.append(header + deflated + footer)
+    return b''.join(blocks)
+
+
+@pytest.fixture
+def raw_bytes(sambamba_path):
+    with open(sambamba_path, 'rb') as handle:
+        return handle.read()
+
+
+def test_open_text_plain(raw_bytes, exon_lines):
+    # GIVEN an uncompressed binary stream
+    handle = io.BytesIO(raw_bytes)
+    # WHEN opening it as text
+    lines = list(stream.open_text(handle))
+    # THEN the lines should be passed through untouched
+    assert lines == exon_lines
+
+
+def test_open_text_gzip(raw_bytes, exon_lines):
+    # GIVEN a regular gzip compressed stream
+    handle = io.BytesIO(gzip.compress(raw_bytes))
+    # WHEN opening it as text
+    lines = list(stream.open_text(handle))
+    # THEN it should be decompressed transparently
+    assert lines == exon_lines
+
+
+@pytest.mark.parametrize('threads', [1, 3])
+def test_open_text_bgzf(raw_bytes, exon_lines, threads):
+    # GIVEN a BGZF compressed stream with many blocks
+    compressed = bgzf_compress(raw_bytes)
+    assert stream.is_bgzf(compressed[:stream.BGZF_HEADER_SIZE])
+    # WHEN opening it as text
+    lines = list(stream.open_text(io.BytesIO(compressed), threads=threads))
+    # THEN lines split across blocks should be stitched back together
+    assert lines == exon_lines
+
+
+def test_bgzf_blocks_truncated(raw_bytes):
+    # GIVEN a BGZF stream that has been cut short
+    compressed = bgzf_compress(raw_bytes)[:-10]
+    # WHEN splitting it into blocks
+    # THEN it should complain
+    with pytest.raises(ValueError):
+        list(stream.bgzf_blocks(io.BytesIO(compressed)))
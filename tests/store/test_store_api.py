@@ -5,7 +5,9 @@ import pytest
 from sqlalchemy.orm.exc import FlushError
 
 from chanjo.store.api import ChanjoDB
-from chanjo.store.models import Sample
+from chanjo.load.sambamba import load_transcripts
+from chanjo.store.models import (CoverageHistogram, Sample, Transcript,
+                                 TranscriptStat)
 
 
 def test_dialect(chanjo_db):
@@ -55,3 +57,43 @@ def test_add_many(chanjo_db):
     chanjo_db.save()
     # THEN all samples should be added
     assert Sample.query.all() == new_samples
+
+
+def test_delete_sample(populated_db):
+    # GIVEN a database with two samples
+    assert TranscriptStat.query.filter_by(sample_id='sample').count() > 0
+    # WHEN deleting one of them
+    count = populated_db.delete_sample('sample')
+    populated_db.save()
+    # THEN the sample and its stats should be gone
+    assert count > 0
+    assert populated_db.query(Sample.id).all() == [('sample2',)]
+    assert TranscriptStat.query.filter_by(sample_id='sample').count() == 0
+
+
+def test_delete_sample_with_histograms(chanjo_db, exon_lines):
+    # GIVEN a sample loaded with coverage histograms
+    result = load_transcripts(exon_lines, sample_id='sample', histogram=True)
+    chanjo_db.add(result.sample)
+    chanjo_db.add(list(result.models))
+    chanjo_db.save()
+    assert CoverageHistogram.query.count() > 0
+    # WHEN deleting the sample
+    chanjo_db.delete_sample('sample')
+    chanjo_db.save()
+    # THEN the histograms should be gone too
+    assert CoverageHistogram.query.count() == 0
+
+
+def test_add_stats(chanjo_db, exon_lines):
+    # GIVEN transcript stats with histograms for unlinked transcripts
+    result = load_transcripts(exon_lines, sample_id='sample', histogram=True)
+    # WHEN adding them with bulk inserts
+    count = chanjo_db.add_stats(result.sample, result.models)
+    chanjo_db.save()
+    # THEN the stats, histograms, and transcripts should be stored
+    assert count == result.count
+    assert TranscriptStat.query.filter_by(sample_id='sample').count() == count
+    assert CoverageHistogram.query.count() == count
+    assert Transcript.query.count() == count
+    assert chanjo_db.mean().one()[0] == 'sample'
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+import csv
+
+from sqlalchemy.dialects import mysql, postgresql
+
+from chanjo.store import bulk
+from chanjo.store.models import CoverageHistogram, Sample, Transcript
+
+
+class FakeCopyCursor:
+
+    """Collect the CSV sent with ``COPY`` instead of running it."""
+
+    def __init__(self):
+        self.statements = []
+        self.rows = []
+
+    def copy_expert(self, statement, buffer):
+        self.statements.append(statement)
+        self.rows.extend(csv.reader(buffer))
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+
+    def __init__(self):
+        self.dialect = postgresql.dialect()
+        self.copy_cursor = FakeCopyCursor()
+        self.connection = self
+
+    def cursor(self):
+        return self.copy_cursor
+
+
+def test_csv_buffer():
+    # GIVEN rows with a missing value
+    rows = [{'id': 'tx1', 'gene_name': None, 'length': 10}]
+    # WHEN writing them as CSV
+    buffer = bulk.csv_buffer(rows, ['id', 'gene_name', 'length'])
+    # THEN missing values should be left empty
+    assert buffer.read() == 'tx1,,10\n'
+
+
+def test_copy_rows_binary():
+    # GIVEN a packed coverage histogram
+    data = CoverageHistogram.pack([10, 20], 100, [80, 60])
+    rows = [{'id': 1, 'data': data}]
+    connection = FakeConnection()
+    # WHEN copying it
+    count = bulk.copy_rows(connection, CoverageHistogram.__table__, rows)
+    # THEN the data should be sent in the bytea hex format
+    assert count == 1
+    assert connection.copy_cursor.statements[0].startswith(
+        'COPY coverage_histogram (data, id)')
+    hex_data, histogram_id = connection.copy_cursor.rows[0]
+    assert histogram_id == '1'
+    assert hex_data.startswith('\\x')
+    # ... which decodes to the original histogram
+    unpacked = CoverageHistogram.unpack(bytes.fromhex(hex_data[2:]))
+    assert unpacked == CoverageHistogram.unpack(data)
+
+
+def test_values_statements():
+    # GIVEN more rows than fit in a single statement
+    rows = [{'id': "tx{}".format(index), 'key': index, 'gene_id': 1,
+             'gene_name': None, 'chromosome': '1', 'length': 10}
+            for index in range(5)]
+    # WHEN building multi-row inserts
+    statements = list(bulk.values_statements(Transcript.__table__, rows,
+                                             size=2))
+    # THEN rows should be split up in chunks
+    assert [size for _, size in statements] == [2, 2, 1]
+    sql = str(statements[0][0].compile(dialect=mysql.dialect()))
+    assert sql.count('(%s, %s, %s, %s, %s, %s)') == 2
+
+
+def test_writer_for():
+    # GIVEN different dialects
+    # WHEN picking bulk insert functions
+    # THEN server databases should get their native path
+    assert bulk.writer_for('postgresql') is bulk.copy_rows
+    assert bulk.writer_for('mysql') is bulk.values_rows
+    assert bulk.writer_for('sqlite') is bulk.executemany_rows
+
+
+def test_bulk_insert(chanjo_db):
+    # GIVEN a few sample rows
+    rows = [{'id': "sample{}".format(index), 'key': index, 'group_id': None,
+             'source': None, 'created_at': None, 'name': None,
+             'group_name': None} for index in range(1, 4)]
+    # WHEN bulk inserting them
+    count = chanjo_db.bulk_insert(Sample.__table__, rows)
+    chanjo_db.save()
+    # THEN they should all be stored
+    assert count == 3
+    assert Sample.query.get('sample2').key == 2
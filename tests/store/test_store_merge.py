@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+import math
+
+import pytest
+from sqlalchemy import create_engine
+
+from chanjo.load.link import link_elements
+from chanjo.load.sambamba import load_transcripts
+from chanjo.store.api import ChanjoDB
+from chanjo.store.merge import merge_database
+from chanjo.store.models import (CoverageHistogram, ExonStat, Sample,
+                                 Transcript, TranscriptStat)
+
+
+@pytest.yield_fixture
+def source_engine(tmpdir, exon_lines):
+    """Node-local database with a sample loaded with exon stats."""
+    exon_lines = list(exon_lines)
+    uri = "sqlite:///{}".format(tmpdir.join('node.sqlite3'))
+    engine = create_engine(uri)
+    node_db = ChanjoDB(uri=uri)
+    node_db.set_up()
+    # reversed to end up with a different exon ordering than the target
+    result = link_elements(exon_lines)
+    node_db.add_exon_regions(list(reversed(result.exons)))
+    node_db.save()
+    result = load_transcripts(exon_lines, sample_id='node-sample',
+                              histogram=True,
+                              exon_positions=node_db.exon_positions())
+    node_db.add_stats(result.sample, result.models)
+    node_db.save()
+    node_db.session.close()
+    yield engine
+    engine.dispose()
+
+
+def test_merge_database(source_engine, chanjo_db, exon_lines):
+    # GIVEN a target with a different sample and a source database
+    chanjo_db.set_up()
+    result = load_transcripts(exon_lines, sample_id='sample')
+    chanjo_db.add_stats(result.sample, result.models)
+    chanjo_db.save()
+    # WHEN merging the source into the target
+    report = merge_database(chanjo_db, source_engine)
+    chanjo_db.save()
+    # THEN the sample and all its stats should be copied
+    assert report.samples == 1
+    assert report.conflicts == []
+    assert Sample.query.count() == 2
+    tx_count = Transcript.query.count()
+    assert report.stats == tx_count
+    assert (TranscriptStat.query.filter_by(sample_id='node-sample').count() ==
+            tx_count)
+    assert CoverageHistogram.query.count() == tx_count
+    # ... with the same results as the original sample
+    means = {row[0]: row[1] for row in chanjo_db.mean()}
+    assert means['node-sample'] == pytest.approx(means['sample'])
+    # ... and exon stats reordered to the exon ordering of the target
+    positions = chanjo_db.exon_positions()
+    values = ExonStat.query.filter_by(sample_id='node-sample',
+                                      metric='mean_coverage').one().values
+    assert len(values) == len(positions)
+    assert not any(math.isnan(value) for value in values)
+
+
+def test_merge_database_conflicts(source_engine, chanjo_db):
+    # GIVEN a target that already contains the sample of the source
+    chanjo_db.set_up()
+    merge_database(chanjo_db, source_engine)
+    chanjo_db.save()
+    stats_count = TranscriptStat.query.count()
+    # WHEN merging again
+    # THEN it should refuse by default
+    with pytest.raises(ValueError):
+        merge_database(chanjo_db, source_engine)
+    # WHEN skipping conflicts
+    report = merge_database(chanjo_db, source_engine, on_conflict='skip')
+    # THEN it should report but not copy the sample
+    assert report.conflicts == ['node-sample']
+    assert report.samples == 0
+    assert TranscriptStat.query.count() == stats_count
+    # WHEN replacing conflicts
+    report = merge_database(chanjo_db, source_engine, on_conflict='replace')
+    chanjo_db.save()
+    # THEN the sample should be copied again
+    assert report.samples == 1
+    assert Sample.query.count() == 1
+    assert TranscriptStat.query.count() == stats_count
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+import pytest
+from sqlalchemy.dialects import mysql
+
+from chanjo.store.api import ChanjoDB
+from chanjo.store.migrate import (key_statement, link_statement, migrate_keys,
+                                  needs_migration)
+from chanjo.store.models import CoverageHistogram, Sample, TranscriptStat
+
+LEGACY_SCHEMA = [
+    """CREATE TABLE sample (id VARCHAR(32) PRIMARY KEY, group_id VARCHAR(128),
+       source VARCHAR(256), created_at DATETIME, name VARCHAR(128),
+       group_name VARCHAR(128))""",
+    """CREATE TABLE transcript (id VARCHAR(32) PRIMARY KEY,
+       gene_id INTEGER NOT NULL, gene_name VARCHAR(32),
+       chromosome VARCHAR(10), length INTEGER)""",
+    """CREATE TABLE transcript_stat (id INTEGER PRIMARY KEY,
+       mean_coverage FLOAT NOT NULL, completeness_10 FLOAT,
+       completeness_15 FLOAT, completeness_20 FLOAT, completeness_50 FLOAT,
+       completeness_100 FLOAT, threshold INTEGER, _incomplete_exons TEXT,
+       sample_id VARCHAR(32) NOT NULL REFERENCES sample (id),
+       transcript_id VARCHAR(32) NOT NULL REFERENCES transcript (id),
+       CONSTRAINT _sample_transcript_uc UNIQUE (sample_id, transcript_id))""",
+    """CREATE TABLE coverage_histogram (
+       id INTEGER PRIMARY KEY REFERENCES transcript_stat (id),
+       data BLOB NOT NULL)""",
+    "INSERT INTO sample (id) VALUES ('sample'), ('sample2')",
+    """INSERT INTO transcript (id, gene_id) VALUES ('tx1', 1), ('tx2', 1)""",
+    """INSERT INTO transcript_stat (id, mean_coverage, sample_id, transcript_id)
+       VALUES (1, 10.0, 'sample', 'tx1'), (2, 20.0, 'sample', 'tx2'),
+              (3, 30.0, 'sample2', 'tx2')""",
+]
+
+
+@pytest.yield_fixture
+def legacy_db(tmpdir):
+    chanjo_db = ChanjoDB(str(tmpdir.join('legacy.sqlite3')))
+    for statement in LEGACY_SCHEMA:
+        chanjo_db.engine.execute(statement)
+    histogram = CoverageHistogram.pack([10], 100, [50])
+    chanjo_db.engine.execute('INSERT INTO coverage_histogram VALUES (3, ?)',
+                             histogram)
+    yield chanjo_db
+
+
+def test_migrate_keys(legacy_db):
+    # GIVEN a database linking stats by string ids
+    assert needs_migration(legacy_db.engine)
+    # WHEN migrating it
+    count = migrate_keys(legacy_db.engine)
+    # THEN all stats should be moved over to integer keys
+    assert count == 3
+    assert not needs_migration(legacy_db.engine)
+    stat = TranscriptStat.query.filter_by(sample_id='sample2').one()
+    assert stat.transcript_id == 'tx2'
+    assert stat.mean_coverage == 30.0
+    assert isinstance(stat.sample_key, int)
+    # THEN histograms should be kept
+    assert stat.histogram.completeness(10) == 50.
+    # THEN new samples should get keys after the migrated ones
+    legacy_db.add(Sample(id='sample3'))
+    legacy_db.save()
+    assert Sample.query.get('sample3').key == 3
+
+
+def test_migrate_keys_unlinked(legacy_db):
+    # GIVEN stats for a transcript that isn't linked
+    legacy_db.engine.execute("INSERT INTO transcript_stat (id, mean_coverage, "
+                             "sample_id, transcript_id) "
+                             "VALUES (4, 1.0, 'sample', 'tx3')")
+    # WHEN migrating
+    # THEN it should refuse and leave the database untouched
+    with pytest.raises(ValueError):
+        migrate_keys(legacy_db.engine)
+    assert needs_migration(legacy_db.engine)
+
+
+def test_migrate_keys_other_dialects(legacy_db, monkeypatch):
+    # GIVEN a legacy database that isn't SQLite
+    monkeypatch.setattr(legacy_db.engine.dialect, 'name', 'postgresql')
+    # WHEN migrating
+    # THEN it should refuse to change the tables in place
+    with pytest.raises(ValueError):
+        migrate_keys(legacy_db.engine)
+    monkeypatch.undo()
+    assert needs_migration(legacy_db.engine)
+
+
+def test_migrate_statements_mysql():
+    # GIVEN the MySQL dialect
+    dialect = mysql.dialect()
+    # WHEN composing the statements to alter the tables in place
+    key_sql = key_statement(Sample.__table__, dialect)
+    link_sql = link_statement(TranscriptStat.__table__, dialect)
+    # THEN samples should be keyed by integers assigned by the database
+    assert key_sql.startswith('ALTER TABLE sample DROP PRIMARY KEY')
+    assert 'AUTO_INCREMENT PRIMARY KEY' in key_sql
+    # THEN stats should only link by the integer keys
+    assert 'DROP COLUMN sample_id' in link_sql
+    assert 'UNIQUE (sample_key, transcript_key)' in link_sql
+    assert 'REFERENCES sample (`key`)' in link_sql
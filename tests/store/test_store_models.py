@@ -1,5 +1,8 @@
 # -*- coding: utf-8 -*-
-from chanjo.store.models import TranscriptStat, Exon
+import pytest
+
+from chanjo.store.models import (CoverageHistogram, ExonStat, Sample,
+                                 Transcript, TranscriptStat, Exon)
 
 
 def test_TranscriptStat():
@@ -10,3 +13,100 @@ def test_TranscriptStat():
     parsed_exons = list(stat.incomplete_exons)
     # THEN should be the same
     assert parsed_exons == exons
+
+
+def test_TranscriptStat_keys(chanjo_db):
+    # GIVEN a linked transcript and a stat referring to it by string ids
+    chanjo_db.add(Sample(id='sample'), Transcript(id='tx1', gene_id=1))
+    chanjo_db.save()
+    chanjo_db.add(TranscriptStat(sample_id='sample', transcript_id='tx1',
+                                 mean_coverage=10.))
+    # WHEN persisting it
+    chanjo_db.save()
+    # THEN the ids should be resolved to keys assigned by the database
+    sample_obj = Sample.query.get('sample')
+    tx_obj = Transcript.query.get('tx1')
+    assert isinstance(sample_obj.key, int)
+    stat = TranscriptStat.query.filter_by(transcript_id='tx1').one()
+    assert stat.sample_key == sample_obj.key
+    assert stat.transcript_key == tx_obj.key
+    assert stat.sample_id == 'sample'
+
+    # GIVEN a stat for a transcript that isn't linked
+    stat = TranscriptStat(sample_id='sample', transcript_id='tx2',
+                          mean_coverage=10.)
+    # WHEN adding it
+    # THEN it should complain
+    with pytest.raises(ValueError):
+        chanjo_db.add(stat)
+
+
+def test_TranscriptStat_id_filters(chanjo_db):
+    # GIVEN stats for two samples
+    chanjo_db.add(Transcript(id='tx1', gene_id=1))
+    for sample_id in ('sample', 'sample2'):
+        chanjo_db.add(TranscriptStat(sample=Sample(id=sample_id),
+                                     transcript_id='tx1', mean_coverage=10.))
+    chanjo_db.save()
+    # WHEN filtering them by string ids
+    query = TranscriptStat.query.filter(
+        TranscriptStat.sample_id.in_(['sample2']),
+        TranscriptStat.transcript_id == 'tx1')
+    # THEN samples and transcripts should be joined, not looked up per row
+    assert str(query.statement).count('SELECT') == 1
+    assert [stat.sample_id for stat in query] == ['sample2']
+    assert TranscriptStat.query.filter_by(sample_id='sample').count() == 1
+
+
+def test_TranscriptStat_relationships(chanjo_db):
+    # GIVEN new models linked through relationships
+    sample_obj = Sample(id='sample')
+    tx_obj = Transcript(id='tx1', gene_id=1)
+    chanjo_db.add(TranscriptStat(sample=sample_obj, transcript=tx_obj,
+                                 mean_coverage=10.))
+    # WHEN persisting them
+    chanjo_db.save()
+    # THEN the database should assign the keys
+    stat = TranscriptStat.query.one()
+    assert stat.sample_key == sample_obj.key
+    assert stat.transcript_key == tx_obj.key
+
+
+def test_CoverageHistogram():
+    # GIVEN a packed histogram
+    data = CoverageHistogram.pack([10, 30], 200, [150, 50])
+    histogram = CoverageHistogram(data=data)
+    # WHEN unpacking it
+    # THEN it should round trip
+    assert CoverageHistogram.unpack(data) == ([10, 30], 200, [150, 50])
+    assert histogram.levels == [10, 30]
+    assert histogram.completeness(30) == 25.
+    # ... and complain about levels that aren't stored
+    with pytest.raises(ValueError):
+        histogram.completeness(20)
+
+
+def test_CoverageHistogram_mean_completeness():
+    # GIVEN histograms with the same levels and one with other levels
+    datas = [CoverageHistogram.pack([10, 30], 200, [150, 50]),
+             CoverageHistogram.pack([10, 30], 100, [100, 0]),
+             CoverageHistogram.pack([10, 30], 0, [0, 0])]
+    other_data = CoverageHistogram.pack([1, 10, 30], 100, [100, 50, 10])
+    # WHEN calculating the mean completeness over them
+    # THEN it should average the completeness of each histogram
+    assert CoverageHistogram.mean_completeness(datas, 10) == pytest.approx(
+        (75 + 100 + 0) / 3)
+    assert CoverageHistogram.mean_completeness(
+        datas + [other_data], 30) == pytest.approx((25 + 0 + 0 + 10) / 4)
+    # ... and complain about levels that aren't stored
+    with pytest.raises(ValueError):
+        CoverageHistogram.mean_completeness(datas, 20)
+
+
+def test_ExonStat():
+    # GIVEN exon level values packed as float32
+    stat = ExonStat(metric='mean_coverage', data=ExonStat.pack([1.5, 20.25]))
+    # WHEN accessing the values
+    # THEN they should be unpacked
+    assert len(stat.data) == 8
+    assert list(stat.values) == [1.5, 20.25]
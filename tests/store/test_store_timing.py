@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+import logging
+
+from chanjo.store.models import Sample
+from chanjo.store.timing import normalize
+
+
+def test_normalize():
+    # GIVEN statements differing only in literals and parameter lists
+    first = ("SELECT * FROM sample WHERE id IN (?, ?, ?) AND key = 5 "
+             "AND name = 'a'")
+    second = "SELECT *  FROM sample\nWHERE id IN (?) AND key = 12 AND name = 'b'"
+    # WHEN normalising them
+    # THEN they should end up the same
+    assert normalize(first) == normalize(second)
+    assert normalize(first) == ("SELECT * FROM sample WHERE id IN (...) AND "
+                                "key = ? AND name = ?")
+    # ... and columns with numbers in their names should be left alone
+    assert 'completeness_10' in normalize('SELECT avg(completeness_10)')
+    # ... as well as multi-row inserts of any size
+    assert (normalize('INSERT INTO t VALUES (%s, %s), (%s, %s)') ==
+            normalize('INSERT INTO t VALUES (%s, %s)'))
+
+
+def test_instrument(populated_db, caplog):
+    # GIVEN an instrumented database that logs every statement as slow
+    timer = populated_db.instrument(slow_ms=0)
+    try:
+        # WHEN running queries
+        with caplog.at_level(logging.WARNING):
+            populated_db.mean().all()
+            populated_db.mean().all()
+            assert Sample.query.count() == 2
+    finally:
+        timer.detach()
+    # THEN every statement should be timed and grouped
+    report = timer.report()
+    assert report[0]['total_seconds'] >= report[-1]['total_seconds']
+    mean_stats = [row for row in report if 'avg' in row['statement']]
+    assert len(mean_stats) == 1
+    assert mean_stats[0]['count'] == 2
+    # ... slow statements logged with their query plan
+    assert 'slow query' in caplog.text
+    assert 'plan:' in caplog.text
+
+    # WHEN running queries after detaching
+    populated_db.mean().all()
+    # THEN nothing should be recorded
+    assert timer.report()[0]['count'] == report[0]['count']
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+from contextlib import contextmanager
+
+import pytest
+
+from chanjo.batch import (BatchItem, Outcome, read_manifest, run_batch,
+                          summarize)
+from chanjo.exc import ManifestFormattingError
+from chanjo.store.models import Sample
+
+
+def test_read_manifest():
+    # GIVEN a manifest with a comment and optional columns left out
+    lines = ['#bam\tsample\tgroup\n', 'a.bam\tsampleA\tgroup1\n',
+             'b.bam\tsampleB\n', '\n']
+    # WHEN parsing it
+    items = read_manifest(lines)
+    # THEN missing columns should be filled in
+    assert items == [BatchItem('a.bam', 'sampleA', 'group1', None, None),
+                     BatchItem('b.bam', 'sampleB', None, None, None)]
+
+    # GIVEN a row without sample id
+    with pytest.raises(ManifestFormattingError):
+        read_manifest(['a.bam\n'])
+
+
+def test_run_batch_skip(popexist_db, bam_path, bed_path):
+    # GIVEN a database with a sample already loaded
+    items = [BatchItem(bam_path, 'sample', 'group', None, None)]
+    # WHEN running the batch
+    outcomes = list(run_batch(popexist_db, items, bed_path))
+    # THEN the sample should be skipped without running sambamba
+    assert [outcome.status for outcome in outcomes] == ['skipped']
+    assert Sample.query.count() == 1
+
+
+def test_run_batch(existing_db, bam_path, bed_path):
+    # GIVEN an empty database and two BAM files
+    items = [BatchItem(bam_path, 'sampleA', 'group', None, None),
+             BatchItem(bam_path, 'sampleB', 'group', None, None)]
+    # WHEN running the batch in parallel
+    outcomes = list(run_batch(existing_db, items, bed_path, jobs=2))
+    # THEN both samples should be loaded
+    assert set(outcome.status for outcome in outcomes) == set(['loaded'])
+    assert Sample.query.count() == 2
+
+
+def test_run_batch_duplicates(existing_db, exon_lines, monkeypatch):
+    # GIVEN a manifest that lists the same sample twice
+    @contextmanager
+    def fake_sambamba(bam_path, regions, cov_thresholds):
+        yield iter(exon_lines)
+    monkeypatch.setattr('chanjo.batch.stream_sambamba', fake_sambamba)
+    items = read_manifest(['a.bam\tsampleA\n', 'b.bam\tsampleA\n',
+                           'c.bam\tsampleB\n'])
+    # WHEN running the batch
+    outcomes = list(run_batch(existing_db, items, 'regions.bed'))
+    # THEN the duplicate should be reported as a conflict
+    assert [outcome.status for outcome in outcomes] == ['loaded', 'conflict',
+                                                        'loaded']
+    # ... and the following samples should still be loaded
+    assert Sample.query.count() == 2
+
+
+def test_summarize():
+    # GIVEN a few processed samples
+    item = BatchItem('a.bam', 'sampleA', None, None, None)
+    outcomes = [(item, 'loaded', None, 10, 1.), (item, 'skipped', None, 0, 0.)]
+    # WHEN summarizing the batch
+    summary = summarize([Outcome(*outcome) for outcome in outcomes], 2.)
+    # THEN it should count per status and calculate throughput
+    assert summary['loaded'] == 1
+    assert summary['skipped'] == 1
+    assert summary['transcripts_per_second'] == 5.
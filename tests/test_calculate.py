@@ -1,4 +1,8 @@
 # -*- coding: utf-8 -*-
+import pytest
+
+from chanjo import depth
+from chanjo.load.sambamba import histogram_levels, load_exons, load_transcripts
 from chanjo.store.models import Sample
 
 
@@ -42,3 +46,56 @@ def test_gene(populated_db):
     result = results[0]
     assert result[0] == 'sample'
     assert result[-1] == gene_id
+
+
+def test_completeness(chanjo_db, exon_lines):
+    # GIVEN a database with a sample loaded with coverage histograms
+    result = load_transcripts(exon_lines, sample_id='sample', histogram=True)
+    chanjo_db.add(result.sample)
+    chanjo_db.add(list(result.models))
+    chanjo_db.save()
+    # WHEN calculating completeness at a stored level
+    results = chanjo_db.completeness(20)
+    # THEN it should match the regular mean completeness
+    mean_result = chanjo_db.mean().one()
+    assert results[0][0] == 'sample'
+    assert results[0][1] == pytest.approx(mean_result[4], abs=0.1)
+
+    # WHEN asking for a level that wasn't sampled
+    # THEN it should complain
+    with pytest.raises(ValueError):
+        chanjo_db.completeness(30)
+
+
+def test_completeness_any_level(chanjo_db):
+    # GIVEN samples loaded from output sampled at every level up to a max
+    regions = depth.read_regions(['1\t10\t20\t1-10-20\tTX1\t1\tGENE1\n',
+                                  '1\t30\t40\t1-30-40\tTX2\t2\tGENE2\n'])
+    thresholds = histogram_levels(5, [10])
+    samples = {'sample1': [('1', 10, 11, 1), ('1', 11, 12, 2),
+                           ('1', 12, 14, 4)],
+               'sample2': [('1', 0, 50, 4)]}
+    for sample_id, intervals in sorted(samples.items()):
+        records = depth.region_depth(regions, intervals, thresholds=thresholds,
+                                     sample_name=sample_id)
+        result = load_exons(records, histogram=True)
+        chanjo_db.add(result.sample)
+        chanjo_db.add(list(result.models))
+    chanjo_db.save()
+    # WHEN calculating completeness at a level that isn't a standard level
+    results = chanjo_db.completeness(3)
+    # THEN it should be derived from the dense histograms
+    assert results == [('sample1', pytest.approx((20 + 0) / 2)),
+                       ('sample2', pytest.approx(100.))]
+
+
+def test_sex_from_stats(populated_db):
+    # GIVEN a database with samples with coverage on X and Y
+    sample_obj = Sample.query.get('sample')
+    # WHEN predicting the sex from the stored transcript stats
+    result = populated_db.sex_from_stats('sample')
+    # THEN it should match the prediction made when loading
+    assert result.sex == sample_obj.sex
+    assert result.x_coverage > 0
+    # ... and give up for unknown samples
+    assert populated_db.sex_from_stats('missing') is None
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from chanjo import depth
+from chanjo.exc import BedFormattingError
+from chanjo.load.sambamba import load_exons, load_transcripts
+
+REGION_LINES = ['1\t10\t20\t1-10-20\tTX1\t1\tGENE1\n',
+                '1\t15\t30\t1-15-30\tTX1,TX2\t1,2\tGENE1,GENE2\n',
+                '2\t0\t10\t2-0-10\tTX3\t3\tGENE3\n']
+DEPTH_LINES = ['track type=bedGraph\n', '1\t0\t12\t5\n', '1\t12\t18\t20\n',
+               '1\t18\t25\t10\n', '3\t0\t100\t50\n']
+
+
+@pytest.fixture
+def regions():
+    return depth.read_regions(REGION_LINES)
+
+
+def test_region_depth(regions):
+    # GIVEN regions and a depth track with gaps and without chromosome 2
+    intervals = depth.read_bedgraph(DEPTH_LINES)
+    # WHEN sweeping over the depth intervals
+    records = list(depth.region_depth(regions, intervals, thresholds=[20, 10],
+                                      sample_name='sample'))
+    # THEN metrics should add up for each (overlapping) region
+    assert len(records) == 3
+    assert records[0]['meanCoverage'] == 15.
+    assert records[0]['thresholds'] == {10: 80., 20: 60.}
+    assert records[1]['meanCoverage'] == pytest.approx(130 / 15)
+    assert records[1]['thresholds'][20] == 20.
+    # ... uncovered regions get zero coverage
+    assert records[2]['meanCoverage'] == 0.
+    assert records[2]['thresholds'] == {10: 0., 20: 0.}
+    assert records[2]['extraFields'] == ['2-0-10', 'TX3', '3', 'GENE3']
+
+
+def test_region_depth_dense_levels(regions):
+    # GIVEN completeness levels sampled at every level up to a max
+    intervals = depth.read_bedgraph(DEPTH_LINES)
+    thresholds = list(range(1, 21))
+    # WHEN sweeping over the depth intervals
+    records = list(depth.region_depth(regions, intervals, thresholds=thresholds))
+    # THEN bases should count at every level up to their depth
+    assert records[0]['thresholds'][1] == 100.
+    assert records[0]['thresholds'][5] == 100.
+    assert records[0]['thresholds'][6] == 80.
+    assert records[0]['thresholds'][10] == 80.
+    assert records[0]['thresholds'][11] == 60.
+    assert records[0]['thresholds'][20] == 60.
+
+
+def test_region_depth_unsorted(regions):
+    # GIVEN a depth track that isn't sorted
+    intervals = depth.read_bedgraph(['1\t12\t18\t20\n', '1\t0\t12\t5\n'])
+    # WHEN sweeping over the depth intervals
+    # THEN it should complain
+    with pytest.raises(BedFormattingError):
+        list(depth.region_depth(regions, intervals))
+
+
+def test_region_depth_chromosome_order():
+    # GIVEN regions out of chromosome order and a track sorted per chromosome
+    regions = depth.read_regions(['2\t0\t10\t2-0-10\n',
+                                  '1\t10\t20\t1-10-20\n',
+                                  '2\t20\t30\t2-20-30\n'])
+    intervals = depth.read_bedgraph(['1\t0\t50\t5\n', '2\t0\t25\t10\n'])
+    # WHEN sweeping over the depth intervals
+    records = list(depth.region_depth(regions, intervals, thresholds=[10]))
+    # THEN each region should be counted once
+    assert [record['meanCoverage'] for record in records] == [10., 5., 5.]
+    assert [record['thresholds'][10] for record in records] == [100., 0., 50.]
+
+
+def test_region_depth_chromosome_split(regions):
+    # GIVEN a depth track where a chromosome comes back later
+    intervals = depth.read_bedgraph(['1\t0\t12\t5\n', '2\t0\t10\t20\n',
+                                     '1\t12\t18\t20\n'])
+    # WHEN sweeping over the depth intervals
+    # THEN it should complain instead of restarting the chromosome
+    with pytest.raises(BedFormattingError):
+        list(depth.region_depth(regions, intervals))
+
+
+def test_load_records(regions):
+    # GIVEN records from the depth engine
+    records = depth.region_depth(regions, depth.read_bedgraph(DEPTH_LINES),
+                                 thresholds=[10, 20], sample_name='sample')
+    # WHEN loading them directly
+    result = load_exons(records)
+    # THEN they should work just like sambamba output
+    assert result.sample.id == 'sample'
+    assert result.count == 3
+    stats = {model.transcript_id: model for model in result.models}
+    assert stats['TX1'].mean_coverage == pytest.approx((150 + 130) / 25)
+
+
+def test_format_sambamba(regions):
+    # GIVEN records from the depth engine
+    records = depth.region_depth(regions, depth.read_bedgraph(DEPTH_LINES),
+                                 sample_name='sample')
+    # WHEN formatting them like sambamba
+    lines = list(depth.format_sambamba(records))
+    # THEN the header should come first and the output be loadable
+    assert lines[0].startswith('# chrom')
+    assert len(lines) == 4
+    result = load_transcripts(lines)
+    assert result.count == 3
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+import math
+
+import pytest
+
+from chanjo.load.link import link_elements
+from chanjo.load.sambamba import load_transcripts
+from chanjo.store.models import ExonStat, Sample
+
+
+@pytest.fixture
+def exon_db(chanjo_db, exon_lines):
+    result = link_elements(exon_lines)
+    chanjo_db.add(*result.models)
+    chanjo_db.add_exon_regions(result.exons)
+    chanjo_db.save()
+    positions = chanjo_db.exon_positions()
+    for sample_id in ('sample', 'sample2'):
+        result = load_transcripts(exon_lines, sample_id=sample_id,
+                                  exon_positions=positions)
+        chanjo_db.add(result.sample)
+        chanjo_db.add(*result.models)
+    chanjo_db.save()
+    return chanjo_db
+
+
+def test_add_exon_regions(chanjo_db):
+    # GIVEN an empty exon ordering
+    exons = [('1', 10, 20), ('1', 30, 40)]
+    # WHEN adding exons
+    assert chanjo_db.add_exon_regions(exons) == 2
+    chanjo_db.save()
+    # THEN they should be indexed in order
+    assert chanjo_db.exon_positions() == {('1', 10, 20): 0, ('1', 30, 40): 1}
+
+    # WHEN adding exons again with one new one
+    assert chanjo_db.add_exon_regions([('1', 5, 8)] + exons) == 1
+    chanjo_db.save()
+    # THEN the new exon should be appended to the end
+    assert chanjo_db.exon_positions()[('1', 5, 8)] == 2
+
+
+def test_exon_stats(exon_db, exon_lines):
+    # GIVEN a database with exon stats for two samples
+    positions = exon_db.exon_positions()
+    assert len(positions) == len(exon_lines) - 1
+    index = positions[('1', 69089, 70007)]
+    # WHEN slicing out a range of exons
+    results = exon_db.exon_stats(start=index, end=index + 2)
+    # THEN it should return values for all samples
+    assert set(results) == set(['sample', 'sample2'])
+    assert len(results['sample']) == 2
+    assert results['sample'][0] == pytest.approx(25.4946)
+
+    # WHEN fetching a different metric for one sample
+    results = exon_db.exon_stats('completeness_100', sample_ids=['sample2'])
+    # THEN it should return all exons
+    assert list(results) == ['sample2']
+    assert results['sample2'][index] == pytest.approx(5.55556)
+
+
+def test_exon_stats_appended(exon_db):
+    # GIVEN an exon appended after samples were loaded
+    exon_db.add_exon_regions([('1', 1, 2)])
+    exon_db.save()
+    end = len(exon_db.exon_positions())
+    # WHEN slicing out the appended exon
+    results = exon_db.exon_stats(start=end - 1, end=end)
+    # THEN it should be missing
+    assert math.isnan(results['sample'][0])
+
+
+def test_exon_index(exon_db):
+    # GIVEN a database with linked exons
+    # WHEN looking up exons in a region
+    indexes = exon_db.exon_index('1', 860000, 866000)
+    # THEN it should find the overlapping exons
+    assert len(indexes) == 2
+
+
+def test_delete_sample_exon_stats(exon_db):
+    # GIVEN exon stats linked to samples by key
+    assert ExonStat.query.filter_by(sample_id='sample').count() > 0
+    # WHEN deleting one of the samples
+    exon_db.delete_sample('sample')
+    exon_db.save()
+    # THEN only the exon stats of the other sample should remain
+    assert set(exon_db.exon_stats()) == {'sample2'}
+    sample_key = exon_db.query(Sample.key).filter_by(id='sample2').scalar()
+    assert (ExonStat.query.count() ==
+            ExonStat.query.filter_by(sample_key=sample_key).count())
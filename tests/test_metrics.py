@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+import json
+
+from chanjo.metrics import RunMetrics
+
+
+def test_counted():
+    # GIVEN enabled metrics
+    run_metrics = RunMetrics(command='load')
+    # WHEN consuming a counted iterable
+    items = list(run_metrics.counted(iter('abc'), 'rows_parsed'))
+    # THEN the items should pass through and be counted
+    assert items == ['a', 'b', 'c']
+    assert run_metrics.values['rows_parsed'] == 3
+
+
+def test_counted_disabled():
+    # GIVEN disabled metrics
+    run_metrics = RunMetrics(enabled=False)
+    items = ['a', 'b']
+    # WHEN counting
+    # THEN the iterable should be returned as is
+    assert run_metrics.counted(items, 'rows_parsed') is items
+
+
+def test_phase():
+    # GIVEN metrics
+    run_metrics = RunMetrics()
+    # WHEN timing the same phase twice
+    with run_metrics.phase('parse'):
+        pass
+    with run_metrics.phase('parse'):
+        pass
+    # THEN the time should be added up under one name
+    assert list(run_metrics.phases) == ['parse']
+    assert run_metrics.phases['parse'] >= 0
+
+
+def test_write(tmpdir):
+    # GIVEN metrics with counters and a phase
+    run_metrics = RunMetrics(command='load')
+    run_metrics.set('bytes_read', 100)
+    run_metrics.set('sambamba_exit_status', None)
+    with run_metrics.phase('write'):
+        pass
+    json_path = str(tmpdir.join('metrics.json'))
+    prom_path = str(tmpdir.join('metrics.prom'))
+    # WHEN writing by file extension
+    run_metrics.write(json_path)
+    run_metrics.write(prom_path)
+    # THEN JSON should include all values
+    with open(json_path) as handle:
+        data = json.load(handle)
+    assert data['metrics'] == {'bytes_read': 100,
+                               'sambamba_exit_status': None}
+    assert 'write' in data['phase_seconds']
+    # ... and Prometheus gauges should skip unknown values
+    with open(prom_path) as handle:
+        prom_lines = handle.read().splitlines()
+    assert '# TYPE chanjo_bytes_read gauge' in prom_lines
+    assert 'chanjo_bytes_read{command="load"} 100.0' in prom_lines
+    assert not any('sambamba_exit_status' in line for line in prom_lines)
+    assert tmpdir.join('metrics.prom.tmp').check() is False
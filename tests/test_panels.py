@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from chanjo.store.models import Panel, PanelStat, PanelTranscript
+
+
+def test_add_panel(populated_db):
+    # GIVEN a database with linked transcripts
+    # WHEN adding a panel by gene id and gene name
+    count = populated_db.add_panel('panel1', ['28706', 'OR4F5'], name='Panel 1')
+    populated_db.save()
+    # THEN it should store the transcripts of both genes
+    assert count == PanelTranscript.query.count()
+    assert count >= 2
+    assert Panel.query.get('panel1').name == 'Panel 1'
+
+    # WHEN adding the same panel again with fewer genes
+    new_count = populated_db.add_panel('panel1', [28706])
+    # THEN it should replace the membership
+    assert new_count < count
+    assert PanelTranscript.query.count() == new_count
+
+
+def test_remove_panel(populated_db):
+    # GIVEN a database with a panel
+    populated_db.add_panel('panel1', ['SAMD11'])
+    # WHEN removing the panel
+    assert populated_db.remove_panel('panel1')
+    # THEN membership should be gone as well
+    assert Panel.query.count() == 0
+    assert PanelTranscript.query.count() == 0
+    # ... removing it again should report it missing
+    assert populated_db.remove_panel('panel1') is False
+
+
+def test_panel_metrics(populated_db):
+    # GIVEN a panel with a single gene
+    gene_id = 28706
+    populated_db.add_panel('panel1', [gene_id])
+    # WHEN calculating metrics over the panel
+    results = populated_db.panel_metrics('panel1').all()
+    # THEN it should match the gene metrics per sample
+    gene_results = populated_db.gene_metrics(gene_id).all()
+    assert len(results) == 2
+    for result, gene_result in zip(sorted(results), sorted(gene_results)):
+        assert result[0] == gene_result[0]
+        assert result[1] == pytest.approx(gene_result[1])
+
+    # WHEN limiting to a sample
+    results = populated_db.panel_metrics('panel1', sample_ids=['sample2'])
+    # THEN it should only return that sample
+    assert [result[0] for result in results] == ['sample2']
+
+
+def test_update_panel_stats(populated_db):
+    # GIVEN a stored panel
+    populated_db.add_panel('panel1', ['SAMD11', 'OR4F5'])
+    # WHEN precomputing panel stats
+    count = populated_db.update_panel_stats()
+    # THEN it should store one row per sample
+    assert count == PanelStat.query.count() == 2
+    # ... matching the metrics calculated on the fly
+    live = sorted(populated_db.panel_metrics('panel1'))
+    stored = populated_db.panel_stats('panel1').all()
+    assert [row[0] for row in stored] == [row[0] for row in live]
+    for live_row, stored_row in zip(live, stored):
+        assert stored_row[1] == pytest.approx(live_row[1])
+
+    # WHEN updating again
+    # THEN it should replace the existing rows
+    assert populated_db.update_panel_stats('panel1') == 2
+    assert PanelStat.query.count() == 2
+
+    # WHEN deleting a sample
+    populated_db.delete_sample('sample')
+    # THEN its panel stats should be removed
+    assert [row[0] for row in populated_db.panel_stats('panel1')] == ['sample2']
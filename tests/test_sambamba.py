@@ -1,7 +1,8 @@
 # -*- coding: utf-8 -*-
 import pytest
 
-from chanjo.sambamba import run_sambamba
+from chanjo.load.sambamba import load_transcripts
+from chanjo.sambamba import run_sambamba, stream_sambamba
 
 THRESHOLDS = (10, 20)
 
@@ -18,3 +19,18 @@ def test_run_sambamba_missing(tmpdir, reset_path, bed_path, bam_path):
     with pytest.raises(OSError):
         run_sambamba(bam_path, bed_path, outfile=str(out_path),
                      cov_thresholds=THRESHOLDS)
+
+
+def test_stream_sambamba(bed_path, bam_path):
+    # GIVEN a BAM file and a BED file with exons
+    # WHEN streaming the output through a pipe into the loader
+    with stream_sambamba(bam_path, bed_path, cov_thresholds=THRESHOLDS) as lines:
+        result = load_transcripts(lines, sample_id='sample')
+    # THEN all transcripts should be parsed without intermediate files
+    assert result.count == 5
+
+
+def test_stream_sambamba_missing(reset_path, bed_path, bam_path):
+    with pytest.raises(OSError):
+        with stream_sambamba(bam_path, bed_path) as lines:
+            list(lines)
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+import json
+from wsgiref.util import setup_testing_defaults
+
+import pytest
+
+from chanjo.serve import QueryApp, percentile
+
+
+@pytest.fixture
+def get(populated_db):
+    app = QueryApp(populated_db, cache_size=16)
+
+    def _get(path, query=''):
+        environ = {'PATH_INFO': path, 'QUERY_STRING': query}
+        setup_testing_defaults(environ)
+        response = {}
+
+        def start_response(status, headers):
+            response['status'] = status
+        body = b''.join(app(environ, start_response))
+        return response['status'], json.loads(body.decode('utf-8'))
+    return _get
+
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([3.], 90) == 3.
+    assert percentile([], 50) is None
+
+
+def test_samples(get):
+    # GIVEN a database with two samples
+    # WHEN listing samples
+    status, data = get('/samples')
+    # THEN both should be returned
+    assert status == '200 OK'
+    assert [sample['id'] for sample in data] == ['sample', 'sample2']
+
+
+def test_mean_and_genes(get):
+    # WHEN asking for mean metrics for a sample
+    status, data = get('/mean', 'sample=sample2')
+    # THEN it should return a single row
+    assert status == '200 OK'
+    assert len(data) == 1
+    assert data[0]['sample_id'] == 'sample2'
+    assert isinstance(data[0]['mean_coverage'], float)
+
+    # WHEN asking for gene metrics
+    status, data = get('/genes', 'gene=28706')
+    # THEN it should return one row per sample
+    assert len(data) == 2
+    assert data[0]['gene_id'] == 28706
+
+    # WHEN passing an invalid gene id
+    status, data = get('/genes', 'gene=SAMD11')
+    # THEN it should complain
+    assert status == '400 Bad Request'
+    assert 'error' in data
+
+
+def test_incomplete(get):
+    # WHEN asking for incomplete exons for a sample
+    status, data = get('/incomplete', 'sample=sample')
+    # THEN it should group them per transcript
+    assert status == '200 OK'
+    for exons in data.values():
+        assert set(exons[0]) == set(['chrom', 'start', 'end', 'completeness'])
+
+
+def test_stats(get):
+    # GIVEN repeated queries
+    get('/mean')
+    get('/mean')
+    status, data = get('/unknown')
+    assert status == '404 Not Found'
+    # WHEN asking for stats
+    status, data = get('/stats')
+    # THEN the repeated query should be cached
+    assert data['requests'] == 3
+    assert data['cache']['hits'] == 1
+    assert data['latency_ms']['p50'] >= 0
@@ -1,5 +1,11 @@
 # -*- coding: utf-8 -*-
-from chanjo.sex import SexGuess, sex_from_bam, predict_sex
+import pytest
+
+import os
+
+from chanjo.sex import (SexGuess, cache_key, drop_cached, guess_sex,
+                        read_cache, sex_from_bam, sex_from_bams,
+                        sex_from_exons, predict_sex, write_cache)
 
 
 def test_SexGuess():
@@ -25,3 +31,101 @@ def test_sex_from_bam(bam_path):
     result = sex_from_bam(bam_path)
     assert result.x_coverage > result.y_coverage
     assert result.sex == 'female'
+
+
+def test_guess_sex():
+    # GIVEN length-weighted coverage sums on X and Y
+    sums = {'X': (200., 10), 'Y': (10., 5)}
+    # WHEN guessing the sex
+    result = guess_sex(sums)
+    # THEN it should average the coverage per chromosome
+    assert result == SexGuess(20., 2., 'male')
+    # GIVEN no data on the X chromosome
+    # THEN it shouldn't guess
+    assert guess_sex({'Y': (10., 5)}) is None
+
+
+def test_sex_from_exons_x_only():
+    # GIVEN regions with exons on X but not on Y
+    exons = [
+        {'chrom': 'X', 'chromStart': 0, 'chromEnd': 10, 'meanCoverage': 10.},
+        {'chrom': '1', 'chromStart': 0, 'chromEnd': 10, 'meanCoverage': 99.},
+    ]
+    # WHEN guessing the sex
+    # THEN it shouldn't guess (rather than calling everyone female)
+    assert sex_from_exons(exons) is None
+
+
+def test_sex_from_exons():
+    # GIVEN exons on X (with prefix) and Y
+    exons = [
+        {'chrom': 'chrX', 'chromStart': 0, 'chromEnd': 10, 'meanCoverage': 10.},
+        {'chrom': 'chrX', 'chromStart': 20, 'chromEnd': 50, 'meanCoverage': 30.},
+        {'chrom': 'chrY', 'chromStart': 0, 'chromEnd': 10, 'meanCoverage': .1},
+        {'chrom': '1', 'chromStart': 0, 'chromEnd': 10, 'meanCoverage': 99.},
+    ]
+    # WHEN guessing the sex
+    result = sex_from_exons(exons)
+    # THEN the coverage should be weighted by exon length
+    assert result.x_coverage == pytest.approx(25.)
+    assert result.y_coverage == pytest.approx(.1)
+    assert result.sex == 'female'
+
+
+def test_cache_key(tmpdir):
+    # GIVEN a BAM file
+    bam_path = tmpdir.join('sample.bam')
+    bam_path.write_binary(b'BAM')
+    key = cache_key(str(bam_path))
+    # WHEN the file is modified
+    os.utime(str(bam_path), ns=(0, 0))
+    # THEN the key should change
+    assert cache_key(str(bam_path)) != key
+    # ... as well as for a different prefix
+    assert cache_key(str(bam_path), prefix='chr') != cache_key(str(bam_path))
+
+
+def test_sex_from_bams_cached(tmpdir):
+    # GIVEN a cache with a guess for a BAM file
+    bam_path = str(tmpdir.join('sample.bam'))
+    tmpdir.join('sample.bam').write_binary(b'BAM')
+    cache_path = str(tmpdir.join('cache.json'))
+    guess = SexGuess(20., 0., 'female')
+    write_cache(cache_path, {cache_key(bam_path): guess})
+    # WHEN guessing the sex
+    results = sex_from_bams([bam_path], cache=read_cache(cache_path))
+    # THEN it should use the cached result without reading the BAM file
+    assert results == [(bam_path, guess, True)]
+
+    # WHEN the BAM file is removed
+    os.remove(bam_path)
+    write_cache(cache_path, read_cache(cache_path))
+    # THEN the entry should be dropped from the cache
+    assert read_cache(cache_path) == {}
+
+
+def test_write_cache_stale(tmpdir):
+    # GIVEN cached guesses for two BAM files
+    paths = [str(tmpdir.join(name)) for name in ('a.bam', 'b.bam')]
+    for path in paths:
+        with open(path, 'wb') as handle:
+            handle.write(b'BAM')
+    cache_path = str(tmpdir.join('cache.json'))
+    guess = SexGuess(20., 0., 'female')
+    write_cache(cache_path, {cache_key(path): guess for path in paths})
+    # WHEN one of them is modified
+    with open(paths[0], 'ab') as handle:
+        handle.write(b'more')
+    write_cache(cache_path, read_cache(cache_path))
+    # THEN only the stale entry should be dropped
+    assert read_cache(cache_path) == {cache_key(paths[1]): guess}
+
+
+def test_drop_cached():
+    # GIVEN cached guesses for two BAM files
+    cache = {'/data/a.bam:3:0:': SexGuess(20., 0., 'female'),
+             '/data/b.bam:3:0:chr': SexGuess(10., 9., 'male')}
+    # WHEN refreshing one of them
+    remaining = drop_cached(cache, ['/data/b.bam'])
+    # THEN the other one should be kept
+    assert list(remaining) == ['/data/a.bam:3:0:']